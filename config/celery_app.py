@@ -22,4 +22,12 @@ app.conf.beat_schedule = {
         'task': 'medtour.sanatorium.tasks.reservations_cleaner',
         'schedule': 600.0,  # Run every 10 minutes (in seconds)
     },
+    'sending-pending-notifications': {
+        'task': 'medtour.notifications.tasks.send_pending_notifications',
+        'schedule': 30.0,  # Picks up notification retries
+    },
+    'refreshing-main-listing': {
+        'task': 'medtour.main.tasks.refresh_listing',
+        'schedule': 600.0,  # Catches changes made without model signals (queryset.update, thumbnails)
+    },
 }
@@ -82,6 +82,7 @@ DJANGO_APPS = [
     "django.contrib.admin",
     "django.forms",
     "django.contrib.sitemaps",
+    "django.contrib.postgres",
 ]
 THIRD_PARTY_APPS = [
     "crispy_forms",
@@ -120,7 +121,8 @@ LOCAL_APPS = [
     "medtour.tourpackages",
     "medtour.paycredentials",
     "medtour.guides",
-    "medtour.main"
+    "medtour.main",
+    "medtour.contrib.sorl_thumbnail_serializer",
     # Your stuff: custom apps go here
 ]
 # https://docs.djangoproject.com/en/dev/ref/settings/#installed-apps
@@ -171,6 +173,8 @@ AUTH_PASSWORD_VALIDATORS = [
 # https://docs.djangoproject.com/en/dev/ref/settings/#middleware
 
 MIDDLEWARE = [
+    "medtour.contrib.profiling.ProfilingMiddleware",
+    "medtour.contrib.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "corsheaders.middleware.CorsMiddleware",
     "whitenoise.middleware.WhiteNoiseMiddleware",
@@ -429,6 +433,8 @@ SPECTACULAR_SETTINGS = {
 
 SMS_LOGIN = env("SMSC_LOGIN")
 SMS_PASSWORD = env("SMSC_PASSWORD")
+# Базовый адрес API SMSC, в нагрузочных тестах указывает на локальную заглушку
+SMSC_URL = env("SMSC_URL", default="http://smsc.kz/sys/")
 OLD_PASSWORD_FIELD_ENABLED = True
 
 CORS_ALLOW_CREDENTIALS = True
@@ -473,6 +479,7 @@ MODELTRANSLATION_DEFAULT_LANGUAGE = 'ru'
 
 KASSA24_LOGIN = env("KASSA24_LOGIN")
 KASSA24_PASSWORD = env("KASSA24_PASSWORD")
+KASSA24_URL = env("KASSA24_URL", default="https://ecommerce.pult24.kz/payment/create")
 
 MAIN_SITE_URL = env("MAIN_SITE_URL")
 
@@ -571,6 +578,7 @@ JAZZMIN_SETTINGS = {
         "applications.Application": "fas fa-rocket",
         "applications.TourApplication": "fas fa-rocket",
         "notifications.Notification": "fas fa-bell",
+        "notifications.OutgoingMessage": "fas fa-paper-plane",
         "pages.About": "fas fa-book",
         "pages.Stocks": "fas fa-book",
         "pages.Contacts": "fas fa-book",
@@ -618,3 +626,39 @@ THUMBNAIL_FORMAT = 'WEBP'
 
 APPLICATION_SEND_BOT_TOKEN = env("APPLICATION_SEND_BOT_TOKEN")
 APPLICATION_SEND_BOT_GROUP_ID = env("APPLICATION_SEND_BOT_GROUP_ID")
+
+# Outbound HTTP
+# ------------------------------------------------------------------------------
+# Пул соединений, таймауты (подключение, чтение), повторы подключения и circuit breaker
+# для каждого внешнего провайдера, см. medtour.utils.http
+OUTBOUND_HTTP = {
+    "kassa24": {
+        "timeout": (env.float("KASSA24_CONNECT_TIMEOUT", default=3.05), env.float("KASSA24_READ_TIMEOUT", default=10)),
+        "retries": 3,
+        "pool_size": env.int("KASSA24_POOL_SIZE", default=10),
+    },
+    "smsc": {
+        "timeout": (3.05, 10),
+        "retries": 2,
+        "pool_size": 10,
+    },
+    "telegram": {
+        "timeout": (3.05, 5),
+        "retries": 2,
+        "pool_size": 4,
+        "failure_threshold": 3,
+    },
+}
+
+# Profiling
+# ------------------------------------------------------------------------------
+# Доля профилируемых запросов и токен заголовка X-Profile, см. medtour.contrib.profiling
+PROFILING_SAMPLE_RATE = env.float("PROFILING_SAMPLE_RATE", default=0.0)
+PROFILING_TOKEN = env("PROFILING_TOKEN", default="")
+
+# Metrics
+# ------------------------------------------------------------------------------
+# Страница /metrics в формате Prometheus, см. medtour.contrib.metrics
+METRICS_ENABLED = env.bool("METRICS_ENABLED", default=False)
+METRICS_TOKEN = env("METRICS_TOKEN", default="")
+METRICS_ALLOWED_IPS = env.list("METRICS_ALLOWED_IPS", default=["127.0.0.1"])
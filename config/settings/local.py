@@ -61,6 +61,7 @@ CELERY_TASK_ALWAYS_EAGER = True
 CELERY_TASK_EAGER_PROPAGATES = True
 # Your stuff...
 # ------------------------------------------------------------------------------
+METRICS_ENABLED = True
 
 SPECTACULAR_SETTINGS['SERVERS'] = [ # noqa F405
     {"url": "http://localhost:8000", "description": "Local Development server"},
@@ -117,14 +117,21 @@ LOGGING = {
         "verbose": {
             "format": "%(levelname)s %(asctime)s %(module)s "
                       "%(process)d %(thread)d %(message)s"
-        }
+        },
+        # Профиль запроса уже JSON строка, без префикса её проще разбирать сборщику логов
+        "raw": {"format": "%(message)s"},
     },
     "handlers": {
         "console": {
             "level": "DEBUG",
             "class": "logging.StreamHandler",
             "formatter": "verbose",
-        }
+        },
+        "profiling": {
+            "level": "INFO",
+            "class": "logging.StreamHandler",
+            "formatter": "raw",
+        },
     },
     "root": {"level": "INFO", "handlers": ["console"]},
     "loggers": {
@@ -140,6 +147,7 @@ LOGGING = {
             "handlers": ["console"],
             "propagate": False,
         },
+        "medtour.profiling": {"level": "INFO", "handlers": ["profiling"], "propagate": False},
     },
 }
 
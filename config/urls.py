@@ -8,6 +8,7 @@ from django.views.generic import TemplateView
 from drf_spectacular.views import SpectacularAPIView, SpectacularSwaggerView, SpectacularRedocView, \
     SpectacularJSONAPIView
 
+from medtour.contrib.metrics import metrics_view
 from medtour.tours.sitemaps import TourSitemap
 from medtour.users.views import CookieTokenRefreshView, CookieTokenObtainPairView, \
     CookieTokenLogoutView, VerifyCodeView, ResetPassword  # Import the above views
@@ -20,6 +21,7 @@ sitemaps = {
 urlpatterns = [
     path("", TemplateView.as_view(template_name="pages/home.html"), name="home"),
     path("sitemap.xml", sitemap, {"sitemaps": sitemaps}, name="django.contrib.sitemaps.views.sitemap"),
+    path("metrics", metrics_view, name="metrics"),
     # Django Admin, use {% url 'admin:index' %}
     path(settings.ADMIN_URL, admin.site.urls),
     # User management
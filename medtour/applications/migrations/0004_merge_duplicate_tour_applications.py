@@ -0,0 +1,36 @@
+# Generated by Django 3.2.15 on 2026-10-18 12:15
+
+from django.db import migrations
+from django.db.models import Count, Min
+
+
+def merge_duplicate_tour_applications(apps, schema_editor):
+    """
+    Перед ограничением уникальности (application, tour) повторные строки одной пары
+    сливаются в самую раннюю: комментарии переносятся на неё, статус сохраняется,
+    если заявка была отмечена хотя бы в одной из строк.
+    """
+    TourApplication = apps.get_model('applications', 'TourApplication')
+    CommentTourApplication = apps.get_model('applications', 'CommentTourApplication')
+
+    duplicates = TourApplication.objects.values('application_id', 'tour_id').annotate(
+        rows=Count('id'), keep_id=Min('id')
+    ).filter(rows__gt=1)
+    for pair in duplicates.iterator():
+        rows = TourApplication.objects.filter(application_id=pair['application_id'], tour_id=pair['tour_id'])
+        extra = rows.exclude(id=pair['keep_id'])
+        CommentTourApplication.objects.filter(tour_application__in=extra).update(tour_application_id=pair['keep_id'])
+        if extra.filter(status=True).exists():
+            rows.filter(id=pair['keep_id']).update(status=True)
+        extra.delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_tour_applications, migrations.RunPython.noop),
+    ]
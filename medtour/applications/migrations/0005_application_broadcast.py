@@ -0,0 +1,21 @@
+# Generated by Django 3.2.15 on 2026-10-18 12:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('applications', '0004_merge_duplicate_tour_applications'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='application',
+            index=models.Index(fields=['category', 'region', '-created_at'], name='application_match_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='tourapplication',
+            constraint=models.UniqueConstraint(fields=('application', 'tour'), name='tour_application_unique'),
+        ),
+    ]
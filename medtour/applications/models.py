@@ -1,4 +1,6 @@
 from django.db import models
+from django.db.models import F, OuterRef, Subquery, Value, BooleanField
+from django.db.models.functions import Coalesce
 from django.utils.translation import gettext_lazy as _
 
 from medtour.tours.models import Tour
@@ -19,12 +21,47 @@ class Application(models.Model):
         verbose_name = _("Заявка тура")
         verbose_name_plural = _("Заявки туров")
         ordering = ["-created_at"]
+        indexes = [
+            models.Index(fields=["category", "region", "-created_at"], name="application_match_idx"),
+        ]
 
     def __str__(self):
         return "{} | {}".format(self.fullName, self.category.title)
 
+    @classmethod
+    def get_tour_matches(cls, tours):
+        """
+        Заявки, разосланные турам. Новая заявка сопоставляется турам той же категории
+        и региона во время запроса, если тур уже существовал, когда заявку оставили,
+        как при прежней рассылке строками. Заявки с TourApplication (старая рассылка
+        или работа оператора) видны туру всегда, даже если с тех пор у тура сменились
+        категория или регион. Статус и tour_application_id берутся из TourApplication.
+        """
+        touched = TourApplication.objects.filter(tour=OuterRef("tour_id"), application=OuterRef("pk"))
+        matched = cls.objects.filter(
+            category__tours__in=tours,
+            category__tours__is_deleted=False,
+            category__tours__region=F("region"),
+            created_at__gte=F("category__tours__created_at"),
+        ).annotate(
+            tour_id=F("category__tours__id"),
+            tour_application_id=Subquery(touched.values("pk")[:1]),
+            status=Coalesce(Subquery(touched.values("status")[:1]), Value(False), output_field=BooleanField()),
+        ).select_related("region", "category")
+        stored = cls.objects.filter(
+            tourapplication__tour__in=tours,
+            tourapplication__tour__is_deleted=False,
+        ).annotate(
+            tour_id=F("tourapplication__tour_id"),
+            tour_application_id=F("tourapplication__id"),
+            status=F("tourapplication__status"),
+        ).select_related("region", "category")
+        # UNION убирает пары, которые попали в обе части
+        return matched.union(stored).order_by("tour_id", "-created_at")
+
 
 class TourApplication(models.Model):
+    """Состояние заявки для тура, создаётся только когда оператор тура работает с заявкой"""
     application = models.ForeignKey(Application, on_delete=models.CASCADE)
     tour = models.ForeignKey(Tour, on_delete=models.CASCADE)
     status = models.BooleanField(_("Статус"), default=False)
@@ -32,6 +69,9 @@ class TourApplication(models.Model):
     class Meta:
         verbose_name = _("Заявка индивидуального тура")
         verbose_name_plural = _("Заявки индивидуального туров")
+        constraints = [
+            models.UniqueConstraint(fields=["application", "tour"], name="tour_application_unique"),
+        ]
 
     def __str__(self):
         return "{} | Тур: {}".format(self.application.fullName, self.tour.title)
@@ -1,3 +1,4 @@
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers
 
 from medtour.applications.models import TourApplication, Application, CommentTourApplication
@@ -27,12 +28,40 @@ class RetrieveApplicationSerializer(serializers.ModelSerializer):
         fields = "__all__"
 
 
-class ListTourApplicationSerializer(serializers.ModelSerializer):
-    application = ListApplicationSerializer(many=False, read_only=True)
+class ListTourApplicationSerializer(serializers.Serializer):
+    """Строка из Application.get_tour_matches, id пустой пока оператор не работал с заявкой"""
+    id = serializers.IntegerField(source="tour_application_id", allow_null=True)
+    application_id = serializers.IntegerField(source="pk")
+    application = ListApplicationSerializer(source="*")
+    tour = serializers.IntegerField(source="tour_id")
+    status = serializers.BooleanField()
+
+
+class TouchTourApplicationSerializer(serializers.ModelSerializer):
+    """Создаёт или обновляет состояние заявки для тура организации"""
 
     class Meta:
         model = TourApplication
-        fields = "__all__"
+        fields = ("id", "application", "tour", "status")
+        validators = []
+
+    def validate(self, attrs):
+        tour, application = attrs["tour"], attrs["application"]
+        if tour.org_id != self.context["request"].user.organization.pk:
+            raise serializers.ValidationError({"tour": [_("Тур не принадлежит вашей организации")]})
+        if TourApplication.objects.filter(application=application, tour=tour).exists():
+            return attrs
+        if (tour.category_id, tour.region_id) != (application.category_id, application.region_id) \
+                or application.created_at < tour.created_at:
+            raise serializers.ValidationError({"application": [_("Заявка не относится к этому туру")]})
+        return attrs
+
+    def create(self, validated_data):
+        instance, _created = TourApplication.objects.update_or_create(
+            application=validated_data["application"], tour=validated_data["tour"],
+            defaults={"status": validated_data.get("status", False)}
+        )
+        return instance
 
 
 class UpdateTourApplicationSerializer(serializers.ModelSerializer):
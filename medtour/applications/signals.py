@@ -1,13 +1,13 @@
+from django.db import transaction
 from django.db.models.signals import post_save
 from django.dispatch import receiver
 
 from medtour.applications.models import Application
-from medtour.applications.tasks import save_application_for_all_tours
+from medtour.applications.tasks import send_application_to_telegram
 
 
 @receiver(post_save, sender=Application)
-def bulk_creating_tour_apps(sender, instance, created, **kwargs):
+def notify_new_application(sender, instance, created, **kwargs):
     if created:
-        save_application_for_all_tours.delay(application_id=instance.pk,
-                                             name=instance.fullName,
-                                             phone=instance.phoneNumber)
+        transaction.on_commit(lambda: send_application_to_telegram.delay(name=instance.fullName,
+                                                                         phone=instance.phoneNumber))
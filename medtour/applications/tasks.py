@@ -1,22 +1,13 @@
 from celery import shared_task
+from django.conf import settings
 
-from medtour.applications.models import TourApplication
-from medtour.tours.models import Tour
+from medtour.utils.http import get_client
 
 
 @shared_task
-def save_application_for_all_tours(application_id: int, name, phone):
-    tours = Tour.objects.all()
-    TourApplication.objects.bulk_create(
-        [
-            TourApplication(tour=tour, application_id=application_id)
-            for tour in tours
-        ]
-    )
+def send_application_to_telegram(name, phone):
+    # Туры видят заявку через Application.get_tour_matches, строки на каждый тур не создаются
     # TODO: https://mtour.kz/api/dashboard/applications/application/31/change/
-
-    import requests
-    from django.conf import settings
     data = {
         "chat_id": settings.APPLICATION_SEND_BOT_GROUP_ID,
         "text": "Новая заявка: \n"
@@ -24,6 +15,6 @@ def save_application_for_all_tours(application_id: int, name, phone):
                 f"Телефон: {phone}\n"
     }
     url = f"https://api.telegram.org/bot{settings.APPLICATION_SEND_BOT_TOKEN}/sendMessage"
-    x = requests.post(url=url,
-                      data=data)
+    x = get_client("telegram").post(url=url,
+                                    data=data)
     return x.text
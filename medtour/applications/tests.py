@@ -0,0 +1,115 @@
+from importlib import import_module
+
+import pytest
+from django.apps import apps
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from medtour.applications.models import Application, CommentTourApplication, TourApplication
+from medtour.tours.models import Tour
+from medtour.users.models import Country, Organization, OrganizationCategory, Region, User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def region():
+    return Region.objects.create(country=Country.objects.create(name="Казахстан"), name="Алматинская")
+
+
+@pytest.fixture
+def category():
+    return OrganizationCategory.objects.create(title="Санатории")
+
+
+@pytest.fixture
+def organization():
+    return Organization.objects.create(user=User.objects.create(username="org"), org_name="Сана")
+
+
+def create_application(region, category, name="Лид"):
+    return Application.objects.create(fullName=name, phoneNumber="+77000000000", region=region, category=category)
+
+
+def test_application_insert_cost_does_not_grow_with_tours(region, category, django_capture_on_commit_callbacks):
+    Tour.objects.create(title="Тур", category=category, region=region)
+    with django_capture_on_commit_callbacks(), CaptureQueriesContext(connection) as few_tours:
+        create_application(region, category)
+
+    Tour.objects.bulk_create([Tour(title="Тур {}".format(n), category=category, region=region) for n in range(200)])
+    with django_capture_on_commit_callbacks(), CaptureQueriesContext(connection) as many_tours:
+        create_application(region, category)
+
+    assert len(many_tours.captured_queries) == len(few_tours.captured_queries)
+    assert not TourApplication.objects.exists()
+
+
+def test_tour_applications_matched_by_category_and_region(region, category, organization):
+    other_region = Region.objects.create(country=region.country, name="Акмолинская")
+    tour = Tour.objects.create(title="Тур", category=category, region=region, org=organization)
+    Tour.objects.create(title="Чужой тур", category=category, region=region)
+    application = create_application(region, category)
+    create_application(other_region, category, name="Другой регион")
+    client = APIClient()
+    client.force_authenticate(organization.user)
+
+    response = client.get("/v1/tour-apps/apps/")
+
+    assert response.status_code == 200
+    assert [(row["id"], row["application_id"], row["tour"], row["status"])
+            for row in response.data["results"]] == [(None, application.pk, tour.pk, False)]
+
+    response = client.post("/v1/tour-apps/apps/", {"application": application.pk, "tour": tour.pk, "status": True})
+    assert response.status_code == 201
+
+    row = client.get("/v1/tour-apps/apps/", {"tour_id": tour.pk}).data["results"][0]
+    assert row["id"] == TourApplication.objects.get().pk
+    assert row["status"] is True
+
+
+def test_touch_rejects_foreign_tour(region, category, organization):
+    foreign = Tour.objects.create(title="Чужой тур", category=category, region=region)
+    application = create_application(region, category)
+    client = APIClient()
+    client.force_authenticate(organization.user)
+
+    response = client.post("/v1/tour-apps/apps/", {"application": application.pk, "tour": foreign.pk})
+
+    assert response.status_code == 400
+    assert not TourApplication.objects.exists()
+
+
+def test_tour_matches_keep_stored_rows_and_skip_older_applications(region, category, organization):
+    client = APIClient()
+    client.force_authenticate(organization.user)
+    tour = Tour.objects.create(title="Тур", category=category, region=region, org=organization)
+    worked = create_application(region, category, name="В работе")
+    TourApplication.objects.create(application=worked, tour=tour, status=True)
+    Tour.objects.filter(pk=tour.pk).update(region=Region.objects.create(country=region.country, name="Акмолинская"))
+    later = Tour.objects.create(title="Новый тур", category=category, region=region, org=organization)
+
+    rows = [(row["application_id"], row["tour"], row["status"])
+            for row in client.get("/v1/tour-apps/apps/").data["results"]]
+
+    assert rows == [(worked.pk, tour.pk, True)]
+
+    fresh = create_application(region, category, name="Новая")
+    rows = [(row["application_id"], row["tour"]) for row in client.get("/v1/tour-apps/apps/").data["results"]]
+    assert rows == [(worked.pk, tour.pk), (fresh.pk, later.pk)]
+
+
+def test_duplicate_tour_applications_are_merged(region, category):
+    tour = Tour.objects.create(title="Тур", category=category, region=region)
+    application = create_application(region, category)
+    with connection.cursor() as cursor:  # строки, созданные до ограничения
+        cursor.execute("ALTER TABLE applications_tourapplication DROP CONSTRAINT tour_application_unique")
+    first, second, third = [TourApplication.objects.create(application=application, tour=tour, status=status)
+                            for status in (False, True, False)]
+    CommentTourApplication.objects.create(tour_application=third, comment="Перезвонить")
+
+    import_module("medtour.applications.migrations.0004_merge_duplicate_tour_applications"
+                  ).merge_duplicate_tour_applications(apps, None)
+
+    assert list(TourApplication.objects.values_list("pk", "status")) == [(first.pk, True)]
+    assert CommentTourApplication.objects.get().tour_application_id == first.pk
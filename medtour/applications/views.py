@@ -1,13 +1,15 @@
-from django.db.models import Q
+from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import viewsets, generics
 from rest_framework.exceptions import PermissionDenied
 
 from medtour.applications.serializers import (ListTourApplicationSerializer,
                                               PostApplicationSerializer, UpdateTourApplicationSerializer,
-                                              RetrieveTourApplicationSerializer, CommentTourApplicationSerializer)
+                                              RetrieveTourApplicationSerializer, CommentTourApplicationSerializer,
+                                              TouchTourApplicationSerializer)
 from medtour.applications.models import TourApplication, Application, CommentTourApplication
 from medtour.contrib.pagination import StandardResultsSetPagination
 from medtour.contrib.serializers import ReadWriteSerializerMixin
+from medtour.tours.models import Tour
 
 
 class ApplicationCreateView(generics.CreateAPIView):
@@ -16,39 +18,51 @@ class ApplicationCreateView(generics.CreateAPIView):
 
 
 class TourApplicationViewSet(ReadWriteSerializerMixin, viewsets.ModelViewSet):
+    """
+    Заявки для туров организации. Список строится из Application.get_tour_matches,
+    POST отмечает заявку для тура и создаёт TourApplication, если его ещё нет.
+    """
     queryset = TourApplication.objects.all().order_by('tour')
     serializer_class = ListTourApplicationSerializer
     read_serializer_class = ListTourApplicationSerializer
     write_serializer_class = UpdateTourApplicationSerializer
     retrieve_serializer_class = RetrieveTourApplicationSerializer
-    http_method_names = ["get", "put", "patch"]
-    filterset_fields = ["tour_id"]
-    list_select_related = ("tour__org",)
+    http_method_names = ["get", "post", "put", "patch"]
     list_prelated_tuple = ("application_comments",)
     pagination_class = StandardResultsSetPagination
 
     def get_queryset(self):
         if not hasattr(self.request.user, 'organization'):  # noqa
             raise PermissionDenied
-        qs = self.queryset
-        query = Q(tour__org=self.request.user.organization)
+        organization = self.request.user.organization
 
         # for list views
         if self.action == "list":
-            query.add(Q(tour_id=self.request.query_params.get('tour_id')), Q.OR)
-            return qs.filter(query).select_related(*self.list_select_related)
+            tours = Tour.objects.filter(org=organization)
+            tour_id = self.request.query_params.get('tour_id')
+            if tour_id:
+                tours = tours.filter(pk=tour_id)
+            return Application.get_tour_matches(tours)
 
         # for self.get_object()
-        return qs.filter(query).select_related("tour__org").prefetch_related(*self.list_prelated_tuple)
+        return self.queryset.filter(tour__org=organization).select_related(
+            "tour__org").prefetch_related(*self.list_prelated_tuple)
         # return super().get_queryset()
 
     def get_serializer_class(self):
-        if self.action in ["create", "update", "partial_update", "destroy"]:
+        if self.action == "create":
+            return TouchTourApplicationSerializer
+        if self.action in ["update", "partial_update", "destroy"]:
             return self.get_write_serializer_class()
         elif self.action == "retrieve":
             return self.retrieve_serializer_class
         return self.get_read_serializer_class()
 
+    @extend_schema(parameters=[OpenApiParameter(name="tour_id", type=int,
+                                                description="Заявки только для этого тура")])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
 
 class CommentTourApplicationViewSet(viewsets.ModelViewSet):
     queryset = CommentTourApplication.objects.all()
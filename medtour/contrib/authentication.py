@@ -7,6 +7,8 @@ from rest_framework_simplejwt.authentication import JWTAuthentication
 from rest_framework_simplejwt.exceptions import InvalidToken, AuthenticationFailed
 from rest_framework_simplejwt.settings import USER_SETTINGS, DEFAULTS, IMPORT_STRINGS, APISettings
 
+from medtour.contrib.profiling import record_cache
+
 User = get_user_model()
 api_settings = APISettings(USER_SETTINGS, DEFAULTS, IMPORT_STRINGS)
 
@@ -18,6 +20,7 @@ class CachedJWTAuthentication(JWTAuthentication):
             user = cache.get(f'user_{user_id}')
         except KeyError:
             raise InvalidToken(_("Token contained no recognizable user identification"))
+        record_cache("jwt_user", user is not None)
         if user is not None:
             return user
 
@@ -0,0 +1,285 @@
+"""
+Нагрузочный тест воронки бронирования.
+
+Виртуальный пользователь проходит шаги записей главной страницы, страницы тура,
+номеров, проверки свободных кабинетов, создания корзины и колбэка Kassa24.
+Для каждого шага считаются пропускная способность, ошибки и p50/p95/p99 времени ответа,
+результат сравнивается с базовыми значениями из benchmarks/funnel_baseline.json.
+
+Kassa24 и SMSC заменяются локальной заглушкой StubServer, поэтому прогон не ходит
+во внешние сервисы и не зависит от их задержек. Запускается командой benchmark_funnel.
+"""
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlencode
+
+import requests
+from django.db import connection
+
+STEPS = ("records", "tour", "numbers", "check", "cart", "callback")
+PERCENTILES = (50, 95, 99)
+# Рост p95 меньше этого порога считается шумом даже при превышении допуска
+MIN_REGRESSION_MS = 5
+# Окна бронирования идут далеко после данных seed_database, чтобы не пересекаться с ними
+FIRST_BOOKING_DAY = 400
+NIGHTS = 2
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    """Kassa24 /payment/create и SMSC /sys/*.php с фиксированной задержкой"""
+    latency = 0
+
+    def do_GET(self):  # noqa
+        self.respond()
+
+    def do_POST(self):  # noqa
+        self.respond()
+
+    def respond(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        body = self.rfile.read(length) if length else b""
+        time.sleep(self.latency)
+        if self.path.startswith("/payment/create"):
+            order_id = json.loads(body or b"{}").get("orderId")
+            status, content_type = 201, "application/json"
+            payload = json.dumps({"url": "http://{}/pay/{}".format(self.headers.get("Host"), order_id)})
+        elif self.path.startswith("/sys/"):
+            # fmt=1: id, количество sms, стоимость, баланс
+            status, content_type, payload = 200, "text/plain", "1,1,0,1000"
+        else:
+            status, content_type, payload = 404, "text/plain", ""
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(payload.encode())))
+        self.end_headers()
+        self.wfile.write(payload.encode())
+
+    def log_message(self, *args):
+        pass
+
+
+class StubServer:
+    """Заглушка внешних провайдеров в фоновом потоке"""
+
+    def __init__(self, host="127.0.0.1", port=0, latency_ms=0):
+        handler = type("StubHandler", (StubHandler,), {"latency": latency_ms / 1000})
+        self.server = ThreadingHTTPServer((host, port), handler)
+        self.server.daemon_threads = True
+        self.thread = threading.Thread(target=self.server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self):
+        host, port = self.server.server_address[:2]
+        return "http://{}:{}".format(host, port)
+
+    @property
+    def settings(self):
+        """Настройки, которые нужно передать стеку, чтобы он ходил в заглушку"""
+        return {"KASSA24_URL": self.base_url + "/payment/create", "SMSC_URL": self.base_url + "/sys/"}
+
+    def __enter__(self):
+        self.thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+class HttpTransport:
+    """Запросы к запущенному стеку через keep-alive сессию"""
+
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip("/")
+        self.session = requests.Session()
+
+    def request(self, method, path, token=None, data=None):
+        headers = {"Authorization": "Token {}".format(token)} if token else {}
+        response = self.session.request(method, self.base_url + path, json=data, headers=headers, timeout=30)
+        return response.status_code, response.json() if response.content else None
+
+    def close(self):
+        self.session.close()
+
+
+class InProcessTransport:
+    """Запросы через django.test.Client без HTTP сервера, в том же процессе и базе"""
+
+    def __init__(self):
+        from django.conf import settings
+        from django.test import Client
+
+        host = next((host for host in settings.ALLOWED_HOSTS if host != "*" and not host.startswith(".")),
+                    "testserver")
+        self.client = Client(HTTP_HOST=host, raise_request_exception=False)
+
+    def request(self, method, path, token=None, data=None):
+        extra = {"HTTP_AUTHORIZATION": "Token {}".format(token)} if token else {}
+        if method == "GET":
+            response = self.client.get(path, **extra)
+        else:
+            response = self.client.generic(method, path, json.dumps(data), content_type="application/json", **extra)
+        return response.status_code, json.loads(response.content) if response.content else None
+
+    def close(self):
+        pass
+
+
+def prepare_funnel(users):
+    """
+    Тур с номерами и токены клиентов для прогона. Тур берётся из уже заполненной
+    базы (create_tours, seed_database) с наибольшим количеством кабинетов.
+    """
+    from django.db.models import Count
+    from rest_framework.authtoken.models import Token
+
+    from medtour.tournumbers.models import TourNumbers
+    from medtour.users.models import User
+
+    number = TourNumbers.objects.filter(tour__is_moderated=True, tour__is_deleted=False).annotate(
+        cabinets_count=Count("cabinets")
+    ).select_related("tour__city").order_by("-cabinets_count", "pk").first()
+    if number is None:
+        raise LookupError("Нет модерированного тура с номерами, заполните базу командой create_tours")
+    tokens = []
+    for index in range(users):
+        user, _ = User.objects.get_or_create(username="funnel-benchmark-{}".format(index))
+        tokens.append(Token.objects.get_or_create(user=user)[0].key)
+    return {"tour": number.tour, "number": number, "tokens": tokens}
+
+
+def funnel_requests(tour, number, start):
+    """Шаги воронки до создания корзины: (шаг, метод, путь, тело)"""
+    end = start + timedelta(days=NIGHTS)
+    city = tour.city.slug if tour.city_id else "all"
+    return [
+        ("records", "GET", "/v1/records/{}/tours/".format(city), None),
+        ("tour", "GET", "/v1/tours/slug/{}/".format(tour.slug), None),
+        ("numbers", "GET", "/v1/numbers/?{}".format(urlencode({"tour_id": tour.pk})), None),
+        ("check", "GET", "/v1/crm/check/?{}".format(urlencode({"daterange": "{},{}".format(start, end),
+                                                               "number": number.pk})), None),
+        ("cart", "POST", "/v1/service-cart/", {
+            "tour": tour.pk, "number": number.pk, "start": str(start), "end": str(end), "count": 1,
+            "price": number.price * NIGHTS,
+            "visitors": [{"first_name": "Нагрузка", "last_name": "Тест", "birthday_date": "1990-01-01",
+                          "citizenship": "KZ", "document": 0, "doc_number": "000000000", "gender": 0}],
+        }),
+    ]
+
+
+class FunnelRun:
+    """
+    concurrency виртуальных пользователей параллельно проходят воронку iterations раз.
+    Каждое прохождение бронирует свои даты, поэтому корзины не конфликтуют за кабинеты.
+    """
+
+    def __init__(self, transport_factory, tour, number, tokens, iterations):
+        self.transport_factory = transport_factory
+        self.tour = tour
+        self.number = number
+        self.tokens = tokens
+        self.iterations = iterations
+        self.windows = itertools.count()
+        self.lock = threading.Lock()
+        self.samples = {step: [] for step in STEPS}
+        self.errors = {step: 0 for step in STEPS}
+
+    def record(self, step, status, duration):
+        with self.lock:
+            self.samples[step].append(duration * 1000)
+            if status >= 400:
+                self.errors[step] += 1
+
+    def next_start(self):
+        with self.lock:
+            window = next(self.windows)
+        return date.today() + timedelta(days=FIRST_BOOKING_DAY + window * NIGHTS)
+
+    def user(self, token):
+        transport = self.transport_factory()
+        try:
+            for _ in range(self.iterations):
+                self.funnel(transport, token)
+        finally:
+            transport.close()
+
+    def thread_user(self, token):
+        try:
+            self.user(token)
+        finally:
+            # Каждый поток держит своё соединение с базой
+            connection.close()
+
+    def funnel(self, transport, token):
+        cart = None
+        for step, method, path, data in funnel_requests(self.tour, self.number, self.next_start()):
+            started = time.perf_counter()
+            status, body = transport.request(method, path, token=token if step == "cart" else None, data=data)
+            self.record(step, status, time.perf_counter() - started)
+            if step == "cart":
+                cart = body.get("id") if status == 201 and body else None
+        if cart is None:
+            return
+        started = time.perf_counter()
+        status, _ = transport.request("POST", "/v1/payment-callbacks/kassa24/", data={"orderId": cart, "status": 1})
+        self.record("callback", status, time.perf_counter() - started)
+
+    def run(self):
+        started = time.perf_counter()
+        if len(self.tokens) == 1:
+            self.user(self.tokens[0])
+        else:
+            with ThreadPoolExecutor(max_workers=len(self.tokens)) as executor:
+                list(executor.map(self.thread_user, self.tokens))
+        return summarize(self.samples, self.errors, time.perf_counter() - started)
+
+
+def percentile(samples, p):
+    """Ближайший ранг, как у большинства нагрузочных инструментов"""
+    ordered = sorted(samples)
+    rank = max(0, -(-len(ordered) * p // 100) - 1)
+    return round(ordered[int(rank)], 2)
+
+
+def summarize(samples, errors, duration):
+    steps = {}
+    for step in STEPS:
+        if not samples[step]:
+            continue
+        steps[step] = {"count": len(samples[step]), "errors": errors[step],
+                       "rps": round(len(samples[step]) / duration, 2)}
+        steps[step].update({"p{}".format(p): percentile(samples[step], p) for p in PERCENTILES})
+    return {"duration_s": round(duration, 2), "steps": steps}
+
+
+def compare(result, baseline, tolerance):
+    """Регрессии шагов: ошибки там, где их не было, или рост p95 больше допуска"""
+    regressions = []
+    for step, base in baseline["steps"].items():
+        row = result["steps"].get(step)
+        if row is None:
+            regressions.append("{}: шаг не выполнялся".format(step))
+            continue
+        if row["errors"] > base["errors"]:
+            regressions.append("{}: ошибок {} при базовых {}".format(step, row["errors"], base["errors"]))
+        limit = base["p95"] * (1 + tolerance)
+        if row["p95"] > limit and row["p95"] - base["p95"] > MIN_REGRESSION_MS:
+            regressions.append("{}: p95 {} мс при базовом {} мс".format(step, row["p95"], base["p95"]))
+    return regressions
+
+
+def format_result(result, baseline=None):
+    base_steps = (baseline or {}).get("steps", {})
+    rows = ["{:<10} {:>6} {:>6} {:>8} {:>8} {:>8} {:>8} {:>10}".format(
+        "step", "count", "errors", "rps", "p50", "p95", "p99", "base p95")]
+    for step, row in result["steps"].items():
+        rows.append("{:<10} {:>6} {:>6} {:>8} {:>8} {:>8} {:>8} {:>10}".format(
+            step, row["count"], row["errors"], row["rps"], row["p50"], row["p95"], row["p99"],
+            base_steps.get(step, {}).get("p95", "-")
+        ))
+    return "\n".join(rows)
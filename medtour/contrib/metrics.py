@@ -0,0 +1,303 @@
+"""
+Метрики в текстовом формате Prometheus без внешних зависимостей.
+
+Счётчики и гистограммы хранятся в хэше Redis кэша по умолчанию (django-redis на
+проде), поэтому /metrics отдаёт сумму по всем воркерам gunicorn и celery. Для
+других бэкендов кэша (locmem в разработке и тестах) значения живут в процессе.
+
+MetricsMiddleware копит приращения запроса в памяти и пишет их одним pipeline
+после ответа. Вне запроса (задачи celery) приращение пишется сразу.
+
+Собирается:
+    http_requests_total, http_request_duration_seconds  по имени маршрута
+    http_db_queries_total                                SQL запросы маршрута
+    cache_requests_total                                 попадания и промахи кэшей
+    outbound_request_duration_seconds                    запросы к провайдерам
+    celery_task_*                                        ожидание в очереди, длительность, очередь
+"""
+import json
+import threading
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from celery import signals
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse, HttpResponseForbidden
+
+STORE_KEY = "metrics"
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+METRICS = {
+    "http_requests_total": ("counter", "HTTP запросы по маршруту, методу и статусу"),
+    "http_request_duration_seconds": ("histogram", "Время ответа по маршруту"),
+    "http_db_queries_total": ("counter", "SQL запросы, выполненные при обработке маршрута"),
+    "cache_requests_total": ("counter", "Обращения к кэшам: result=hit или miss"),
+    "outbound_request_duration_seconds": ("histogram", "Запросы к внешним провайдерам"),
+    "celery_tasks_published_total": ("counter", "Задачи, отправленные в брокер"),
+    "celery_tasks_finished_total": ("counter", "Выполненные задачи по состоянию"),
+    "celery_task_queue_seconds": ("histogram", "Время от отправки задачи до начала выполнения"),
+    "celery_task_duration_seconds": ("histogram", "Время выполнения задачи"),
+}
+
+pending = ContextVar("metrics_pending", default=None)
+
+
+def enabled():
+    return getattr(settings, "METRICS_ENABLED", False)
+
+
+class LocalStore:
+    """Значения в памяти процесса"""
+
+    def __init__(self):
+        self.values = {}
+        self.lock = threading.Lock()
+
+    def add(self, increments):
+        with self.lock:
+            for field, amount in increments.items():
+                self.values[field] = self.values.get(field, 0) + amount
+
+    def read(self):
+        with self.lock:
+            return dict(self.values)
+
+    def clear(self):
+        with self.lock:
+            self.values.clear()
+
+
+class RedisStore:
+    """Общий для всех процессов хэш в Redis кэша"""
+
+    def __init__(self, client, key):
+        self.client = client
+        self.key = key
+
+    def add(self, increments):
+        pipeline = self.client.pipeline(transaction=False)
+        for field, amount in increments.items():
+            pipeline.hincrbyfloat(self.key, field, amount)
+        pipeline.execute()
+
+    def read(self):
+        return {field.decode(): float(value) for field, value in self.client.hgetall(self.key).items()}
+
+    def clear(self):
+        self.client.delete(self.key)
+
+
+_store = None
+
+
+def get_store():
+    global _store
+    if _store is None:
+        client = getattr(cache, "client", None)
+        if hasattr(client, "get_client"):
+            _store = RedisStore(client.get_client(write=True), cache.make_key(STORE_KEY))
+        else:
+            _store = LocalStore()
+    return _store
+
+
+def series(name, labels):
+    return "{}\t{}".format(name, json.dumps(labels, sort_keys=True, ensure_ascii=False))
+
+
+def add(increments):
+    buffer = pending.get()
+    if buffer is None:
+        # Метрики не должны ронять задачу или запрос, если Redis недоступен
+        try:
+            get_store().add(increments)
+        except Exception:
+            pass
+        return
+    for field, amount in increments.items():
+        buffer[field] = buffer.get(field, 0) + amount
+
+
+def inc(name, amount=1, **labels):
+    if enabled():
+        add({series(name, labels): amount})
+
+
+def observe(name, value, **labels):
+    if not enabled():
+        return
+    le = next((bucket for bucket in LATENCY_BUCKETS if value <= bucket), "+Inf")
+    add({
+        series(name + "_bucket", dict(labels, le=str(le))): 1,
+        series(name + "_count", labels): 1,
+        series(name + "_sum", labels): value,
+    })
+
+
+class QueryCounter:
+
+    def __init__(self):
+        self.count = 0
+
+    def __call__(self, execute, sql, params, many, context):
+        self.count += 1
+        return execute(sql, params, many, context)
+
+
+class MetricsMiddleware:
+    """Ставится сразу после ProfilingMiddleware, включается METRICS_ENABLED"""
+
+    def __init__(self, get_response):
+        if not enabled():
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        token = pending.set({})
+        queries = QueryCounter()
+        started = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(queries))
+                response = self.get_response(request)
+            match = getattr(request, "resolver_match", None)
+            route = match.view_name if match else "unmatched"
+            observe("http_request_duration_seconds", time.perf_counter() - started, route=route,
+                    method=request.method)
+            inc("http_requests_total", route=route, method=request.method, status=str(response.status_code))
+            inc("http_db_queries_total", queries.count, route=route)
+            increments = pending.get()
+        finally:
+            pending.reset(token)
+        add(increments)
+        return response
+
+
+# Celery
+# ------------------------------------------------------------------------------
+
+@signals.before_task_publish.connect
+def task_published(sender=None, headers=None, **kwargs):
+    if headers is not None:
+        headers["published_at"] = time.time()
+    inc("celery_tasks_published_total", task=sender)
+
+
+@signals.task_prerun.connect
+def task_started(task=None, **kwargs):
+    task.request.metrics_started = time.perf_counter()
+    published_at = getattr(task.request, "published_at", None)
+    if published_at:
+        observe("celery_task_queue_seconds", max(0.0, time.time() - published_at), task=task.name)
+
+
+@signals.task_postrun.connect
+def task_finished(task=None, state=None, **kwargs):
+    started = getattr(task.request, "metrics_started", None)
+    if started is not None:
+        observe("celery_task_duration_seconds", time.perf_counter() - started, task=task.name)
+    inc("celery_tasks_finished_total", task=task.name, state=state or "UNKNOWN")
+
+
+def broker_queue_lengths():
+    """Длина очередей Redis брокера, пустой словарь для других брокеров или без связи"""
+    broker_url = getattr(settings, "CELERY_BROKER_URL", "") or ""
+    if not broker_url.startswith(("redis://", "rediss://")):
+        return {}
+    import redis
+
+    queue = getattr(settings, "CELERY_TASK_DEFAULT_QUEUE", "celery")
+    try:
+        client = redis.Redis.from_url(broker_url, socket_timeout=0.5, socket_connect_timeout=0.5)
+        return {queue: client.llen(queue)}
+    except redis.RedisError:
+        return {}
+
+
+# Exposition
+# ------------------------------------------------------------------------------
+
+def format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join('{}="{}"'.format(key, str(value).replace("\\", "\\\\").replace('"', '\\"'))
+                          for key, value in sorted(labels.items())) + "}"
+
+
+def format_value(value):
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+def collect(values):
+    """{имя метрики: [(имя серии, метки, значение)]}, бакеты гистограмм накопительные"""
+    rows = {}
+    buckets = {}
+    for field, value in values.items():
+        name, labels = field.split("\t", 1)
+        labels = json.loads(labels)
+        if name.endswith("_bucket"):
+            le = labels.pop("le")
+            buckets.setdefault((name, json.dumps(labels, sort_keys=True)), {})[le] = value
+            continue
+        metric = name.rsplit("_", 1)[0] if name.endswith(("_count", "_sum")) else name
+        rows.setdefault(metric, []).append((name, labels, value))
+
+    for (name, labels), counts in buckets.items():
+        labels = json.loads(labels)
+        total = 0
+        for le in [str(bucket) for bucket in LATENCY_BUCKETS] + ["+Inf"]:
+            total += counts.get(le, 0)
+            rows.setdefault(name[:-len("_bucket")], []).append((name, dict(labels, le=le), total))
+
+    # Производные значения, чтобы не считать их в каждом запросе к Prometheus
+    queued = {}
+    for name, labels, value in rows.get("celery_tasks_published_total", []):
+        queued[labels["task"]] = queued.get(labels["task"], 0) + value
+    for name, labels, value in rows.get("celery_tasks_finished_total", []):
+        queued[labels["task"]] = queued.get(labels["task"], 0) - value
+    rows["celery_task_queued"] = [("celery_task_queued", {"task": task}, max(0, count))
+                                  for task, count in queued.items()]
+    ratios = {}
+    for name, labels, value in rows.get("cache_requests_total", []):
+        hits, total = ratios.get(labels["cache"], (0, 0))
+        ratios[labels["cache"]] = (hits + (value if labels["result"] == "hit" else 0), total + value)
+    rows["cache_hit_ratio"] = [("cache_hit_ratio", {"cache": name}, round(hits / total, 4))
+                               for name, (hits, total) in ratios.items() if total]
+    rows["celery_queue_length"] = [("celery_queue_length", {"queue": queue}, length)
+                                   for queue, length in broker_queue_lengths().items()]
+    return rows
+
+
+DERIVED = {
+    "celery_task_queued": ("gauge", "Отправленные, но ещё не выполненные задачи"),
+    "celery_queue_length": ("gauge", "Сообщений в очереди брокера"),
+    "cache_hit_ratio": ("gauge", "Доля попаданий кэша"),
+}
+
+
+def render(values):
+    lines = []
+    for metric, rows in sorted(collect(values).items()):
+        if not rows:
+            continue
+        kind, help_text = METRICS.get(metric) or DERIVED[metric]
+        lines.append("# HELP {} {}".format(metric, help_text))
+        lines.append("# TYPE {} {}".format(metric, kind))
+        lines += ["{}{} {}".format(name, format_labels(labels), format_value(value)) for name, labels, value in rows]
+    return "\n".join(lines) + "\n"
+
+
+def metrics_view(request):
+    """Страница для Prometheus: с адресов METRICS_ALLOWED_IPS или с заголовком Bearer METRICS_TOKEN"""
+    token = getattr(settings, "METRICS_TOKEN", "")
+    authorized = request.META.get("REMOTE_ADDR") in getattr(settings, "METRICS_ALLOWED_IPS", ()) or (
+        token and request.META.get("HTTP_AUTHORIZATION") == "Bearer {}".format(token)
+    )
+    if not enabled() or not authorized:
+        return HttpResponseForbidden()
+    return HttpResponse(render(get_store().read()), content_type="text/plain; version=0.0.4; charset=utf-8")
@@ -0,0 +1,62 @@
+import hashlib
+import random
+
+from django.contrib.postgres.fields.array import IndexTransform
+from django.db import models
+from django.db.models import F
+from django.utils import timezone
+
+SHUFFLE_SEED_MAX_LENGTH = 64
+SHUFFLE_BUCKETS = 8
+SHUFFLE_KEY_MAX = 2 ** 31 - 1
+
+
+def new_shuffle_keys():
+    """Случайные ключи перемешивания строки, по одному на корзину сидов."""
+    return [random.randint(0, SHUFFLE_KEY_MAX) for _ in range(SHUFFLE_BUCKETS)]
+
+
+def shuffle_bucket(seed):
+    """Номер корзины, в которую попадает сид (от 0 до SHUFFLE_BUCKETS - 1)."""
+    return int(hashlib.md5(seed.encode()).hexdigest(), 16) % SHUFFLE_BUCKETS
+
+
+def shuffle_key(bucket, keys_field="shuffle_keys"):
+    # элементы массива в PostgreSQL нумеруются с единицы
+    return IndexTransform(bucket + 1, models.IntegerField(), F(keys_field))
+
+
+def shuffle_indexes(name_prefix, keys_field="shuffle_keys", condition=None):
+    """
+    Индексы (ключ корзины, pk) для модели с полем ключей перемешивания.
+    condition должен совпадать с фильтром списка, иначе планировщик их не возьмёт.
+    """
+    return [
+        models.Index(shuffle_key(bucket, keys_field), F("id"),
+                     name="{}_{}".format(name_prefix, bucket), condition=condition)
+        for bucket in range(SHUFFLE_BUCKETS)
+    ]
+
+
+def get_shuffle_seed(request):
+    """
+    Сид перемешивания: берётся из ?seed= (клиент хранит его на сессию),
+    иначе используется текущая дата, и порядок меняется раз в сутки.
+    """
+    seed = request.query_params.get("seed")
+    if seed:
+        return seed[:SHUFFLE_SEED_MAX_LENGTH]
+    return timezone.localdate().isoformat()
+
+
+def seeded_shuffle(queryset, seed, field_name="shuffle_key", keys_field="shuffle_keys"):
+    """
+    Детерминированная замена order_by("?"). Сид сводится к одной из SHUFFLE_BUCKETS
+    корзин, строки сортируются по заранее записанному случайному ключу этой корзины.
+    По (ключ, pk) есть индекс (см. shuffle_indexes), поэтому страница читается
+    индексом с LIMIT, а не сортировкой всей таблицы. При одном и том же сиде
+    порядок стабилен, страницы не пересекаются и пагинация идёт по (shuffle_key, pk).
+    """
+    return queryset.annotate(
+        **{field_name: shuffle_key(shuffle_bucket(seed), keys_field)}
+    ).order_by(field_name, "pk")
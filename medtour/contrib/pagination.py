@@ -1,7 +1,13 @@
-import random
+import json
+from base64 import b64decode, b64encode
+from datetime import datetime
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.db.models import Q
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import PageNumberPagination, CursorPagination
+from rest_framework.utils.urls import remove_query_param, replace_query_param
 
-from rest_framework.pagination import PageNumberPagination
-from rest_framework.response import Response
 
 class TourStandardResultsSetPagination(PageNumberPagination):
     page_size = 9
@@ -43,3 +49,118 @@ class TourStandardResultsSetPagination(PageNumberPagination):
 class StandardResultsSetPagination(PageNumberPagination):
     page_size = 10
     max_page_size = 10
+
+
+class KeysetCursorPagination(CursorPagination):
+    """
+    Курсорная (keyset) пагинация: следующая страница выбирается условием
+    по ключу сортировки, а не OFFSET, поэтому глубокая страница стоит
+    столько же, сколько первая.
+    """
+    page_size = 24
+    max_page_size = 100
+    page_size_query_param = "page_size"
+    ordering = ("-created_at", "-id")
+
+
+class SeededShuffleCursorPagination(KeysetCursorPagination):
+    """
+    Пагинация по ключу перемешивания (см. medtour.contrib.ordering.seeded_shuffle).
+    Сид вьюхи добавляется в ссылки next/previous, чтобы порядок не поменялся между страницами.
+    """
+    ordering = ("shuffle_key", "id")
+    seed_query_param = "seed"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        page = super().paginate_queryset(queryset, request, view)
+        seed = getattr(view, "shuffle_seed", None)
+        if seed and self.base_url:
+            self.base_url = replace_query_param(self.base_url, self.seed_query_param, seed)
+        return page
+
+
+def keyset_filter(ordering, position):
+    """Условие "строка после position" для сортировки ordering, position: {поле: значение}"""
+    condition = None
+    equal = Q()
+    for field in ordering:
+        name = field.lstrip("-")
+        after = Q(**{"{}__{}".format(name, "lt" if field.startswith("-") else "gt"): position[name]})
+        condition = equal & after if condition is None else condition | (equal & after)
+        equal &= Q(**{name: position[name]})
+    return condition
+
+
+def reverse_ordering(ordering):
+    return tuple(field[1:] if field.startswith("-") else "-" + field for field in ordering)
+
+
+class CompositeCursorPagination(KeysetCursorPagination):
+    """
+    Курсорная пагинация по всем полям ordering сразу.
+
+    В отличие от CursorPagination, курсор хранит значения всех полей ordering последней
+    строки, а не первое поле и смещение, поэтому страница выбирается условием по ключу
+    даже при большом числе одинаковых значений первого поля. ordering должен однозначно
+    задавать порядок (закончиться уникальным полем). Строки страницы — словари values().
+    """
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.page_size = self.get_page_size(request)
+        self.base_url = remove_query_param(request.build_absolute_uri(), self.cursor_query_param)
+        ordering = tuple(getattr(view, "ordering", None) or self.ordering)
+        names = [field.lstrip("-") for field in ordering]
+        position, reverse = self.decode_cursor(request)
+        if position is not None:
+            position = self.clean_position(queryset.model, names, position)
+        order = reverse_ordering(ordering) if reverse else ordering
+
+        if position is not None:
+            queryset = queryset.filter(keyset_filter(order, position))
+        rows = list(queryset.order_by(*order)[:self.page_size + 1])
+
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if reverse:
+            rows.reverse()
+        first = {name: rows[0][name] for name in names} if rows else position
+        last = {name: rows[-1][name] for name in names} if rows else position
+        self.next_cursor = last if (has_more or reverse) and last else None
+        self.previous_cursor = first if (has_more if reverse else position is not None) and first else None
+        return rows
+
+    def clean_position(self, model, names, position):
+        """Значения курсора, приведённые к типам полей модели; любой мусор в курсоре — 404"""
+        if set(position) != set(names):
+            raise NotFound(self.invalid_cursor_message)
+        try:
+            cleaned = {name: model._meta.get_field(name).to_python(position[name]) for name in names}
+        except (DjangoValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in cleaned.values():
+            raise NotFound(self.invalid_cursor_message)
+        return cleaned
+
+    def get_next_link(self):
+        return self.cursor_link(self.next_cursor, reverse=False)
+
+    def get_previous_link(self):
+        return self.cursor_link(self.previous_cursor, reverse=True)
+
+    def cursor_link(self, position, reverse):
+        if position is None:
+            return None
+        data = {"p": {key: value.isoformat() if isinstance(value, datetime) else value
+                      for key, value in position.items()}, "r": reverse}
+        cursor = b64encode(json.dumps(data, separators=(",", ":")).encode()).decode()
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None, False
+        try:
+            data = json.loads(b64decode(encoded.encode(), validate=True).decode())
+            return dict(data["p"]), bool(data["r"])
+        except (TypeError, ValueError, KeyError):
+            raise NotFound(self.invalid_cursor_message)
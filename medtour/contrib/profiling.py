@@ -0,0 +1,171 @@
+"""
+Профилирование отдельных запросов на проде.
+
+ProfilingMiddleware включает профиль для доли запросов PROFILING_SAMPLE_RATE или для
+запроса с заголовком X-Profile, равным PROFILING_TOKEN. Для такого запроса считаются
+SQL запросы и их время (connection.execute_wrapper), время сериализации ответа,
+попадания и промахи кэшей и время исходящих HTTP запросов к провайдерам.
+
+Итог пишется одной JSON строкой в логгер medtour.profiling, а запросу с заголовком
+ещё и отдаётся в Server-Timing, чтобы его было видно во вкладке Network браузера.
+Без активного профиля record_* функции сводятся к чтению contextvar.
+"""
+import json
+import logging
+import random
+import time
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import connections
+from rest_framework.serializers import BaseSerializer
+
+from medtour.contrib.metrics import inc
+
+logger = logging.getLogger("medtour.profiling")
+
+PROFILE_HEADER = "HTTP_X_PROFILE"
+SLOW_SQL_LENGTH = 300
+
+current_profile = ContextVar("current_profile", default=None)
+
+
+class RequestProfile:
+
+    def __init__(self, request, trigger):
+        self.method = request.method
+        self.path = request.path
+        self.trigger = trigger
+        self.started = time.perf_counter()
+        self.sql_count = 0
+        self.sql_ms = 0.0
+        self.slowest_sql = None
+        self.slowest_sql_ms = 0.0
+        self.serializer_ms = 0.0
+        self.serializer_depth = 0
+        self.http_count = 0
+        self.http_ms = 0.0
+        self.cache = {}
+
+    def execute_wrapper(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - started) * 1000
+            self.sql_count += 1
+            self.sql_ms += duration
+            if duration > self.slowest_sql_ms:
+                self.slowest_sql, self.slowest_sql_ms = sql[:SLOW_SQL_LENGTH], duration
+
+    def as_dict(self, status):
+        return {
+            "method": self.method,
+            "path": self.path,
+            "status": status,
+            "trigger": self.trigger,
+            "total_ms": round((time.perf_counter() - self.started) * 1000, 2),
+            "sql_count": self.sql_count,
+            "sql_ms": round(self.sql_ms, 2),
+            "slowest_sql": self.slowest_sql,
+            "slowest_sql_ms": round(self.slowest_sql_ms, 2),
+            "serializer_ms": round(self.serializer_ms, 2),
+            "http_count": self.http_count,
+            "http_ms": round(self.http_ms, 2),
+            "cache": self.cache,
+        }
+
+    def server_timing(self, total_ms):
+        metrics = [
+            'db;dur={:.2f};desc="{} queries"'.format(self.sql_ms, self.sql_count),
+            "serializer;dur={:.2f}".format(self.serializer_ms),
+            'http;dur={:.2f};desc="{} calls"'.format(self.http_ms, self.http_count),
+        ]
+        metrics += ['cache-{};desc="hit={} miss={}"'.format(name, row["hit"], row["miss"])
+                    for name, row in sorted(self.cache.items())]
+        metrics.append("total;dur={:.2f}".format(total_ms))
+        return ", ".join(metrics)
+
+
+def record_cache(name: str, hit: bool):
+    """Попадание или промах кэша name в текущем профиле и в метриках"""
+    inc("cache_requests_total", cache=name, result="hit" if hit else "miss")
+    profile = current_profile.get()
+    if profile is not None:
+        row = profile.cache.setdefault(name, {"hit": 0, "miss": 0})
+        row["hit" if hit else "miss"] += 1
+
+
+def record_http(duration: float):
+    """Исходящий HTTP запрос длительностью duration секунд"""
+    profile = current_profile.get()
+    if profile is not None:
+        profile.http_count += 1
+        profile.http_ms += duration * 1000
+
+
+def profiled_data(data):
+    """
+    Обёртка BaseSerializer.data: время сериализации корневого сериализатора.
+    Вложенные сериализаторы вызываются через to_representation и не считаются дважды.
+    """
+
+    def wrapper(serializer):
+        profile = current_profile.get()
+        if profile is None:
+            return data.fget(serializer)
+        profile.serializer_depth += 1
+        started = time.perf_counter()
+        try:
+            return data.fget(serializer)
+        finally:
+            profile.serializer_depth -= 1
+            if not profile.serializer_depth:
+                profile.serializer_ms += (time.perf_counter() - started) * 1000
+
+    wrapper.profiled = True
+    return property(wrapper)
+
+
+def install_serializer_timing():
+    if not getattr(BaseSerializer.data.fget, "profiled", False):
+        BaseSerializer.data = profiled_data(BaseSerializer.data)
+
+
+class ProfilingMiddleware:
+    """Ставится первым в MIDDLEWARE, чтобы total включал все остальные middleware"""
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        install_serializer_timing()
+
+    def get_trigger(self, request):
+        token = getattr(settings, "PROFILING_TOKEN", "")
+        if token and request.META.get(PROFILE_HEADER) == token:
+            return "header"
+        sample_rate = getattr(settings, "PROFILING_SAMPLE_RATE", 0)
+        if sample_rate and random.random() < sample_rate:
+            return "sample"
+        return None
+
+    def __call__(self, request):
+        trigger = self.get_trigger(request)
+        if trigger is None:
+            return self.get_response(request)
+
+        profile = RequestProfile(request, trigger)
+        context = current_profile.set(profile)
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(profile.execute_wrapper))
+                response = self.get_response(request)
+        finally:
+            current_profile.reset(context)
+
+        data = profile.as_dict(response.status_code)
+        if trigger == "header":
+            response["Server-Timing"] = profile.server_timing(data["total_ms"])
+        logger.info(json.dumps(data, ensure_ascii=False, sort_keys=True))
+        return response
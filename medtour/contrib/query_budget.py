@@ -0,0 +1,72 @@
+"""
+Бюджет SQL запросов для эндпоинтов роутера API.
+
+iter_routes обходит все viewset роутера и строит GET адреса list, retrieve и
+detail=False действий. measure выполняет запрос тестовым клиентом и записывает
+количество запросов к базе и время ответа. Используется в medtour/tests/test_query_budgets.py.
+"""
+import json
+import time
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+DEFAULT_BUDGET = 10
+
+
+def route_params():
+    """
+    Обязательные query параметры списков: последний созданный тур, номер и гид.
+    После досева данных это другие строки с большим количеством связей,
+    поэтому N+1 в списках по tour_id тоже видно.
+    """
+    from medtour.guides.models import Guide
+    from medtour.tournumbers.models import TourNumbers
+    from medtour.tours.models import Tour
+
+    return {
+        name: model.objects.order_by("-pk").values_list("pk", flat=True).first()
+        for name, model in (("tour_id", Tour), ("tour_number_id", TourNumbers), ("guide_id", Guide))
+    }
+
+
+def iter_routes(router, prefix="/v1/"):
+    """(имя маршрута, адрес, query параметры) для GET эндпоинтов роутера"""
+    params = route_params()
+    for route_prefix, viewset, basename in router.registry:
+        basename = basename or router.get_default_basename(viewset)
+        url = "{}{}/".format(prefix, route_prefix)
+        if hasattr(viewset, "list"):
+            yield "{}-list".format(basename), url, params
+        for action in viewset.get_extra_actions():
+            if not action.detail and "get" in action.mapping:
+                yield "{}-{}".format(basename, action.url_name), "{}{}/".format(url, action.url_path), params
+        queryset = getattr(viewset, "queryset", None)
+        if hasattr(viewset, "retrieve") and queryset is not None:
+            lookup = queryset.model._default_manager.order_by("pk").values_list(viewset.lookup_field,
+                                                                                flat=True).first()
+            if lookup is not None:
+                yield "{}-detail".format(basename), "{}{}/".format(url, lookup), {}
+
+
+def measure(client, url, params=None):
+    """Код ответа, количество SQL запросов и время ответа в миллисекундах"""
+    with CaptureQueriesContext(connection) as queries:
+        started = time.perf_counter()
+        response = client.get(url, params or {})
+        duration = (time.perf_counter() - started) * 1000
+    statements = [query for query in queries.captured_queries
+                  if not query["sql"].startswith(("SAVEPOINT", "RELEASE SAVEPOINT"))]
+    return {"status": response.status_code, "queries": len(statements), "duration_ms": round(duration, 2)}
+
+
+def write_report(report, path):
+    """Отчёт по маршрутам: JSON файл и таблица для вывода в консоль"""
+    with open(path, "w") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2, sort_keys=True)
+    rows = ["{:<45} {:>6} {:>8} {:>8} {:>8} {:>10}".format("route", "status", "queries", "grown", "budget", "ms")]
+    for name, row in sorted(report.items()):
+        rows.append("{:<45} {:>6} {:>8} {:>8} {:>8} {:>10}".format(
+            name, row["status"], row["queries"], row["queries_grown"], row["budget"], row["duration_ms"]
+        ))
+    return "\n".join(rows)
@@ -0,0 +1,83 @@
+"""
+Кэш ответов публичных эндпоинтов каталога.
+
+Ответ хранится в кэше по умолчанию (django-redis на проде) под ключом из пути,
+query параметров, языка и текущих версий тегов эндпоинта. Сигналы моделей
+увеличивают версию тега после коммита, поэтому старые записи больше не читаются
+и просто истекают по TTL. Сами записи можно хранить долго.
+"""
+import hashlib
+from functools import wraps
+
+from django.core.cache import cache
+from django.db import transaction
+from django.utils.translation import get_language
+from rest_framework.response import Response
+
+from medtour.contrib.profiling import record_cache
+
+DEFAULT_TIMEOUT = 60 * 60 * 24
+TAG_TIMEOUT = None  # версии тегов не должны истекать раньше записей
+
+
+def tag_key(tag):
+    return "response-cache:tag:{}".format(tag)
+
+
+def get_tag_versions(tags):
+    keys = [tag_key(tag) for tag in tags]
+    versions = cache.get_many(keys)
+    missing = {key: 1 for key in keys if key not in versions}
+    if missing:
+        cache.set_many(missing, timeout=TAG_TIMEOUT)
+        versions.update(missing)
+    return [versions[key] for key in keys]
+
+
+def invalidate(*tags):
+    """Сбрасывает все ответы, помеченные тегами"""
+    for tag in tags:
+        try:
+            cache.incr(tag_key(tag))
+        except ValueError:
+            cache.set(tag_key(tag), 1, timeout=TAG_TIMEOUT)
+
+
+def invalidate_on_commit(*tags):
+    """Сброс после коммита, чтобы параллельный запрос не закэшировал старые данные под новой версией"""
+    transaction.on_commit(lambda: invalidate(*tags))
+
+
+def response_cache_key(request, tags):
+    query = sorted(request.query_params.lists())
+    parts = [request.path, repr(query), get_language() or "", repr(get_tag_versions(tags))]
+    return "response-cache:{}".format(hashlib.md5("|".join(parts).encode()).hexdigest())
+
+
+def cache_response(*tags, timeout=DEFAULT_TIMEOUT):
+    """
+    Декоратор get метода APIView. Кэширует только успешные ответы,
+    ответ не должен зависеть от пользователя.
+
+        @cache_response("tours", "guides")
+        def get(self, request, *args, **kwargs):
+            ...
+    """
+
+    def decorator(method):
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            key = response_cache_key(request, tags)
+            data = cache.get(key)
+            record_cache("response", data is not None)
+            if data is not None:
+                return Response(data, headers={"X-Cache": "HIT"})
+            response = method(self, request, *args, **kwargs)
+            if response.status_code == 200:
+                cache.set(key, response.data, timeout=timeout)
+                response["X-Cache"] = "MISS"
+            return response
+
+        return wrapper
+
+    return decorator
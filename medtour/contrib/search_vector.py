@@ -0,0 +1,15 @@
+"""
+Колонку search_vector заполняет триггер PostgreSQL, читает её только поиск
+(medtour.main.search) в условии и ранге запроса. Менеджеры по умолчанию моделей с
+этой колонкой откладывают её, чтобы списки, карточки и админка не тянули tsvector.
+"""
+from django.db.models import Manager
+
+
+class DeferSearchVectorMixin:
+    def get_queryset(self):
+        return super().get_queryset().defer("search_vector")
+
+
+class SearchVectorManager(DeferSearchVectorMixin, Manager):
+    pass
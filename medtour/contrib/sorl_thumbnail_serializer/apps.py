@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+from django.utils.translation import gettext_lazy as _
+
+
+class ThumbnailManifestConfig(AppConfig):
+    name = "medtour.contrib.sorl_thumbnail_serializer"
+    # sorl_thumbnail_serializer уже занят одноимённым сторонним пакетом
+    label = "thumbnail_manifest"
+    verbose_name = _("Миниатюры")
@@ -41,8 +41,11 @@ Example Usage:
     ]
 """
 
+from django.db import models
 from rest_framework import serializers
-from sorl.thumbnail import get_thumbnail
+from rest_framework.fields import SkipField
+
+from medtour.contrib.sorl_thumbnail_serializer.thumbnails import ThumbnailBatch, thumbnail_name
 
 
 class HyperlinkedSorlImageField(serializers.ImageField):
@@ -75,10 +78,61 @@ class HyperlinkedSorlImageField(serializers.ImageField):
         Args:
             value: the image to transform
         Returns:
-            a url pointing at a scaled and cached image
+            a url pointing at a scaled and cached image, taken from the row's
+            precomputed thumbnail manifest when it is available
         """
-        if not value:
-            return None
+        return thumbnail_name(value, self.geometry_string, self.options,
+                              batch=self.context.get("thumbnail_batch"))
+
+
+class ThumbnailListSerializer(serializers.ListSerializer):
+
+    """
+    A list serializer resolving every thumbnail of the page at once.
 
-        image = get_thumbnail(value, self.geometry_string, **self.options)
-        return image.name
+    Before the items are serialized it walks the child serializer (including
+    nested serializers) and collects each HyperlinkedSorlImageField value, then
+    checks the sorl key-value store for all of them with a single MGET.
+    Thumbnails that are not rendered yet are queued for background generation
+    and the original image is returned in their place.
+
+    Usage:
+
+        class Meta:
+            list_serializer_class = ThumbnailListSerializer
+    """
+
+    def to_representation(self, data):
+        iterable = data.all() if isinstance(data, models.Manager) else data
+        if "thumbnail_batch" in self.context:
+            return super().to_representation(iterable)
+        items = list(iterable)
+        batch = ThumbnailBatch()
+        for item in items:
+            collect_thumbnails(self.child, item, batch)
+        batch.resolve()
+        self.context["thumbnail_batch"] = batch
+        try:
+            return super().to_representation(items)
+        finally:
+            del self.context["thumbnail_batch"]
+
+
+def collect_thumbnails(serializer, instance, batch):
+    for field in serializer.fields.values():
+        if field.write_only or not isinstance(field, (HyperlinkedSorlImageField, serializers.BaseSerializer)):
+            continue
+        try:
+            value = field.get_attribute(instance)
+        except (AttributeError, KeyError, SkipField):
+            continue
+        if value is None:
+            continue
+        if isinstance(field, HyperlinkedSorlImageField):
+            batch.collect(value, field.geometry_string, field.options)
+        elif isinstance(field, serializers.ListSerializer):
+            children = value.all() if isinstance(value, models.Manager) else value
+            for child in children:
+                collect_thumbnails(field.child, child, batch)
+        elif isinstance(field, serializers.BaseSerializer):
+            collect_thumbnails(field, value, batch)
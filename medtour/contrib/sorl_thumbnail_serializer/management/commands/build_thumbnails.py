@@ -0,0 +1,29 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from django.db.models import F, Q
+
+from medtour.contrib.sorl_thumbnail_serializer.tasks import generate_thumbnails
+from medtour.contrib.sorl_thumbnail_serializer.thumbnails import ThumbnailManifestModel
+
+
+class Command(BaseCommand):
+    help = 'Builds thumbnail manifests for shots uploaded before the pipeline (every ThumbnailManifestModel)'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--sync", action="store_true", help="Render in this process instead of celery")
+
+    def handle(self, *args, **options):
+        for model in apps.get_models():
+            if not issubclass(model, ThumbnailManifestModel):
+                continue
+            stale = model.objects.exclude(photo="").filter(
+                Q(thumbnails_source__isnull=True) | ~Q(thumbnails_source=F("photo"))
+            ).values_list("pk", flat=True)
+            count = 0
+            for pk in stale.iterator():
+                if options["sync"]:
+                    generate_thumbnails(model._meta.label, pk)
+                else:
+                    generate_thumbnails.delay(model._meta.label, pk)
+                count += 1
+            self.stdout.write(self.style.SUCCESS("{}: {} shots queued".format(model._meta.label, count)))
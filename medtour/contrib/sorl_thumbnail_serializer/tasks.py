@@ -0,0 +1,19 @@
+from celery import shared_task
+from django.apps import apps
+from sorl.thumbnail import get_thumbnail
+
+
+@shared_task
+def generate_thumbnails(model_label: str, pk: int):
+    """Рендерит все размеры миниатюр для строки с ThumbnailManifestModel"""
+    instance = apps.get_model(model_label).objects.filter(pk=pk).first()
+    if instance is None or not instance.photo:
+        return None
+    instance.render_thumbnails()
+    return instance.thumbnails
+
+
+@shared_task
+def generate_thumbnail(name: str, geometry: str, options: dict):
+    """Рендерит одну миниатюру изображения из хранилища по умолчанию"""
+    return get_thumbnail(name, geometry, **options).name
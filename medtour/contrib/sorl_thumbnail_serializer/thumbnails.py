@@ -0,0 +1,183 @@
+"""
+Миниатюры, подготовленные при загрузке изображения.
+
+Celery задача generate_thumbnails рендерит все размеры, которые отдают сериализаторы,
+и сохраняет имена файлов в поле thumbnails строки. Сериализатор берёт имя из этого
+манифеста без обращения к KV хранилищу sorl и без пересчёта изображения.
+
+Для строк без манифеста ThumbnailBatch собирает все миниатюры страницы и проверяет
+их в KV хранилище одним MGET. Отсутствующие миниатюры рендерятся в фоне, а до тех
+пор сериализатор отдаёт исходное изображение.
+"""
+from django.db import models, transaction
+from django.dispatch import Signal
+from django.utils.translation import gettext_lazy as _
+from sorl.thumbnail import default, get_thumbnail
+from sorl.thumbnail.conf import defaults as default_settings, settings as sorl_settings
+from sorl.thumbnail.helpers import serialize
+from sorl.thumbnail.images import ImageFile
+from sorl.thumbnail.kvstores.base import add_prefix
+
+from medtour.contrib.profiling import record_cache
+
+# Размеры и опции, которые используют сериализаторы и админка
+THUMBNAIL_GEOMETRIES = {
+    "570x360": {"crop": "center"},
+    "752x350": {"crop": "center"},
+    "507x203": {"crop": "center"},
+    "300x350": {"upscale": False, "crop": "center", "quality": 100},
+}
+
+# Отправляется после записи манифеста: update() не вызывает post_save
+thumbnails_rendered = Signal()
+
+
+class ThumbnailManifestModel(models.Model):
+    thumbnails = models.JSONField(_("Миниатюры"), default=dict, blank=True, editable=False,
+                                  help_text=_("Имена готовых миниатюр по размерам"))
+    thumbnails_source = models.CharField(_("Исходник миниатюр"), max_length=1000, null=True, blank=True,
+                                         editable=False)
+
+    class Meta:
+        abstract = True
+
+    def get_thumbnail_name(self, geometry: str):
+        """Имя готовой миниатюры или None, если манифест построен не для текущего фото"""
+        if self.photo and self.thumbnails_source == self.photo.name:
+            return self.thumbnails.get(geometry)
+        return None
+
+    def render_thumbnails(self):
+        manifest = {
+            geometry: get_thumbnail(self.photo, geometry, **options).name
+            for geometry, options in THUMBNAIL_GEOMETRIES.items()
+        }
+        updated = type(self).objects.filter(pk=self.pk, photo=self.photo.name).update(
+            thumbnails=manifest, thumbnails_source=self.photo.name
+        )
+        self.thumbnails, self.thumbnails_source = manifest, self.photo.name
+        if updated:
+            thumbnails_rendered.send(sender=type(self), instance=self)
+
+
+def manifest_thumbnail_name(value, geometry: str):
+    instance = getattr(value, "instance", None)
+    if isinstance(instance, ThumbnailManifestModel) and value.field.name == "photo":
+        return instance.get_thumbnail_name(geometry)
+    return None
+
+
+def thumbnail_name(value, geometry: str, options: dict, batch=None):
+    """
+    Имя миниатюры изображения: из манифеста строки, если он есть, затем из batch
+    страницы, иначе через sorl
+    """
+    if not value:
+        return None
+    name = manifest_thumbnail_name(value, geometry)
+    if name:
+        return name
+    if batch is not None and batch.has(value, geometry, options):
+        return batch.get(value, geometry, options)
+    return get_thumbnail(value, geometry, **options).name
+
+
+def thumbnail_filename(value, geometry: str, options: dict):
+    """Имя файла миниатюры, которое построит sorl get_thumbnail с теми же опциями"""
+    backend = default.backend
+    source = ImageFile(value)
+    options = dict(options)
+    if sorl_settings.THUMBNAIL_PRESERVE_FORMAT:
+        options.setdefault("format", backend._get_format(source))
+    for key, option in backend.default_options.items():
+        options.setdefault(key, option)
+    for key, attr in backend.extra_options:
+        option = getattr(sorl_settings, attr)
+        if option != getattr(default_settings, attr):
+            options.setdefault(key, option)
+    return backend._get_thumbnail_filename(source, geometry, options)
+
+
+def get_raw_many(keys):
+    """Значения KV хранилища sorl одним запросом, если это Redis"""
+    kvstore = default.kvstore
+    connection = getattr(kvstore, "connection", None)
+    if connection is not None:
+        return connection.mget(keys)
+    return [kvstore._get_raw(key) for key in keys]
+
+
+class ThumbnailBatch:
+    """
+    Миниатюры одной страницы списка.
+
+    collect() регистрирует пару (изображение, размер, опции), resolve() одним MGET
+    проверяет, какие из них уже есть в KV хранилище sorl. Для остальных get()
+    отдаёт исходное изображение, а миниатюры ставятся в очередь на рендер.
+    """
+
+    def __init__(self):
+        self.names = {}
+        self.missing = {}
+
+    @staticmethod
+    def make_key(value, geometry, options):
+        return value.name, geometry, serialize(options)
+
+    def collect(self, value, geometry: str, options: dict):
+        if not value or manifest_thumbnail_name(value, geometry):
+            return
+        key = self.make_key(value, geometry, options)
+        if key not in self.names:
+            self.names[key] = None
+            self.missing[key] = value, geometry, options
+
+    def resolve(self):
+        pending = list(self.missing.items())
+        if not pending:
+            return
+        filenames = [thumbnail_filename(value, geometry, options) for key, (value, geometry, options) in pending]
+        raw = get_raw_many([add_prefix(ImageFile(name, default.storage).key) for name in filenames])
+        for (key, (value, geometry, options)), filename, cached in zip(pending, filenames, raw):
+            record_cache("thumbnail_kv", bool(cached))
+            if cached:
+                self.names[key] = filename
+                del self.missing[key]
+            else:
+                self.names[key] = value.name
+        self.schedule_missing()
+
+    def schedule_missing(self):
+        from medtour.contrib.sorl_thumbnail_serializer.tasks import generate_thumbnail, generate_thumbnails
+
+        rows, single = set(), []
+        for value, geometry, options in self.missing.values():
+            instance = getattr(value, "instance", None)
+            if isinstance(instance, ThumbnailManifestModel) and value.field.name == "photo":
+                rows.add((instance._meta.label, instance.pk))
+            else:
+                single.append((value.name, geometry, options))
+        self.missing = {}
+
+        def enqueue():
+            for label, pk in rows:
+                generate_thumbnails.delay(label, pk)
+            for name, geometry, options in single:
+                generate_thumbnail.delay(name, geometry, options)
+
+        transaction.on_commit(enqueue)
+
+    def has(self, value, geometry, options) -> bool:
+        return self.make_key(value, geometry, options) in self.names
+
+    def get(self, value, geometry, options):
+        return self.names[self.make_key(value, geometry, options)]
+
+
+def schedule_thumbnails(instance):
+    """Подготовить миниатюры после коммита, если фото изменилось; вызывается из post_save"""
+    from medtour.contrib.sorl_thumbnail_serializer.tasks import generate_thumbnails
+
+    if instance.photo and instance.thumbnails_source != instance.photo.name:
+        label = instance._meta.label
+        transaction.on_commit(lambda: generate_thumbnails.delay(label, instance.pk))
@@ -6,3 +6,6 @@ class GuidesConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'medtour.guides'
     verbose_name = _("Гиды")
+
+    def ready(self):
+        import medtour.guides.signals  # noqa
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.15 on 2026-10-18 12:17
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guides', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guideshots',
+            name='thumbnails',
+            field=models.JSONField(blank=True, default=dict, editable=False, help_text='Имена готовых миниатюр по размерам', verbose_name='Миниатюры'),
+        ),
+        migrations.AddField(
+            model_name='guideshots',
+            name='thumbnails_source',
+            field=models.CharField(blank=True, editable=False, max_length=1000, null=True, verbose_name='Исходник миниатюр'),
+        ),
+    ]
@@ -0,0 +1,122 @@
+# Generated by Django 3.2.15 on 2026-10-18 12:52
+
+import logging
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import DatabaseError, migrations, transaction
+
+logger = logging.getLogger(__name__)
+
+
+# search_vector заполняет триггер: название с весом A, описание B, адрес C, каждое в
+# конфигурациях russian (стемминг) и simple (без стемминга, для казахских слов и имён).
+GUIDE_SEARCH_VECTOR = """
+    CREATE FUNCTION guides_guide_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER guides_guide_search_vector BEFORE INSERT OR UPDATE OF title, description
+        ON guides_guide FOR EACH ROW EXECUTE PROCEDURE guides_guide_search_vector();
+
+    UPDATE guides_guide SET title = title;
+"""
+
+DROP_GUIDE_SEARCH_VECTOR = """
+    DROP TRIGGER guides_guide_search_vector ON guides_guide;
+    DROP FUNCTION guides_guide_search_vector();
+"""
+
+PROGRAM_SEARCH_VECTOR = """
+    CREATE FUNCTION guides_guideprogram_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(NEW.name, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'B');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER guides_guideprogram_search_vector BEFORE INSERT OR UPDATE OF name, description
+        ON guides_guideprogram FOR EACH ROW EXECUTE PROCEDURE guides_guideprogram_search_vector();
+
+    UPDATE guides_guideprogram SET name = name;
+"""
+
+DROP_PROGRAM_SEARCH_VECTOR = """
+    DROP TRIGGER guides_guideprogram_search_vector ON guides_guideprogram;
+    DROP FUNCTION guides_guideprogram_search_vector();
+"""
+
+TRIGRAM_INDEXES = [
+    ('guide_title_trgm', 'guides_guide', 'title'),
+    ('guideprogram_name_trgm', 'guides_guideprogram', 'name'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # pg_trgm есть не на каждом сервере, без него поиск остаётся только полнотекстовым
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT installed_version FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        row = cursor.fetchone()
+        if row is None:
+            logger.warning("pg_trgm is not available on the server, trigram indexes %s are skipped",
+                           ", ".join(name for name, _, _ in TRIGRAM_INDEXES))
+            return
+        if row[0] is None:
+            try:
+                with transaction.atomic(using=schema_editor.connection.alias):
+                    cursor.execute("CREATE EXTENSION pg_trgm")
+            except DatabaseError as e:  # нет прав на создание расширения
+                logger.warning("pg_trgm could not be installed (%s), trigram indexes %s are skipped",
+                               e, ", ".join(name for name, _, _ in TRIGRAM_INDEXES))
+                return
+        for name, table, expression in TRIGRAM_INDEXES:
+            cursor.execute("CREATE INDEX IF NOT EXISTS {} ON {} USING gin ({} gin_trgm_ops)".format(
+                name, table, expression))
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for name, table, expression in TRIGRAM_INDEXES:
+            cursor.execute("DROP INDEX IF EXISTS {}".format(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('guides', '0003_thumbnails_manifest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='guide',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='guideprogram',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='guide',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='guide_search_vector_gin'),
+        ),
+        migrations.AddIndex(
+            model_name='guideprogram',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='guideprogram_search_vector_gin'),
+        ),
+        migrations.RunSQL(GUIDE_SEARCH_VECTOR, DROP_GUIDE_SEARCH_VECTOR),
+        migrations.RunSQL(PROGRAM_SEARCH_VECTOR, DROP_PROGRAM_SEARCH_VECTOR),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -1,12 +1,17 @@
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator, MinLengthValidator
 from django.db import models
-from django.db.models import Avg, Count, Func
+from django.db.models import Avg, Count, Func, Min, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
-from ordered_model.models import OrderedModel
+from ordered_model.models import OrderedModel, OrderedModelManager
 from sorl.thumbnail import get_thumbnail, ImageField
 
+from medtour.contrib.search_vector import DeferSearchVectorMixin, SearchVectorManager
 from medtour.contrib.soft_delete_model import SoftDeleteModel
+from medtour.contrib.sorl_thumbnail_serializer.thumbnails import ThumbnailManifestModel
 from medtour.guides.instances import get_shots_path, get_program_path
 from medtour.utils import unique_slug_generator
 from medtour.utils.constants import CurrencyChoice, GuideComplexityChoice, GuideDurationTypeChoice
@@ -75,12 +80,16 @@ class Guide(SoftDeleteModel):
     is_subscribed = models.BooleanField(_("Подписан?"), default=False, db_index=True,
                                         help_text=_("Отметьте, если он подписан"))
     created_at = models.DateTimeField(auto_now_add=True, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)  # заполняет триггер, см. medtour.main.search
+
+    objects = SearchVectorManager()
     __original_title = None
 
     class Meta:
         verbose_name = _("Гид")
         verbose_name_plural = _("Гиды")
         ordering = ['-created_at']
+        indexes = [GinIndex(fields=["search_vector"], name="guide_search_vector_gin")]
 
     def __str__(self):
         return self.title if self.title else _("Нет имени")
@@ -97,15 +106,39 @@ class Guide(SoftDeleteModel):
         super().save(*args, **kwargs)
         self.__original_title = self.title
 
+    @staticmethod
+    def rating_aggregates():
+        return {
+            "service__avg": Round(Avg('service'), 2, output_field=models.FloatField()),
+            "location__avg": Round(Avg('location'), 2, output_field=models.FloatField()),
+            "staff__avg": Round(Avg('staff'), 2, output_field=models.FloatField()),
+            "proportion__avg": Round(Avg('proportion'), 2, output_field=models.FloatField()),
+            "reviews__count": Count('service', output_field=models.FloatField()),
+        }
+
+    @classmethod
+    def annotations(cls):
+        """
+        Рейтинг, количество отзывов и минимальная цена программ подзапросами в
+        одном SELECT по гидам, без JOIN и размножения строк. Гид из такого запроса
+        отдаёт average_rating без обращения к базе.
+        """
+        reviews = GuideReview.objects.filter(guide=OuterRef("pk")).order_by().values("guide")
+        programs = GuideProgram.objects.filter(guide=OuterRef("pk"), is_deleted=False).order_by().values("guide")
+        annotations = {
+            name: Subquery(reviews.annotate(value=aggregate).values("value"), output_field=models.FloatField())
+            for name, aggregate in cls.rating_aggregates().items()
+        }
+        annotations["reviews__count"] = Coalesce(annotations["reviews__count"], 0.0)
+        annotations["minimum_price"] = Subquery(programs.annotate(value=Min("price")).values("value"),
+                                                output_field=models.IntegerField())
+        return annotations
+
     @property
     def average_rating(self):
-        return self.guide_reviews.aggregate(
-            service__avg=Round(Avg('service'), 2, output_field=models.FloatField()),
-            location__avg=Round(Avg('location'), 2, output_field=models.FloatField()),
-            staff__avg=Round(Avg('staff'), 2, output_field=models.FloatField()),
-            proportion__avg=Round(Avg('proportion'), 2, output_field=models.FloatField()),
-            reviews__count=Count('service', output_field=models.FloatField())
-        )
+        if hasattr(self, "reviews__count"):
+            return {name: getattr(self, name) for name in self.rating_aggregates()}
+        return self.guide_reviews.aggregate(**self.rating_aggregates())
 
 
 class GuideReview(models.Model):
@@ -131,7 +164,7 @@ class GuideReview(models.Model):
         ordering = ("-created_at",)
 
 
-class GuideShots(OrderedModel):
+class GuideShots(OrderedModel, ThumbnailManifestModel):
     name = models.CharField(_("Имя изображения"), null=True, max_length=50, blank=True)
     guide = models.ForeignKey(Guide, related_name="guide_shots", on_delete=models.CASCADE,
                               verbose_name=_("Гид"),
@@ -156,6 +189,10 @@ class GuideShots(OrderedModel):
         return ""
 
 
+class GuideProgramManager(DeferSearchVectorMixin, OrderedModelManager):
+    pass
+
+
 class GuideProgram(OrderedModel, SoftDeleteModel):
     name = models.CharField(_("Название программы"), max_length=255)
     guide = models.ForeignKey(Guide, on_delete=models.CASCADE, related_name='programs')
@@ -175,11 +212,15 @@ class GuideProgram(OrderedModel, SoftDeleteModel):
     seats_count = models.IntegerField(_("Количество мест"), default=0)
     services = models.ManyToManyField("guides.GuideServices", verbose_name=_("Включенные услуги"), blank=True)
     remarks = models.CharField(_("Примечание"), max_length=50, default='Примечание', null=True, blank=True)
+    search_vector = SearchVectorField(null=True, editable=False)  # заполняет триггер, см. medtour.main.search
+
+    objects = GuideProgramManager()
     order_with_respect_to = "guide"
 
     class Meta:
         verbose_name = _("Программа гида")
         verbose_name_plural = _("Программы гидов")
+        indexes = [GinIndex(fields=["search_vector"], name="guideprogram_search_vector_gin")]
 
     def __str__(self):
         return "Гид: {} | Програма: {}".format(self.guide.title, self.name)
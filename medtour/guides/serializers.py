@@ -4,7 +4,7 @@ from drf_spectacular.utils import extend_schema_field
 from ordered_model.serializers import OrderedModelSerializer
 from rest_framework import serializers
 
-from medtour.contrib.sorl_thumbnail_serializer.fields import HyperlinkedSorlImageField
+from medtour.contrib.sorl_thumbnail_serializer.fields import HyperlinkedSorlImageField, ThumbnailListSerializer
 from medtour.guides.models import Guide, GuideProgram, GuideReview, GuideServices, GuideShots
 from medtour.users.serializers import CountrySerializer, RegionSerializer
 
@@ -49,7 +49,7 @@ class GuidePOSTShotsSerializer(OrderedModelSerializer):
 
     class Meta:
         model = GuideShots
-        exclude = ("order", )
+        exclude = ("order", "thumbnails", "thumbnails_source")
 
 
 class GuideShotsSerializer(OrderedModelSerializer):
@@ -62,7 +62,7 @@ class GuideShotsSerializer(OrderedModelSerializer):
 
     class Meta:
         model = GuideShots
-        fields = "__all__"
+        exclude = ("thumbnails", "thumbnails_source")
 
 
 class GuideSerializer(serializers.ModelSerializer):
@@ -72,7 +72,7 @@ class GuideSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Guide
-        exclude = ("created_at", "is_deleted", "is_subscribed", "is_top")
+        exclude = ("created_at", "is_deleted", "is_subscribed", "is_top", "search_vector")
 
 
 class GuideReadSerializer(serializers.ModelSerializer):
@@ -83,7 +83,7 @@ class GuideReadSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Guide
-        fields = "__all__"
+        exclude = ("search_vector",)
 
     @extend_schema_field(AverageGuideRatingSerializer)
     def get_average_rating(self, instance):
@@ -98,6 +98,7 @@ class GuideListSerializer(serializers.ModelSerializer):
     class Meta:
         model = Guide
         fields = ("id", "title", "guide_shots", "minimum_price", "average_rating")
+        list_serializer_class = ThumbnailListSerializer
 
     @extend_schema_field(AverageGuideRatingSerializer)
     def get_average_rating(self, instance):
@@ -107,7 +108,7 @@ class GuideListSerializer(serializers.ModelSerializer):
 class GuideProgramSerializer(serializers.ModelSerializer):
     class Meta:
         model = GuideProgram
-        fields = "__all__"
+        exclude = ("search_vector",)
 
 
 class GuideProgramListSerializer(serializers.ModelSerializer):
@@ -120,7 +121,7 @@ class GuideProgramListSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = GuideProgram
-        exclude = ["services", "venue_lon", "venue_lat", "venue_address", "description"]
+        exclude = ["services", "venue_lon", "venue_lat", "venue_address", "description", "search_vector"]
 
 
 class GuideProgramDetailSerializer(serializers.ModelSerializer):
@@ -134,7 +135,7 @@ class GuideProgramDetailSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = GuideProgram
-        fields = "__all__"
+        exclude = ("search_vector",)
 
 
 class GuideServicesSerializer(serializers.ModelSerializer):
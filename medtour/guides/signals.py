@@ -0,0 +1,10 @@
+from django.db.models.signals import post_save
+from django.dispatch import receiver
+
+from medtour.contrib.sorl_thumbnail_serializer.thumbnails import schedule_thumbnails
+from medtour.guides.models import GuideShots
+
+
+@receiver(post_save, sender=GuideShots)
+def schedule_shot_thumbnails(sender, instance, **kwargs):
+    schedule_thumbnails(instance)
@@ -0,0 +1,84 @@
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from rest_framework.test import APIClient
+
+from medtour.guides.models import Guide, GuideCategory, GuideProgram, GuideReview
+from medtour.tours.models import Tour
+from medtour.users.models import Country, OrganizationCategory, Region, User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def region():
+    return Region.objects.create(name="Алматинская область", country=Country.objects.create(name="Казахстан"))
+
+
+@pytest.fixture
+def tour(region):
+    category = OrganizationCategory.objects.create(title="Санатории")
+    return Tour.objects.create(title="Тур", category=category, region=region, is_moderated=True)
+
+
+def create_guides(region, count):
+    category = GuideCategory.objects.first() or GuideCategory.objects.create(title="Туры", slug="tury")
+    guides = []
+    for _ in range(count):
+        guide = Guide.objects.create(title="Гид", category=category, region=region, is_moderated=True)
+        for price, is_deleted in ((12000, False), (8000, False), (1000, True)):
+            GuideProgram.objects.create(guide=guide, name="Программа", description="-", program="-", price=price,
+                                        venue_lon=0, venue_lat=0, venue_address="-", is_deleted=is_deleted)
+        for number, score in enumerate((5, 4)):
+            GuideReview.objects.create(guide=guide, user=User.objects.create(username="guest{}-{}".format(
+                guide.pk, number)), service=score, location=score, staff=score, proportion=score, text="-")
+        guides.append(guide)
+    return guides
+
+
+def test_guide_annotations_match_average_rating(region):
+    guide = create_guides(region, 1)[0]
+
+    row = Guide.objects.annotate(**Guide.annotations()).get(pk=guide.pk)
+
+    assert row.minimum_price == 8000
+    assert row.average_rating == guide.average_rating
+    assert row.average_rating["service__avg"] == 4.5
+    assert row.average_rating["reviews__count"] == 2
+
+
+@pytest.mark.parametrize("url", ["/v1/guides/?tour_id={tour}", "/v1/manyGuides/?id__in={ids}"])
+def test_guide_list_query_count_does_not_grow(tour, region, url):
+    client = APIClient()
+
+    def get():
+        cache.clear()
+        ids = ",".join(str(pk) for pk in Guide.objects.values_list("pk", flat=True))
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url.format(tour=tour.pk, ids=ids))
+        return response, [query for query in queries.captured_queries if query["sql"].startswith("SELECT")]
+
+    create_guides(region, 1)
+    response, few = get()
+    assert len(response.data) == 1
+
+    create_guides(region, 4)
+    response, many = get()
+
+    assert len(response.data) == 5
+    assert len(many) == len(few)
+    assert response.data[0]["minimum_price"] == 8000
+    assert response.data[0]["average_rating"]["reviews__count"] == 2
+
+
+def test_guide_slug_detail(region):
+    guide = create_guides(region, 1)[0]
+    client = APIClient()
+
+    response = client.get("/v1/guides/slug/{}/".format(guide.slug))
+
+    assert response.status_code == 200
+    assert response.data["average_rating"]["staff__avg"] == 4.5
+    assert "search_vector" not in response.data
+    assert client.get("/v1/guides/slug/net-takogo-gida/").status_code == 404
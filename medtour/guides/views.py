@@ -1,4 +1,4 @@
-from django.db.models import Q, Min
+from django.shortcuts import get_object_or_404
 from django.utils.translation import gettext_lazy as _
 from drf_spectacular.utils import OpenApiParameter, extend_schema
 from rest_framework import viewsets, status, generics
@@ -6,6 +6,7 @@ from rest_framework.decorators import action
 from rest_framework.response import Response
 
 from medtour.contrib.required_field_list_view.viewsets import TourIdRequiredFieldsModelViewSet
+from medtour.contrib.response_cache import cache_response
 from medtour.guides.serializers import GuideProgramSerializer, GuideReviewSerializer, GuideSerializer, \
     GuideServicesSerializer, GuideShotsSerializer, GuideProgramListSerializer, GuideProgramDetailSerializer, \
     GuideListSerializer, GuideReadSerializer, GuidePOSTShotsSerializer
@@ -14,7 +15,8 @@ from medtour.tours.models import Tour
 
 
 class GuideViewSet(TourIdRequiredFieldsModelViewSet):
-    queryset = Guide.objects.select_related("region", "country").prefetch_related("guide_shots")
+    queryset = Guide.objects.select_related("region", "country").prefetch_related("guide_shots").annotate(
+        **Guide.annotations())
     serializer_class = GuideSerializer
     retrieve_serializer_class = GuideReadSerializer
     list_serializer_class = GuideListSerializer
@@ -44,9 +46,7 @@ class GuideViewSet(TourIdRequiredFieldsModelViewSet):
                         "message": _("Не найден подходящий тур")
                     },
                     status=status.HTTP_400_BAD_REQUEST)
-            qs = self.get_queryset().filter(region_id=tour_obj.region_id)[:24].annotate(
-                minimum_price=Min("programs__price", filter=Q(programs__is_deleted=False))
-            ).prefetch_related("guide_shots", "programs")  # TODO: optimize guide_reviews sql queries
+            qs = self.get_queryset().filter(region_id=tour_obj.region_id)[:24]
             serializer = self.get_serializer(qs, many=True)
             return Response(serializer.data)
         else:
@@ -68,13 +68,13 @@ class GuideViewSet(TourIdRequiredFieldsModelViewSet):
                 {
                     "message": _("Обязательный параметр org_id не указан.")},
                 status=status.HTTP_400_BAD_REQUEST)
-        qs = Guide.objects.filter(org_id=org_id)
+        qs = self.get_queryset().filter(org_id=org_id)
         serializer = self.get_serializer(qs, many=True)
         return Response(serializer.data)
 
 
 class GuideReviewViewSet(viewsets.ModelViewSet):
-    queryset = GuideReview.objects.all()
+    queryset = GuideReview.objects.select_related("user__people", "user__organization")
     serializer_class = GuideReviewSerializer
     http_method_names = ["get", "post"]
     filterset_fields = ["guide_id"]
@@ -169,9 +169,7 @@ class GuideServicesViewset(viewsets.ModelViewSet):
 
 
 class GuideManyViewWithoutPagination(generics.ListAPIView):
-    queryset = Guide.objects.annotate(
-        minimum_price=Min("programs__price", filter=Q(programs__is_deleted=False))
-    ).prefetch_related('programs', 'guide_shots')
+    queryset = Guide.objects.annotate(**Guide.annotations()).prefetch_related('guide_shots')
     serializer_class = GuideListSerializer
 
     @extend_schema(summary="Получение много гидов по конкретным id",
@@ -210,14 +208,15 @@ class GuideProgramManyViewWithoutPagination(generics.ListAPIView):
 
 
 class GuideSlugView(generics.RetrieveAPIView):
-    queryset = Guide.objects.all()
+    queryset = Guide.objects.select_related("region", "country").prefetch_related("guide_shots").annotate(
+        **Guide.annotations())
     serializer_class = GuideReadSerializer
     lookup_field = 'slug'
     lookup_url_kwarg = 'slug'
 
+    @cache_response("guides")
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def get_object(self):
-        try:
-            obj = self.queryset.get(slug=self.kwargs.get(self.lookup_url_kwarg))
-        except Tour.DoesNotExist:
-            raise Http404
-        return obj
+        return get_object_or_404(self.get_queryset(), slug=self.kwargs.get(self.lookup_url_kwarg))
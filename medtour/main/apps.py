@@ -6,3 +6,7 @@ class MainConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'medtour.main'
     verbose_name = _("Главный контент")
+
+    def ready(self):
+        import medtour.main.signals  # noqa
+        import medtour.contrib.metrics  # noqa, сигналы celery для метрик задач
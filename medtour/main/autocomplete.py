@@ -0,0 +1,322 @@
+"""
+Подсказки по началу слова для городов, областей, стран, туров и гидов.
+
+Каждое название раскладывается на термины: хвосты названия, начиная с каждого
+слова ("озеро каракол", "каракол"), в нижнем регистре и с ё -> е. Термины лежат в
+отсортированных индексах вида "термин\\0ключ", отдельный индекс на каждый тип и вес
+подсказки (ярус). По префиксу запроса из каждого яруса запрошенных типов берётся
+непрерывный диапазон, кандидаты сортируются по весу, затем по длине названия.
+Поэтому сотни туров с одним префиксом не вытесняют города из выдачи.
+
+На проде индекс в Redis кэша по умолчанию: sorted set с одинаковым score и
+ZRANGEBYLEX, данные подсказок в хэше. Для других бэкендов кэша индекс держится в
+памяти процесса (локально и в тестах, где задачи celery выполняются сразу). Запрос
+подсказок в PostgreSQL не ходит: пока индекса нет, подсказок нет, а сборка из базы
+ставится задачей medtour.main.tasks.rebuild_autocomplete (или командой
+rebuild_autocomplete при деплое). Сигналы моделей обновляют индекс после коммита по
+одной записи.
+"""
+import json
+import logging
+import re
+import threading
+from bisect import bisect_left, insort
+
+from django.core.cache import cache
+from django.db.models import Q
+from redis.exceptions import LockError, RedisError
+
+from medtour.guides.models import Guide
+from medtour.tours.models import Tour
+from medtour.users.models import City, Country, Region
+
+INDEX_KEY = "autocomplete:v2:index"
+ITEMS_KEY = "autocomplete:v2:items"
+MAX_TERM_LENGTH = 40
+CANDIDATES = 100
+SEPARATOR = "\x00"
+REBUILD_LOCK_TIMEOUT = 10 * 60
+
+logger = logging.getLogger(__name__)
+
+WORD_RE = re.compile(r"\w+")
+
+
+def normalize(text):
+    return " ".join(WORD_RE.findall((text or "").casefold().replace("ё", "е")))
+
+
+def terms(title):
+    words = normalize(title).split(" ")
+    return {" ".join(words[position:])[:MAX_TERM_LENGTH] for position in range(len(words)) if words[position]}
+
+
+# Сущности
+# ------------------------------------------------------------------------------
+
+# Возможные веса подсказок каждого типа
+WEIGHTS = {"cities": (5, 4), "regions": (3,), "countries": (2,), "tours": (2, 1), "guides": (2, 1)}
+
+
+def tier(kind, weight):
+    return "{}:{}".format(kind, weight)
+
+
+def item_tier(item):
+    return tier(item["type"], item["weight"])
+
+
+TIERS = [tier(kind, weight) for kind, weights in WEIGHTS.items() for weight in weights]
+
+
+def city_item(city):
+    return {"type": "cities", "id": city.id, "title": city.name, "slug": city.slug,
+            "weight": 5 if city.is_first_page else 4}
+
+
+def region_item(region):
+    return {"type": "regions", "id": region.id, "title": region.name, "slug": None, "weight": 3}
+
+
+def country_item(country):
+    return {"type": "countries", "id": country.id, "title": country.name, "slug": None, "weight": 2}
+
+
+def tour_item(tour):
+    return {"type": "tours", "id": tour.id, "title": tour.title, "slug": tour.slug, "weight": 1 + tour.is_top}
+
+
+def guide_item(guide):
+    return {"type": "guides", "id": guide.id, "title": guide.title, "slug": guide.slug, "weight": 1 + guide.is_top}
+
+
+PUBLISHED = Q(is_moderated=True, is_deleted=False)
+
+# модель: (тип, функция подсказки, условие попадания в индекс, поля для сборки)
+SOURCES = {
+    City: ("cities", city_item, Q(), ("id", "name", "slug", "is_first_page")),
+    Region: ("regions", region_item, Q(), ("id", "name")),
+    Country: ("countries", country_item, Q(), ("id", "name")),
+    Tour: ("tours", tour_item, PUBLISHED, ("id", "title", "slug", "is_top")),
+    Guide: ("guides", guide_item, PUBLISHED, ("id", "title", "slug", "is_top")),
+}
+TYPES = tuple(source[0] for source in SOURCES.values())
+
+
+def item_key(item):
+    return "{}:{}".format(item["type"], item["id"])
+
+
+def iter_items():
+    for model, (kind, make_item, condition, fields) in SOURCES.items():
+        for instance in model.objects.filter(condition).only(*fields).order_by().iterator(chunk_size=2000):
+            yield make_item(instance)
+
+
+# Хранилища
+# ------------------------------------------------------------------------------
+
+class LocalIndex:
+    """Индекс в памяти процесса"""
+
+    def __init__(self):
+        self.tiers = {}
+        self.items = {}
+        self.built = False
+        self.lock = threading.Lock()
+
+    def is_built(self):
+        return self.built
+
+    def replace(self, items):
+        tiers, by_key = {}, {}
+        for item in items:
+            key = item_key(item)
+            by_key[key] = item
+            tiers.setdefault(item_tier(item), []).extend(term + SEPARATOR + key for term in terms(item["title"]))
+        for entries in tiers.values():
+            entries.sort()
+        with self.lock:
+            self.tiers, self.items, self.built = tiers, by_key, True
+        return True
+
+    def put(self, key, item):
+        with self.lock:
+            old = self.items.pop(key, None)
+            if old is not None:
+                entries = self.tiers.get(item_tier(old), [])
+                for term in terms(old["title"]):
+                    position = bisect_left(entries, term + SEPARATOR + key)
+                    if position < len(entries) and entries[position] == term + SEPARATOR + key:
+                        del entries[position]
+            if item is not None:
+                self.items[key] = item
+                entries = self.tiers.setdefault(item_tier(item), [])
+                for term in terms(item["title"]):
+                    insort(entries, term + SEPARATOR + key)
+
+    def candidates(self, prefix, tiers, limit):
+        """Первые limit подсказок по префиксу из каждого яруса"""
+        with self.lock:
+            keys = []
+            for name in tiers:
+                entries = self.tiers.get(name, [])
+                position = bisect_left(entries, prefix)
+                for entry in entries[position:position + limit]:
+                    if not entry.startswith(prefix):
+                        break
+                    keys.append(entry.rsplit(SEPARATOR, 1)[1])
+            return [self.items[key] for key in dict.fromkeys(keys)]
+
+    def clear(self):
+        with self.lock:
+            self.tiers, self.items, self.built = {}, {}, False
+
+
+class RedisIndex:
+    """Общий для всех процессов индекс: sorted set терминов на каждый ярус и хэш подсказок"""
+
+    def __init__(self, client, index_key, items_key):
+        self.client = client
+        self.index_key = index_key
+        self.items_key = items_key
+
+    def tier_key(self, name, suffix=""):
+        return "{}:{}{}".format(self.index_key, name, suffix)
+
+    def is_built(self):
+        return bool(self.client.exists(self.items_key))
+
+    def replace(self, items, chunk=5000):
+        """Пересобирает индекс, False — индекс уже собирает другой процесс"""
+        # Параллельные сборки писали бы в одни и те же временные ключи
+        lock = self.client.lock(self.index_key + ":lock", timeout=REBUILD_LOCK_TIMEOUT)
+        if not lock.acquire(blocking=False):
+            return False
+        try:
+            self.build(items, chunk)
+        finally:
+            try:
+                lock.release()
+            except LockError:  # сборка дольше REBUILD_LOCK_TIMEOUT, блокировка уже истекла
+                pass
+        return True
+
+    def build(self, items, chunk):
+        # Собираем во временные ключи и подменяем RENAME, читатели не видят пустой индекс
+        items_key, written = self.items_key + ":new", set()
+        self.client.delete(items_key, *[self.tier_key(name, ":new") for name in TIERS])
+        pipeline = self.client.pipeline(transaction=False)
+        for count, item in enumerate(items, 1):
+            key = item_key(item)
+            pipeline.hset(items_key, key, json.dumps(item, ensure_ascii=False))
+            entries = {term + SEPARATOR + key: 0 for term in terms(item["title"])}
+            if entries:
+                written.add(item_tier(item))
+                pipeline.zadd(self.tier_key(item_tier(item), ":new"), entries)
+            if not count % chunk:
+                pipeline.execute()
+        # Пустой каталог: служебное поле, чтобы индекс считался собранным
+        pipeline.hset(items_key, "", "{}")
+        pipeline.execute()
+        pipeline = self.client.pipeline()
+        for name in TIERS:
+            if name in written:
+                pipeline.rename(self.tier_key(name, ":new"), self.tier_key(name))
+            else:
+                pipeline.delete(self.tier_key(name))
+        pipeline.rename(items_key, self.items_key)
+        pipeline.execute()
+
+    def put(self, key, item):
+        old = self.client.hget(self.items_key, key)
+        pipeline = self.client.pipeline()
+        if old is not None:
+            old = json.loads(old)
+            old_terms = [term + SEPARATOR + key for term in terms(old["title"])]
+            if old_terms:
+                pipeline.zrem(self.tier_key(item_tier(old)), *old_terms)
+            pipeline.hdel(self.items_key, key)
+        if item is not None:
+            pipeline.hset(self.items_key, key, json.dumps(item, ensure_ascii=False))
+            entries = {term + SEPARATOR + key: 0 for term in terms(item["title"])}
+            if entries:
+                pipeline.zadd(self.tier_key(item_tier(item)), entries)
+        pipeline.execute()
+
+    def candidates(self, prefix, tiers, limit):
+        """Первые limit подсказок по префиксу из каждого яруса: один запрос на все ярусы и один HMGET"""
+        prefix = prefix.encode()
+        pipeline = self.client.pipeline(transaction=False)
+        for name in tiers:
+            pipeline.zrangebylex(self.tier_key(name), b"[" + prefix, b"[" + prefix + b"\xff", start=0, num=limit)
+        entries = [entry for found in pipeline.execute() for entry in found]
+        keys = list(dict.fromkeys(entry.decode().rsplit(SEPARATOR, 1)[1] for entry in entries))
+        if not keys:
+            return []
+        return [json.loads(value) for value in self.client.hmget(self.items_key, keys) if value is not None]
+
+    def clear(self):
+        self.client.delete(self.items_key, *[self.tier_key(name) for name in TIERS])
+
+
+_index = None
+
+
+def get_index():
+    global _index
+    if _index is None:
+        client = getattr(cache, "client", None)
+        if hasattr(client, "get_client"):
+            _index = RedisIndex(client.get_client(write=True), cache.make_key(INDEX_KEY), cache.make_key(ITEMS_KEY))
+        else:
+            _index = LocalIndex()
+    return _index
+
+
+# API
+# ------------------------------------------------------------------------------
+
+def rebuild():
+    """Пересобирает индекс из базы, False — индекс уже собирает другой процесс"""
+    return get_index().replace(iter_items())
+
+
+def suggest(query, types=TYPES, limit=10):
+    """
+    Лучшие limit подсказок для начала слова query. Пока индекс не собран или Redis
+    недоступен, подсказок нет; сборка индекса ставится в очередь celery.
+    """
+    from medtour.main.tasks import request_autocomplete_rebuild
+
+    prefix = normalize(query)[:MAX_TERM_LENGTH]
+    if not prefix:
+        return []
+    tiers = [tier(kind, weight) for kind in types for weight in WEIGHTS[kind]]
+    index = get_index()
+    try:
+        if not index.is_built():
+            request_autocomplete_rebuild()
+            return []
+        items = index.candidates(prefix, tiers, CANDIDATES)
+    except RedisError as e:
+        logger.warning("Autocomplete index is unavailable: %s", e)
+        return []
+    items.sort(key=lambda item: (-item["weight"], len(item["title"]), item["title"]))
+    return items[:limit]
+
+
+def update(sender, pk):
+    """
+    Переиндексирует одну запись модели sender, вызывается из сигналов после коммита.
+    Ошибка Redis не должна ронять сохранение, запись догонит следующая сборка индекса.
+    """
+    kind, make_item, condition, fields = SOURCES[sender]
+    index = get_index()
+    try:
+        if not index.is_built():
+            return
+        instance = sender.objects.filter(condition, pk=pk).only(*fields).first()
+        index.put("{}:{}".format(kind, pk), make_item(instance) if instance is not None else None)
+    except RedisError as e:
+        logger.warning("Autocomplete index update of %s %s failed: %s", kind, pk, e)
@@ -0,0 +1,39 @@
+"""
+Лента туров и гидов главной страницы (ToursGuidesView) из витрины Listing.
+
+Страница ленты — один индексированный SELECT по main_listing с курсорной
+пагинацией (medtour.contrib.pagination.CompositeCursorPagination). Рейтинг, минимальная
+цена и миниатюры в витрине уже посчитаны.
+"""
+from medtour.main.models import Listing
+
+NO_PRICE = Listing.NO_PRICE
+
+ORDERINGS = {
+    "top": ("-is_top", "-created_at", "type", "-object_id"),
+    "new": ("-created_at", "type", "-object_id"),
+    "rating": ("-rating", "-comments_count", "type", "-object_id"),
+    "price": ("price", "type", "object_id"),
+}
+# Отдельные туры и гиды, как и до витрины, по умолчанию идут от новых к старым
+DEFAULT_ORDERINGS = {"all": "top", "tours": "new", "guides": "new"}
+
+FEED_FIELDS = (
+    "type", "object_id", "title", "slug", "is_top", "created_at", "city_name", "category_title", "category_slug",
+    "rating", "comments_count", "price", "shots",
+)
+
+
+def get_feed(entity, city="all", category_slug=None, is_top=None, ids=None):
+    queryset = Listing.objects.all()
+    if entity != "all":
+        queryset = queryset.filter(type=entity)
+    if city != "all":
+        queryset = queryset.filter(city_slug=city)
+    if category_slug:
+        queryset = queryset.filter(category_slug=category_slug)
+    if is_top is not None:
+        queryset = queryset.filter(is_top=is_top)
+    if ids:
+        queryset = queryset.filter(object_id__in=ids)
+    return queryset.values(*FEED_FIELDS)
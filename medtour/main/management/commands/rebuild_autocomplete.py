@@ -0,0 +1,17 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from medtour.main import autocomplete
+
+
+class Command(BaseCommand):
+    help = "Rebuilds the autocomplete index of cities, regions, countries, tours and guides from the database"
+
+    def handle(self, *args, **options):
+        started = time.perf_counter()
+        if not autocomplete.rebuild():
+            self.stdout.write(self.style.WARNING("Autocomplete index is already being rebuilt by another process"))
+            return
+        self.stdout.write(self.style.SUCCESS("Autocomplete index rebuilt in {:.1f}s".format(
+            time.perf_counter() - started)))
@@ -0,0 +1,104 @@
+# Generated by Django 3.2.15 on 2026-10-18 13:03
+
+import django.contrib.postgres.fields
+from django.db import migrations, models
+
+
+# Туры и гиды одной проекцией. Миниатюры: имя из манифеста, если он построен для
+# текущего фото, иначе исходное фото (как ThumbnailBatch до рендера).
+CREATE_LISTING = """
+    CREATE MATERIALIZED VIEW main_listing AS
+    SELECT 'tours:' || t.id AS key, 'tours'::varchar AS type, t.id AS object_id, t.title, t.slug, t.is_top,
+           t.created_at, c.slug AS city_slug, c.name AS city_name,
+           cat.slug AS category_slug, cat.title AS category_title,
+           COALESCE((s.service_avg + s.location_avg + s.staff_avg + s.proportion_avg + s.purity_avg) / 5, 0)
+               AS rating,
+           COALESCE(s.comments_count, 0) AS comments_count,
+           COALESCE(s.minimum_price, 2147483647) AS price,
+           ARRAY(
+               SELECT CASE WHEN sh.thumbnails_source = sh.photo
+                           THEN COALESCE(sh.thumbnails ->> '570x360', sh.photo) ELSE sh.photo END
+               FROM tours_tourshots sh WHERE sh.tour_id = t.id AND sh.photo <> ''
+               ORDER BY sh."order", sh.id LIMIT 5
+           )::varchar[] AS shots
+    FROM tours_tour t
+    JOIN users_organizationcategory cat ON cat.id = t.category_id
+    LEFT JOIN users_city c ON c.id = t.city_id
+    LEFT JOIN tours_toursummary s ON s.tour_id = t.id
+    WHERE t.is_moderated AND NOT t.is_deleted
+
+    UNION ALL
+
+    SELECT 'guides:' || g.id, 'guides', g.id, g.title, g.slug, g.is_top,
+           g.created_at, c.slug, c.name,
+           cat.slug, cat.title,
+           COALESCE(r.rating, 0),
+           COALESCE(r.comments_count, 0),
+           COALESCE(p.price, 2147483647),
+           ARRAY(
+               SELECT CASE WHEN sh.thumbnails_source = sh.photo
+                           THEN COALESCE(sh.thumbnails ->> '570x360', sh.photo) ELSE sh.photo END
+               FROM guides_guideshots sh WHERE sh.guide_id = g.id AND sh.photo <> ''
+               ORDER BY sh."order", sh.id LIMIT 5
+           )::varchar[]
+    FROM guides_guide g
+    JOIN guides_guidecategory cat ON cat.id = g.category_id
+    LEFT JOIN users_city c ON c.id = g.city_id
+    LEFT JOIN LATERAL (
+        SELECT (avg(service) + avg(location) + avg(staff) + avg(proportion))::float / 4 AS rating,
+               count(*) AS comments_count
+        FROM guides_guidereview WHERE guide_id = g.id HAVING count(*) > 0
+    ) r ON true
+    LEFT JOIN LATERAL (
+        SELECT min(price) AS price FROM guides_guideprogram WHERE guide_id = g.id AND NOT is_deleted
+    ) p ON true
+    WHERE g.is_moderated AND NOT g.is_deleted;
+
+    CREATE UNIQUE INDEX main_listing_key ON main_listing (key);
+    CREATE INDEX main_listing_city_category ON main_listing (city_slug, category_slug);
+    CREATE INDEX main_listing_top ON main_listing (is_top DESC, created_at DESC, type, object_id DESC);
+    CREATE INDEX main_listing_new ON main_listing (created_at DESC, type, object_id DESC);
+    CREATE INDEX main_listing_rating ON main_listing (rating DESC, comments_count DESC, type, object_id DESC);
+    CREATE INDEX main_listing_price ON main_listing (price, type, object_id);
+"""
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('tours', '0006_search_vector'),
+        ('guides', '0004_search_vector'),
+        ('users', '0002_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunSQL(CREATE_LISTING, "DROP MATERIALIZED VIEW main_listing"),
+        migrations.CreateModel(
+            name='Listing',
+            fields=[
+                ('key', models.CharField(max_length=32, primary_key=True, serialize=False)),
+                ('type', models.CharField(max_length=10, verbose_name='Сущность')),
+                ('object_id', models.BigIntegerField()),
+                ('title', models.CharField(max_length=1000, verbose_name='Название')),
+                ('slug', models.CharField(max_length=255, verbose_name='Слаг')),
+                ('is_top', models.BooleanField(verbose_name='Хиты продаж?')),
+                ('created_at', models.DateTimeField()),
+                ('city_slug', models.CharField(max_length=255, null=True)),
+                ('city_name', models.CharField(max_length=100, null=True)),
+                ('category_slug', models.CharField(max_length=255)),
+                ('category_title', models.CharField(max_length=100)),
+                ('rating', models.FloatField(verbose_name='Рейтинг')),
+                ('comments_count', models.IntegerField(verbose_name='Количество отзывов')),
+                ('price', models.IntegerField(verbose_name='Минимальная цена')),
+                ('shots', django.contrib.postgres.fields.ArrayField(base_field=models.CharField(max_length=1000), size=None, verbose_name='Миниатюры 570x360')),
+            ],
+            options={
+                'verbose_name': 'Витрина главной страницы',
+                'verbose_name_plural': 'Витрина главной страницы',
+                'db_table': 'main_listing',
+                'managed': False,
+            },
+        ),
+    ]
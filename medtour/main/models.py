@@ -0,0 +1,48 @@
+from django.contrib.postgres.fields import ArrayField
+from django.db import connection, models
+from django.utils.translation import gettext_lazy as _
+
+
+class Listing(models.Model):
+    """
+    Витрина главной страницы: опубликованные туры и гиды с готовыми рейтингом,
+    минимальной ценой и миниатюрами. Материализованное представление main_listing
+    (миграция main.0001), обновляется задачей medtour.main.tasks.refresh_listing
+    по расписанию и после изменений каталога.
+
+    Ключи сортировки не бывают NULL: рейтинг без отзывов 0, цена без номеров и
+    программ NO_PRICE.
+    """
+    NO_PRICE = 2 ** 31 - 1
+    SHOTS_COUNT = 5
+
+    key = models.CharField(primary_key=True, max_length=32)
+    type = models.CharField(_("Сущность"), max_length=10)
+    object_id = models.BigIntegerField()
+    title = models.CharField(_("Название"), max_length=1000)
+    slug = models.CharField(_("Слаг"), max_length=255)
+    is_top = models.BooleanField(_("Хиты продаж?"))
+    created_at = models.DateTimeField()
+    city_slug = models.CharField(max_length=255, null=True)
+    city_name = models.CharField(max_length=100, null=True)
+    category_slug = models.CharField(max_length=255)
+    category_title = models.CharField(max_length=100)
+    rating = models.FloatField(_("Рейтинг"))
+    comments_count = models.IntegerField(_("Количество отзывов"))
+    price = models.IntegerField(_("Минимальная цена"))
+    shots = ArrayField(models.CharField(max_length=1000), verbose_name=_("Миниатюры 570x360"))
+
+    class Meta:
+        managed = False
+        db_table = "main_listing"
+        verbose_name = _("Витрина главной страницы")
+        verbose_name_plural = _("Витрина главной страницы")
+
+    def __str__(self):
+        return self.key
+
+    @classmethod
+    def refresh(cls):
+        """Пересобирает витрину, не блокируя чтение (нужен уникальный индекс по key)"""
+        with connection.cursor() as cursor:
+            cursor.execute("REFRESH MATERIALIZED VIEW CONCURRENTLY {}".format(cls._meta.db_table))
@@ -0,0 +1,82 @@
+"""
+Полнотекстовый поиск по турам, гидам, программам гидов и городам.
+
+Колонку search_vector в каждой таблице заполняет триггер PostgreSQL (миграции
+*_search_vector): название с весом A, описание B, адрес C, в конфигурациях russian
+(стемминг) и simple (слова как есть). Словаря со стеммингом для казахского в
+PostgreSQL нет, казахские слова и имена находятся через simple.
+
+Если на сервере установлено расширение pg_trgm, к рангу добавляется триграммная
+похожесть названия и находятся названия с опечатками и недописанными словами. Без
+расширения поиск только полнотекстовый.
+
+Все сущности собираются одним UNION ALL запросом, отсортированным по рангу.
+"""
+from django.contrib.postgres.search import SearchQuery, SearchRank, TrigramSimilarity
+from django.db import connections, models
+from django.db.models import F, Q, Value
+
+from medtour.guides.models import Guide, GuideProgram
+from medtour.tours.models import Tour
+from medtour.users.models import City
+
+SEARCH_CONFIGS = ("russian", "simple")
+ENTITIES = ("tours", "guides", "programs", "cities")
+
+
+def get_sources():
+    """{сущность: (queryset, поле названия, поле слага)}"""
+    return {
+        "tours": (Tour.objects.filter(is_moderated=True, is_deleted=False), "title", "slug"),
+        "guides": (Guide.objects.filter(is_moderated=True, is_deleted=False), "title", "slug"),
+        "programs": (
+            GuideProgram.objects.filter(is_deleted=False, hide=False, guide__is_moderated=True,
+                                        guide__is_deleted=False),
+            "name", "guide__slug",
+        ),
+        "cities": (City.objects.all(), "name", "slug"),
+    }
+
+
+_trigram = {}
+
+
+def has_trigram(using="default"):
+    """Установлен ли pg_trgm, проверяется один раз на процесс"""
+    if using not in _trigram:
+        with connections[using].cursor() as cursor:
+            cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+            _trigram[using] = cursor.fetchone() is not None
+    return _trigram[using]
+
+
+def search_query(text):
+    query = None
+    for config in SEARCH_CONFIGS:
+        part = SearchQuery(text, config=config, search_type="websearch")
+        query = part if query is None else query | part
+    return query
+
+
+def source_queryset(entity, text, query, trigram):
+    queryset, title, slug = get_sources()[entity]
+    rank = SearchRank(F("search_vector"), query)
+    match = Q(search_vector=query)
+    if trigram:
+        rank = rank + TrigramSimilarity(title, text)
+        match |= Q(**{"{}__trigram_similar".format(title): text})
+    return queryset.filter(match).annotate(
+        type=Value(entity, output_field=models.CharField()),
+        label=F(title),
+        link=F(slug),
+        rank=rank,
+    ).values("id", "type", "label", "link", "rank").order_by()
+
+
+def search(text, entities=ENTITIES):
+    """Ранжированные совпадения: словари id, type, label, link, rank"""
+    query = search_query(text)
+    trigram = has_trigram()
+    querysets = [source_queryset(entity, text, query, trigram) for entity in entities]
+    combined = querysets[0].union(*querysets[1:], all=True) if len(querysets) > 1 else querysets[0]
+    return combined.order_by("-rank", "type", "id")
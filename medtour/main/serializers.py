@@ -1,62 +1,35 @@
-from drf_spectacular.plumbing import build_array_type, build_basic_type
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema_field, OpenApiExample
 from rest_framework import serializers
-from sorl.thumbnail import get_thumbnail
 
+from medtour.main.autocomplete import TYPES
+from medtour.main.feed import NO_PRICE
+from medtour.main.search import ENTITIES
 from medtour.users.models import City
 
 
 class ContentSerializer(serializers.Serializer):
-    id = serializers.IntegerField(read_only=True)
+    """Строка ленты главной страницы из витрины, см. medtour.main.feed"""
+    id = serializers.IntegerField(source="object_id", read_only=True)
     title = serializers.CharField(default="Көктерек")
     avg_rating = serializers.SerializerMethodField(allow_null=True, default=3.5)
     slug = serializers.CharField(default="kokterek")
-    type = serializers.CharField(default="tour")
-    shots = serializers.SerializerMethodField(allow_null=True,
-                                              default=["cache/72/12/7212a7f6ff2346379687fc5a9419c039.webp"])
-    city = serializers.SerializerMethodField(allow_null=True)
-    minimum_price = serializers.IntegerField(read_only=True)
-    category = serializers.SerializerMethodField(read_only=True)
-    category_slug = serializers.SerializerMethodField(read_only=True)
+    type = serializers.CharField(default="tours")
+    shots = serializers.ListField(child=serializers.CharField(),
+                                  default=["cache/72/12/7212a7f6ff2346379687fc5a9419c039.webp"])
+    city = serializers.CharField(source="city_name", allow_null=True)
+    minimum_price = serializers.SerializerMethodField(allow_null=True)
+    category = serializers.CharField(source="category_title")
+    category_slug = serializers.CharField()
     is_top = serializers.BooleanField()
 
     @extend_schema_field(OpenApiTypes.NUMBER)
     def get_avg_rating(self, obj):
-        rating_dict = {
-            'service': obj.service__avg,
-            'location': obj.location__avg,
-            'staff': obj.staff__avg,
-            'proportion': obj.proportion__avg,
-        }
-        if hasattr(obj, 'purity__avg'):
-            rating_dict.update({'purity__avg': obj.purity__avg})
-        values = [value for value in rating_dict.values() if value is not None]
-        average = round(sum(values) / len(values), 2) if values else None
-        return average
-
-    @extend_schema_field(build_array_type(build_basic_type(OpenApiTypes.STR)))
-    def get_shots(self, obj):
-        options = {"crop": "center"}
-
-        shots_attributes = [attr for attr in dir(obj) if attr.endswith('_shots')]
-        images_attr = getattr(obj, shots_attributes[0])
-        images_qs = images_attr.all()
-        return [get_thumbnail(shot.photo, '570x360', **options).name for shot in images_qs]
-
-    @extend_schema_field(OpenApiTypes.STR)
-    def get_city(self, obj):
-        if hasattr(obj.city, 'name'):
-            return obj.city.name
-        return None
-
-    @extend_schema_field(OpenApiTypes.STR)
-    def get_category(self, obj):
-        return obj.category.title
-
-    @extend_schema_field(OpenApiTypes.STR)
-    def get_category_slug(self, obj):
-        return obj.category.slug
+        return round(obj["rating"], 2) if obj["comments_count"] else None
+
+    @extend_schema_field(OpenApiTypes.INT)
+    def get_minimum_price(self, obj):
+        return obj["price"] if obj["price"] != NO_PRICE else None
 
 
 class SearchCitySerializer(serializers.ModelSerializer):
@@ -78,3 +51,29 @@ class CategorySerializer(serializers.Serializer):
     icon_active = serializers.ImageField()
     column = serializers.CharField()
     type = serializers.CharField()
+
+
+class SearchParamsSerializer(serializers.Serializer):
+    q = serializers.CharField(min_length=2, max_length=200)
+    type = serializers.MultipleChoiceField(choices=ENTITIES, required=False)
+
+
+class SearchResultSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    type = serializers.CharField(default="tours")
+    title = serializers.CharField(source="label", default="Көктерек")
+    slug = serializers.CharField(source="link", default="kokterek")
+    rank = serializers.FloatField()
+
+
+class AutocompleteParamsSerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=100)
+    type = serializers.MultipleChoiceField(choices=TYPES, required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=20, default=10)
+
+
+class AutocompleteSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    type = serializers.CharField(default="cities")
+    title = serializers.CharField(default="Алматы")
+    slug = serializers.CharField(allow_null=True, default="almaty")
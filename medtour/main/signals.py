@@ -0,0 +1,75 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+
+from medtour.contrib.response_cache import invalidate_on_commit
+from medtour.contrib.sorl_thumbnail_serializer.thumbnails import thumbnails_rendered
+from medtour.guides.models import Guide, GuideCategory, GuideProgram, GuideReview, GuideShots
+from medtour.main import autocomplete
+from medtour.main.tasks import request_listing_refresh
+from medtour.tournumbers.models import TourNumbers
+from medtour.tourpackages.models import TourPackages
+from medtour.tours.models import (
+    Tour, TourShots, CommentTour, TourSummary, TourAdditionalTitle, AdditionalInfoServices, TourPaidServices
+)
+from medtour.users.models import City, Country, OrganizationCategory, Region
+
+# Какие теги кэша ответов сбрасывает изменение модели, см. medtour.contrib.response_cache
+CACHE_TAGS = {
+    Tour: ("tours",),
+    TourShots: ("tours",),
+    CommentTour: ("tours",),
+    TourNumbers: ("tours",),
+    TourSummary: ("tours",),
+    TourAdditionalTitle: ("tours",),
+    AdditionalInfoServices: ("tours",),
+    TourPaidServices: ("tours",),
+    TourPackages: ("tours",),
+    Guide: ("guides",),
+    GuideShots: ("guides",),
+    GuideReview: ("guides",),
+    GuideProgram: ("guides",),
+    City: ("cities",),
+    Region: ("cities",),
+    Country: ("cities",),
+    OrganizationCategory: ("categories",),
+    GuideCategory: ("categories",),
+}
+
+
+def invalidate_response_cache(sender, **kwargs):
+    invalidate_on_commit(*CACHE_TAGS[sender])
+
+
+for model in CACHE_TAGS:
+    post_save.connect(invalidate_response_cache, sender=model, dispatch_uid="response_cache_save")
+    post_delete.connect(invalidate_response_cache, sender=model, dispatch_uid="response_cache_delete")
+
+
+def update_autocomplete(sender, instance, **kwargs):
+    pk = instance.pk  # после удаления к моменту коммита pk у instance уже None
+    transaction.on_commit(lambda: autocomplete.update(sender, pk))
+
+
+for model in autocomplete.SOURCES:
+    post_save.connect(update_autocomplete, sender=model, dispatch_uid="autocomplete_save")
+    post_delete.connect(update_autocomplete, sender=model, dispatch_uid="autocomplete_delete")
+
+
+# Изменения, которые видны в витрине главной страницы, см. medtour.main.models.Listing
+LISTING_SOURCES = (
+    Tour, TourShots, TourSummary, Guide, GuideShots, GuideReview, GuideProgram, City, OrganizationCategory,
+    GuideCategory,
+)
+
+
+def schedule_listing_refresh(sender, **kwargs):
+    transaction.on_commit(request_listing_refresh)
+
+
+for model in LISTING_SOURCES:
+    post_save.connect(schedule_listing_refresh, sender=model, dispatch_uid="listing_save")
+    post_delete.connect(schedule_listing_refresh, sender=model, dispatch_uid="listing_delete")
+
+# Манифест миниатюр пишется через update(), витрина должна перейти на готовые миниатюры
+for model in (TourShots, GuideShots):
+    thumbnails_rendered.connect(schedule_listing_refresh, sender=model, dispatch_uid="listing_thumbnails")
@@ -0,0 +1,38 @@
+from celery import shared_task
+from django.core.cache import cache
+
+from medtour.contrib.response_cache import invalidate
+from medtour.main import autocomplete
+from medtour.main.models import Listing
+
+REFRESH_SCHEDULED_KEY = "listing:refresh-scheduled"
+# Изменения каталога за эти секунды попадают в одно обновление витрины
+REFRESH_DELAY = 5
+AUTOCOMPLETE_SCHEDULED_KEY = "autocomplete:rebuild-scheduled"
+
+
+@shared_task
+def refresh_listing():
+    cache.delete(REFRESH_SCHEDULED_KEY)
+    Listing.refresh()
+    invalidate("listing")
+
+
+def request_listing_refresh():
+    """Ставит обновление витрины, если оно ещё не стоит в очереди; вызывается после коммита"""
+    if cache.add(REFRESH_SCHEDULED_KEY, 1, timeout=REFRESH_DELAY * 12):
+        refresh_listing.apply_async(countdown=REFRESH_DELAY)
+
+
+@shared_task
+def rebuild_autocomplete():
+    try:
+        autocomplete.rebuild()
+    finally:
+        cache.delete(AUTOCOMPLETE_SCHEDULED_KEY)
+
+
+def request_autocomplete_rebuild():
+    """Ставит сборку индекса подсказок, если она ещё не стоит в очереди"""
+    if cache.add(AUTOCOMPLETE_SCHEDULED_KEY, 1, timeout=autocomplete.REBUILD_LOCK_TIMEOUT):
+        rebuild_autocomplete.delay()
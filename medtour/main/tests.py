@@ -0,0 +1,227 @@
+import json
+from base64 import b64encode
+
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from redis.exceptions import ConnectionError as RedisConnectionError
+from rest_framework.test import APIClient
+
+from medtour.guides.models import Guide, GuideCategory, GuideProgram
+from medtour.main import autocomplete, tasks
+from medtour.tours.models import Tour, TourSummary
+from medtour.users.models import City, Country, OrganizationCategory, Region
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    cache.clear()
+
+
+@pytest.fixture
+def tour():
+    category = OrganizationCategory.objects.create(title="Санатории", slug="sanatorii")
+    return Tour.objects.create(title="Тур", category=category, is_moderated=True)
+
+
+def test_records_response_is_cached_until_tour_changes(tour, django_capture_on_commit_callbacks):
+    client = APIClient()
+    first = client.get("/v1/records/all/tours/")
+    assert first["X-Cache"] == "MISS"
+
+    with CaptureQueriesContext(connection) as queries:
+        second = client.get("/v1/records/all/tours/")
+    assert second["X-Cache"] == "HIT"
+    assert not [query for query in queries.captured_queries if query["sql"].startswith("SELECT")]
+    assert second.data == first.data
+
+    assert client.get("/v1/records/all/tours/", {"category__slug": "sanatorii"})["X-Cache"] == "MISS"
+
+    with django_capture_on_commit_callbacks(execute=True):
+        tour.title = "Новое название"
+        tour.save()
+
+    third = client.get("/v1/records/all/tours/")
+    assert third["X-Cache"] == "MISS"
+    assert third.data["results"][0]["title"] == "Новое название"
+
+
+def test_error_responses_are_not_cached():
+    client = APIClient()
+    client.get("/v1/records/all/unknown/")
+
+    response = client.get("/v1/records/all/unknown/")
+    assert response.status_code == 400
+    assert not response.has_header("X-Cache")
+
+
+def test_search_ranks_stemmed_matches_across_entities(tour, django_capture_on_commit_callbacks):
+    tour.description = "Лечение минеральными водами и грязями"
+    tour.save()
+    Tour.objects.create(title="Минеральные воды", category=tour.category, is_moderated=True)
+    Tour.objects.create(title="Минеральные воды", category=tour.category)
+    guide = Guide.objects.create(title="Көктерек", category=GuideCategory.objects.create(title="Горы"),
+                                 is_moderated=True)
+    GuideProgram.objects.create(guide=guide, name="Поход к минеральному источнику", description="Вода",
+                                program="", price=1000, venue_lon=0, venue_lat=0, venue_address="")
+    client = APIClient()
+
+    response = client.get("/v1/search/", {"q": "минеральная вода"})
+    assert response.status_code == 200
+    assert [(row["type"], row["title"]) for row in response.data["results"]] == [
+        ("tours", "Минеральные воды"),
+        ("programs", "Поход к минеральному источнику"),
+        ("tours", "Тур"),
+    ]
+    assert response.data["results"][1]["slug"] == guide.slug
+
+    # Казахские слова ищутся без стемминга, название ищется после изменения
+    assert client.get("/v1/search/", {"q": "көктерек"}).data["results"][0]["slug"] == guide.slug
+    with django_capture_on_commit_callbacks(execute=True):
+        tour.title = "Сарыагаш"
+        tour.save()
+    response = client.get("/v1/search/", {"q": "Сарыагаш", "type": ["tours", "cities"]})
+    assert [row["id"] for row in response.data["results"]] == [tour.id]
+
+
+@pytest.mark.parametrize("model", [Tour, Guide, GuideProgram, City])
+def test_search_vector_is_not_loaded_by_default(model):
+    assert "search_vector" not in str(model.objects.all().query)
+
+
+def test_tour_list_does_not_select_search_vector(tour):
+    with CaptureQueriesContext(connection) as queries:
+        assert APIClient().get("/v1/tours/").status_code == 200
+
+    assert not [query for query in queries.captured_queries if "search_vector" in query["sql"]]
+
+
+def test_search_validates_query():
+    client = APIClient()
+    assert client.get("/v1/search/").status_code == 400
+    assert client.get("/v1/search/", {"q": "а"}).status_code == 400
+    assert client.get("/v1/search/", {"q": "тур", "type": "hotels"}).status_code == 400
+
+
+def test_autocomplete_answers_from_index_and_follows_changes(tour, monkeypatch, django_capture_on_commit_callbacks):
+    autocomplete.get_index().clear()
+    region = Region.objects.create(name="Алматинская область", country=Country.objects.create(name="Казахстан"))
+    City.objects.create(name="Алматы", region=region, is_first_page=True)
+    City.objects.create(name="Алакөл", region=region)
+    client = APIClient()
+
+    queued = []
+    monkeypatch.setattr(tasks.rebuild_autocomplete, "delay", lambda: queued.append(True))
+    with CaptureQueriesContext(connection) as queries:
+        assert client.get("/v1/autocomplete/", {"q": "ала"}).data == []  # индекса нет, сборка в очереди
+        assert client.get("/v1/autocomplete/", {"q": "ал"}).data == []
+    assert not [query for query in queries.captured_queries if query["sql"].startswith("SELECT")]
+    assert queued == [True]
+    tasks.rebuild_autocomplete()
+    assert client.get("/v1/autocomplete/", {"q": "ала"}).data[0]["title"] == "Алакөл"
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get("/v1/autocomplete/", {"q": "Ал"})
+    assert not [query for query in queries.captured_queries if query["sql"].startswith("SELECT")]
+    assert [row["title"] for row in response.data] == ["Алматы", "Алакөл", "Алматинская область"]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        tour.title = "Озеро Алаколь"
+        tour.save()
+        Tour.objects.create(title="Алаколь без модерации", category=tour.category)
+    response = client.get("/v1/autocomplete/", {"q": "алаколь", "type": "tours"})
+    assert [(row["title"], row["slug"]) for row in response.data] == [("Озеро Алаколь", tour.slug)]
+
+    with django_capture_on_commit_callbacks(execute=True):
+        tour.is_moderated = False
+        tour.save()
+    assert client.get("/v1/autocomplete/", {"q": "озеро"}).data == []
+    assert client.get("/v1/autocomplete/").status_code == 400
+
+
+def test_autocomplete_ranks_by_weight_before_cutting_candidates(monkeypatch):
+    index = autocomplete.LocalIndex()
+    index.replace([{"type": "tours", "id": pk, "title": "Алаколь {}".format(pk), "slug": None, "weight": 1}
+                   for pk in range(autocomplete.CANDIDATES + 50)] +
+                  [{"type": "cities", "id": 1, "title": "Алматы", "slug": "almaty", "weight": 5}])
+    monkeypatch.setattr(autocomplete, "_index", index)
+
+    assert [row["title"] for row in autocomplete.suggest("ал", types=("cities",))] == ["Алматы"]
+    assert autocomplete.suggest("ал")[0]["title"] == "Алматы"
+
+
+def test_autocomplete_matches_queries_longer_than_terms(monkeypatch):
+    title = "Санаторий на берегу горного озера Иссык-Куль"
+    index = autocomplete.LocalIndex()
+    index.replace([{"type": "tours", "id": 1, "title": title, "slug": None, "weight": 1}])
+    monkeypatch.setattr(autocomplete, "_index", index)
+
+    assert len(autocomplete.normalize(title)) > autocomplete.MAX_TERM_LENGTH
+    assert [row["title"] for row in autocomplete.suggest(title)] == [title]
+
+
+class UnavailableRedis:
+    def __getattr__(self, name):
+        def fail(*args, **kwargs):
+            raise RedisConnectionError("Connection refused")
+        return fail
+
+
+def test_autocomplete_survives_redis_outage(tour, monkeypatch, django_capture_on_commit_callbacks):
+    monkeypatch.setattr(autocomplete, "_index", autocomplete.RedisIndex(UnavailableRedis(), "index", "items"))
+
+    response = APIClient().get("/v1/autocomplete/", {"q": "тур"})
+    with django_capture_on_commit_callbacks(execute=True):
+        tour.title = "Тур на Алаколь"
+        tour.save()
+
+    assert response.status_code == 200
+    assert response.data == []
+
+
+def test_all_entities_feed_is_one_ordered_cursor_paginated_query(tour, django_capture_on_commit_callbacks):
+    category = GuideCategory.objects.create(title="Горы")
+    with django_capture_on_commit_callbacks(execute=True):
+        cheap = Guide.objects.create(title="Гид дешёвый", category=category, is_moderated=True)
+        GuideProgram.objects.create(guide=cheap, name="Поход", description="", program="", price=500,
+                                    venue_lon=0, venue_lat=0, venue_address="")
+        Guide.objects.create(title="Гид без программ", category=category, is_moderated=True)
+        expensive = Tour.objects.create(title="Дорогой тур", category=tour.category, is_moderated=True)
+    with django_capture_on_commit_callbacks(execute=True):
+        TourSummary.objects.update_or_create(tour=tour, defaults={"minimum_price": 1000})
+        TourSummary.objects.update_or_create(tour=expensive, defaults={"minimum_price": 9000})
+    client = APIClient()
+
+    titles, url, pages = [], "/v1/records/all/all/?ordering=price&page_size=2", []
+    while url:
+        with CaptureQueriesContext(connection) as queries:
+            response = client.get(url)
+        assert len([query for query in queries.captured_queries if query["sql"].startswith("SELECT")]) == 1
+        pages.append(response.data)
+        titles += [row["title"] for row in response.data["results"]]
+        url = response.data["next"]
+    assert titles == ["Гид дешёвый", "Тур", "Дорогой тур", "Гид без программ"]
+    assert pages[0]["results"][0]["minimum_price"] == 500 and pages[-1]["results"][-1]["minimum_price"] is None
+
+    previous = client.get(pages[1]["previous"]).data
+    assert [row["title"] for row in previous["results"]] == ["Гид дешёвый", "Тур"]
+    assert previous["previous"] is None
+
+    assert client.get("/v1/records/all/all/", {"ordering": "name"}).status_code == 400
+    assert client.get("/v1/records/all/all/", {"cursor": "bad"}).status_code == 404
+
+
+@pytest.mark.parametrize("position", [
+    {"created_at": "x", "type": "tours", "object_id": "y"},
+    {"created_at": "2024-01-01T00:00:00+00:00", "type": "tours", "object_id": None},
+    {"created_at": 5, "type": "tours", "object_id": [1]},
+    {"created_at": "2024-01-01T00:00:00+00:00", "type": "tours"},
+])
+def test_feed_rejects_malformed_cursor_values(position):
+    cursor = b64encode(json.dumps({"p": position, "r": False}).encode()).decode()
+
+    response = APIClient().get("/v1/records/all/all/", {"ordering": "new", "cursor": cursor})
+
+    assert response.status_code == 404
@@ -1,6 +1,9 @@
 from django.urls import path
 
-from medtour.main.views import ToursGuidesView, CitySearchAPIView, CategoriesListAPIView
+from medtour.main.views import (
+    ToursGuidesView, CitySearchAPIView, CategoriesListAPIView, SearchAPIView,
+    AutocompleteAPIView
+)
 
 app_name = "medtour.main"
 
@@ -8,4 +11,6 @@ urlpatterns = [
     path("records/<str:city>/<str:entity>/", ToursGuidesView.as_view(), name="tour_guides"),
     path('address/cities/search/', CitySearchAPIView.as_view(), name='city_search'),
     path('categories/', CategoriesListAPIView.as_view(), name='categories_list'),
+    path('search/', SearchAPIView.as_view(), name='search'),
+    path('autocomplete/', AutocompleteAPIView.as_view(), name='autocomplete'),
 ]
@@ -1,5 +1,5 @@
 from django.db import models
-from django.db.models import Min, Avg, Count, Q, Value
+from django.db.models import Value
 from django.views.decorators.cache import cache_page
 from django.utils.decorators import method_decorator
 from django.utils.translation import gettext_lazy as _
@@ -12,93 +12,67 @@ from itertools import chain
 
 from rest_framework.views import APIView
 
-from medtour.guides.models import Guide, Round, GuideCategory
+from medtour.contrib.pagination import StandardResultsSetPagination, CompositeCursorPagination
+from medtour.contrib.response_cache import cache_response
+from medtour.guides.models import GuideCategory
+from medtour.main import autocomplete, feed
 from medtour.main.filters import CityFilter
-from medtour.main.serializers import ContentSerializer, SearchCitySerializer, LockedSerializer, CategorySerializer
-from medtour.tours.models import Tour
+from medtour.main.search import ENTITIES, search
+from medtour.main.serializers import (
+    ContentSerializer, SearchCitySerializer, LockedSerializer, CategorySerializer,
+    SearchParamsSerializer, SearchResultSerializer, AutocompleteParamsSerializer, AutocompleteSerializer
+)
 from medtour.users.models import City, OrganizationCategory
 
 
-def get_tours(filters):
-    tour_qs = Tour.objects.filter(**filters).annotate(
-        minimum_price=Min("numbers__price", filter=Q(numbers__is_deleted=False)),
-        service__avg=Round(Avg('comments__service'), 2, output_field=models.FloatField()),
-        location__avg=Round(Avg('comments__location'), 2, output_field=models.FloatField()),
-        purity__avg=Round(Avg('comments__purity'), 2, output_field=models.FloatField()),
-        staff__avg=Round(Avg('comments__staff'), 2, output_field=models.FloatField()),
-        proportion__avg=Round(Avg('comments__proportion'), 2, output_field=models.FloatField()),
-        comments__count=Count('comments__purity', output_field=models.FloatField()),
-        type=Value('tours', output_field=models.CharField()),
-    ).prefetch_related("tour_shots").select_related('city').order_by('is_top')
-    return tour_qs
-
-
-def get_guides(filters):
-    guides_queryset = Guide.objects.filter(**filters).annotate(
-        minimum_price=Min("programs__price", filter=Q(programs__is_deleted=False)),
-        service__avg=Round(Avg('guide_reviews__service'), 2, output_field=models.FloatField()),
-        location__avg=Round(Avg('guide_reviews__location'), 2, output_field=models.FloatField()),
-        staff__avg=Round(Avg('guide_reviews__staff'), 2, output_field=models.FloatField()),
-        proportion__avg=Round(Avg('guide_reviews__proportion'), 2, output_field=models.FloatField()),
-        comments__count=Count('guide_reviews__service', output_field=models.FloatField()),
-        type=Value('guides', output_field=models.CharField()),
-    ).prefetch_related('guide_shots').select_related('city')
-    return guides_queryset
-
-
 class ToursGuidesView(APIView):
     serializer_class = ContentSerializer
-    queryset = Tour.objects.all()  # F405
+    pagination_class = CompositeCursorPagination
 
     @extend_schema(
         parameters=[
             OpenApiParameter("category__slug", type=OpenApiTypes.STR, many=False),
             OpenApiParameter("id__in", type=OpenApiTypes.INT, many=True),
             OpenApiParameter("is_top", type=OpenApiTypes.BOOL, many=False),
+            OpenApiParameter("ordering", type=OpenApiTypes.STR, enum=list(feed.ORDERINGS),
+                             description="По умолчанию top для all, new для tours и guides"),
         ],
         responses={"200": ContentSerializer,
                    "423": LockedSerializer}
     )
+    @cache_response("listing")
     def get(self, request, city, entity, *args, **kwargs):
-        filters = {
-            'is_moderated': True,
-            'is_deleted': False,
-        }
-
-        if city != "all":
-            filters['city__slug'] = city
+        if entity not in feed.DEFAULT_ORDERINGS:
+            return Response(
+                {
+                    "message": _("Вы неверно указали сущность: {entity}").format(entity=entity)
+                },
+                status=status.HTTP_400_BAD_REQUEST)
 
         id__in = request.query_params.getlist('id__in')
-        if id__in and entity != "all":
-            filters['id__in'] = [int(pk) for pk in id__in]
-
-        category__slug = request.query_params.get('category__slug')
-        if category__slug:
-            filters['category__slug'] = category__slug  # noqa
-
-        is_top = request.query_params.get("is_top")
-        if is_top:
-            filters["is_top"] = True if is_top == "true" else False
-        if entity == "all":
-            if id__in:
-                return Response(
-                    {
-                        "message": _(f"В сущности `all` не работает параметр ?id__in")},
-                    status=status.HTTP_423_LOCKED)
-            combined_queryset = chain(get_tours(filters),
-                                      get_guides(filters))
-            serializer = ContentSerializer(combined_queryset, many=True)
-        elif entity == "tours":
-            serializer = ContentSerializer(get_tours(filters), many=True)
-        elif entity == "guides":
-            serializer = ContentSerializer(get_guides(filters), many=True)
-        else:
+        if id__in and entity == "all":
             return Response(
                 {
-                    "message": _(f"Вы неверно указали сущность: {entity}").format(entity=entity)
-                },
+                    "message": _("В сущности `all` не работает параметр ?id__in")},
+                status=status.HTTP_423_LOCKED)
+
+        ordering = request.query_params.get("ordering", feed.DEFAULT_ORDERINGS[entity])
+        if ordering not in feed.ORDERINGS:
+            return Response(
+                {"message": _("Неверная сортировка: {ordering}").format(ordering=ordering)},
                 status=status.HTTP_400_BAD_REQUEST)
-        return Response(serializer.data)
+
+        is_top = request.query_params.get("is_top")
+        queryset = feed.get_feed(
+            entity, city,
+            category_slug=request.query_params.get('category__slug'),
+            is_top=(is_top == "true") if is_top else None,
+            ids=[int(pk) for pk in id__in],
+        )
+        self.ordering = feed.ORDERINGS[ordering]
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(self.serializer_class(page, many=True).data)
 
 
 class CitySearchAPIView(generics.ListAPIView):
@@ -118,6 +92,7 @@ class CitySearchAPIView(generics.ListAPIView):
 class CategoriesListAPIView(APIView):
     serializer_class = CategorySerializer
 
+    @cache_response("categories")
     def get(self, request):
         combined_queryset = chain(
             OrganizationCategory.objects.annotate(
@@ -129,3 +104,60 @@ class CategoriesListAPIView(APIView):
         )
         serializer = self.serializer_class(combined_queryset, many=True)
         return Response(serializer.data)
+
+
+class SearchAPIView(generics.ListAPIView):
+    """
+    Поиск по турам, гидам, программам гидов и городам, лучшие совпадения первыми.
+    Программа ведёт на страницу гида, slug у неё от гида.
+    """
+    serializer_class = SearchResultSerializer
+    pagination_class = StandardResultsSetPagination
+    filter_backends = []
+
+    def get_queryset(self):
+        params = SearchParamsSerializer(data={
+            "q": self.request.query_params.get("q", ""),
+            "type": self.request.query_params.getlist("type"),
+        })
+        params.is_valid(raise_exception=True)
+        entities = [entity for entity in ENTITIES if entity in (params.validated_data.get("type") or ENTITIES)]
+        return search(params.validated_data["q"], entities)
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter("q", type=OpenApiTypes.STR, required=True),
+            OpenApiParameter("type", type=OpenApiTypes.STR, many=True, enum=ENTITIES),
+        ],
+    )
+    @cache_response("tours", "guides", "cities")
+    def get(self, request, *args, **kwargs):
+        return self.list(request, *args, **kwargs)
+
+
+class AutocompleteAPIView(APIView):
+    """
+    Подсказки по началу слова: города, области, страны, туры и гиды.
+    Отвечает из индекса medtour.main.autocomplete, без запросов к базе.
+    """
+    serializer_class = AutocompleteSerializer
+
+    @extend_schema(
+        parameters=[
+            OpenApiParameter("q", type=OpenApiTypes.STR, required=True),
+            OpenApiParameter("type", type=OpenApiTypes.STR, many=True, enum=autocomplete.TYPES),
+            OpenApiParameter("limit", type=OpenApiTypes.INT),
+        ],
+        responses=AutocompleteSerializer(many=True),
+    )
+    def get(self, request):
+        params = AutocompleteParamsSerializer(data={
+            "q": request.query_params.get("q", ""),
+            "type": request.query_params.getlist("type"),
+            "limit": request.query_params.get("limit", 10),
+        })
+        params.is_valid(raise_exception=True)
+        suggestions = autocomplete.suggest(params.validated_data["q"],
+                                           types=params.validated_data.get("type") or autocomplete.TYPES,
+                                           limit=params.validated_data["limit"])
+        return Response(self.serializer_class(suggestions, many=True).data)
@@ -1,8 +1,15 @@
 from django.contrib import admin
 
-from medtour.notifications.models import Notification
+from medtour.notifications.models import Notification, OutgoingMessage
 
 
 @admin.register(Notification)
 class NotificationAdmin(admin.ModelAdmin):
     pass
+
+
+@admin.register(OutgoingMessage)
+class OutgoingMessageAdmin(admin.ModelAdmin):
+    list_display = ("user", "subject", "sms_status", "email_status", "attempts", "created_at")
+    list_filter = ("sms_status", "email_status")
+    raw_id_fields = ("user",)
@@ -0,0 +1,47 @@
+# Generated by Django 3.2.15 on 2026-10-18 13:45
+
+from django.conf import settings
+import django.contrib.postgres.fields
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+import uuid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('notifications', '0002_notification_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutgoingMessage',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('subject', models.CharField(max_length=255, verbose_name='Тема')),
+                ('message', models.TextField(blank=True, verbose_name='Текст')),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('phone', models.CharField(blank=True, max_length=20, null=True, verbose_name='Телефон')),
+                ('emails', django.contrib.postgres.fields.ArrayField(base_field=models.EmailField(max_length=254), blank=True, null=True, size=None, verbose_name='Почта')),
+                ('from_email', models.CharField(blank=True, max_length=255, null=True, verbose_name='Отправитель')),
+                ('sensitive', models.BooleanField(default=False, help_text='Текст стирается после доставки', verbose_name='Содержит код или пароль')),
+                ('sms_status', models.SmallIntegerField(choices=[(-1, 'Не требуется'), (0, 'Ожидает отправки'), (1, 'Отправлено'), (2, 'Не отправлено')], default=0, verbose_name='Статус SMS')),
+                ('email_status', models.SmallIntegerField(choices=[(-1, 'Не требуется'), (0, 'Ожидает отправки'), (1, 'Отправлено'), (2, 'Не отправлено')], default=0, verbose_name='Статус письма')),
+                ('attempts', models.PositiveSmallIntegerField(default=0, verbose_name='Попыток отправки')),
+                ('next_attempt_at', models.DateTimeField(default=django.utils.timezone.now, verbose_name='Следующая попытка')),
+                ('error', models.TextField(blank=True, null=True, verbose_name='Последняя ошибка')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outgoing_messages', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name': 'Исходящее сообщение',
+                'verbose_name_plural': 'Исходящие сообщения',
+                'ordering': ('created_at',),
+            },
+        ),
+        migrations.AddIndex(
+            model_name='outgoingmessage',
+            index=models.Index(condition=models.Q(('sms_status', 0), ('email_status', 0), _connector='OR'), fields=['next_attempt_at'], name='outgoing_message_pending_idx'),
+        ),
+    ]
@@ -1,9 +1,16 @@
 import uuid
+from datetime import timedelta
 
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import models
+from django.contrib.postgres.fields import ArrayField
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
+from medtour.utils.constants import NotificationStatusChoices
+
 User = get_user_model()
 
 
@@ -22,3 +29,95 @@ class Notification(models.Model):
 
     def __str__(self):
         return "Пользователь: %s, %s" % (self.user, self.title)
+
+
+class OutgoingMessageQuerySet(models.QuerySet):
+
+    def pending(self):
+        """Сообщения, у которых есть неотправленный канал и подошло время попытки"""
+        return self.filter(
+            Q(sms_status=NotificationStatusChoices.PENDING) | Q(email_status=NotificationStatusChoices.PENDING),
+            next_attempt_at__lte=timezone.now()
+        )
+
+
+class OutgoingMessage(models.Model):
+    """
+    Очередь исходящих SMS и писем пользователю, см. medtour.notifications.tasks.
+    В уведомления личного кабинета (Notification) не попадает.
+    """
+    MAX_ATTEMPTS = 5
+    RETRY_DELAY = 30  # секунд, удваивается с каждой попыткой
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name="outgoing_messages")
+    subject = models.CharField(_("Тема"), max_length=255)
+    message = models.TextField(_("Текст"), blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    # Адреса доставки, пустое значение — взять телефон и почту пользователя при отправке
+    phone = models.CharField(_("Телефон"), max_length=20, null=True, blank=True)
+    emails = ArrayField(models.EmailField(), verbose_name=_("Почта"), null=True, blank=True)
+    from_email = models.CharField(_("Отправитель"), max_length=255, null=True, blank=True)
+    sensitive = models.BooleanField(_("Содержит код или пароль"), default=False,
+                                    help_text=_("Текст стирается после доставки"))
+    sms_status = models.SmallIntegerField(_("Статус SMS"), choices=NotificationStatusChoices.choices,
+                                          default=NotificationStatusChoices.PENDING)
+    email_status = models.SmallIntegerField(_("Статус письма"), choices=NotificationStatusChoices.choices,
+                                            default=NotificationStatusChoices.PENDING)
+    attempts = models.PositiveSmallIntegerField(_("Попыток отправки"), default=0)
+    next_attempt_at = models.DateTimeField(_("Следующая попытка"), default=timezone.now)
+    error = models.TextField(_("Последняя ошибка"), null=True, blank=True)
+
+    objects = OutgoingMessageQuerySet.as_manager()
+
+    class Meta:
+        ordering = ('created_at',)
+        verbose_name = _("Исходящее сообщение")
+        verbose_name_plural = _("Исходящие сообщения")
+        indexes = [
+            models.Index(fields=["next_attempt_at"], name="outgoing_message_pending_idx",
+                         condition=Q(sms_status=NotificationStatusChoices.PENDING) |
+                         Q(email_status=NotificationStatusChoices.PENDING)),
+        ]
+
+    def __str__(self):
+        return "Пользователь: %s, %s" % (self.user, self.subject)
+
+    @classmethod
+    def send(cls, user, subject, message, from_email=None, emails=None, phone=None, sensitive=False):
+        """Сохраняет сообщение и ставит отправку в очередь после коммита транзакции"""
+        from medtour.notifications.tasks import send_pending_notifications
+
+        notification = cls.objects.create(user=user, subject=subject, message=message, phone=phone, emails=emails,
+                                          from_email=from_email or settings.DEFAULT_FROM_EMAIL, sensitive=sensitive)
+        transaction.on_commit(lambda: send_pending_notifications.delay())
+        return notification
+
+    def resolve_recipients(self):
+        """Телефон и почта пользователя, если адреса не указаны явно"""
+        if self.phone is None and self.sms_status == NotificationStatusChoices.PENDING:
+            phone_obj = next(iter(self.user.phonenumber_set.all()), None)
+            self.phone = str(phone_obj) if phone_obj else None
+        if self.emails is None and self.email_status == NotificationStatusChoices.PENDING:
+            self.emails = [str(obj) for obj in self.user.emailaddress_set.all()]
+        if not self.phone:
+            self.sms_status = NotificationStatusChoices.SKIPPED
+        if not self.emails:
+            self.email_status = NotificationStatusChoices.SKIPPED
+
+    def finish_attempt(self, error=None):
+        """Планирует повтор для неотправленных каналов с экспоненциальной задержкой"""
+        pending = NotificationStatusChoices.PENDING
+        self.error = error
+        if self.sms_status == pending or self.email_status == pending:
+            self.attempts += 1
+            if self.attempts >= self.MAX_ATTEMPTS:
+                self.sms_status = NotificationStatusChoices.FAILED if self.sms_status == pending else self.sms_status
+                self.email_status = (NotificationStatusChoices.FAILED if self.email_status == pending
+                                     else self.email_status)
+            else:
+                self.next_attempt_at = timezone.now() + timedelta(seconds=self.RETRY_DELAY * 2 ** (self.attempts - 1))
+                return
+        if self.sensitive:
+            self.message = ""
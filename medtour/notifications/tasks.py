@@ -0,0 +1,137 @@
+import logging
+from datetime import timedelta
+
+import requests
+from celery import shared_task
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.template.loader import render_to_string
+from django.utils import timezone
+
+from medtour.notifications.models import OutgoingMessage
+from medtour.utils import SmsApi
+from medtour.utils.constants import NotificationStatusChoices
+
+User = get_user_model()
+logger = logging.getLogger(__name__)
+
+BATCH_SIZE = 100
+SMS_CHUNK_SIZE = 50
+# Пока задача отправляет пачку, другие воркеры её не берут. Если воркер упадёт,
+# уведомления вернутся в очередь по истечении аренды.
+LEASE = timedelta(minutes=5)
+
+
+def claim_pending(limit=BATCH_SIZE):
+    with transaction.atomic():
+        messages = list(
+            OutgoingMessage.objects.pending().order_by("next_attempt_at").select_for_update(skip_locked=True)[:limit]
+        )
+        OutgoingMessage.objects.filter(pk__in=[m.pk for m in messages]).update(
+            next_attempt_at=timezone.now() + LEASE
+        )
+    return messages
+
+
+def add_error(message, error):
+    message.error = "\n".join(filter(None, [message.error, error]))
+
+
+def phone_key(phone) -> str:
+    """Последние 10 цифр номера: SMSC возвращает номер без + и может заменить 8 на 7"""
+    return "".join(filter(str.isdigit, phone or ""))[-10:]
+
+
+def sms_errors(response, chunk):
+    """
+    Ошибка по каждому сообщению из ответа SMSC с op=1, None — отправлено.
+    Номер, которого нет в ответе принятого запроса, считается отправленным,
+    чтобы не отправить код повторно.
+    """
+    if not response or "error_code" in response:
+        error = "SMSC: {}".format(response.get("error", response.get("error_code")) if response else "нет ответа")
+        return [error] * len(chunk)
+    errors = {phone_key(row.get("phone")): row.get("error") for row in response.get("phones", [])}
+    results = []
+    for message in chunk:
+        error = errors.get(phone_key(message.phone))
+        results.append("SMSC {}: {}".format(message.phone, error) if error not in (None, "", "0") else None)
+    return results
+
+
+def send_sms_batch(messages):
+    for start in range(0, len(messages), SMS_CHUNK_SIZE):
+        chunk = messages[start:start + SMS_CHUNK_SIZE]
+        try:
+            errors = sms_errors(SmsApi.send_sms_list([(m.phone, m.message) for m in chunk]), chunk)
+        except requests.RequestException as e:
+            logger.error("Exception sending sms batch: %s", e)
+            errors = ["SMSC: {}".format(e)] * len(chunk)
+        for message, error in zip(chunk, errors):
+            if error is None:
+                message.sms_status = NotificationStatusChoices.SENT
+            else:
+                add_error(message, error)
+
+
+def send_email_batch(messages):
+    """Все письма пачки уходят через одно SMTP соединение"""
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as e:  # noqa
+        logger.error("Exception opening SMTP connection: %s", e)
+        for message in messages:
+            add_error(message, "Email: {}".format(e))
+        return
+    try:
+        for m in messages:
+            try:
+                html_content = render_to_string('email/index.html', {'title': m.subject, 'body': m.message})
+                email = EmailMessage(m.subject, html_content, from_email=m.from_email, to=m.emails,
+                                     connection=connection)
+                email.content_subtype = "html"
+                email.send()
+                m.email_status = NotificationStatusChoices.SENT
+            except Exception as e:  # noqa
+                logger.error("Exception sending message to %s: %s", m.emails, e)
+                add_error(m, "Email: {}".format(e))
+    finally:
+        connection.close()
+
+
+@shared_task
+def send_pending_notifications():
+    """
+    Отправляет накопившиеся сообщения пачками: все SMS одним запросом SMSC,
+    все письма через одно SMTP соединение. Статусы сохраняются после каждого
+    канала, поэтому сбой второго канала не приводит к повторной отправке SMS.
+    Неудачные каналы повторяются с экспоненциальной задержкой, см.
+    OutgoingMessage.finish_attempt.
+    """
+    messages = claim_pending()
+    if not messages:
+        return 0
+    users = User.objects.filter(pk__in={m.user_id for m in messages}).prefetch_related(
+        "phonenumber_set", "emailaddress_set"
+    ).in_bulk()
+    for m in messages:
+        m.user = users[m.user_id]
+        m.error = None
+        m.resolve_recipients()
+    OutgoingMessage.objects.bulk_update(messages, ["phone", "emails", "sms_status", "email_status", "error"])
+
+    send_sms_batch([m for m in messages if m.sms_status == NotificationStatusChoices.PENDING])
+    OutgoingMessage.objects.bulk_update(messages, ["sms_status", "error"])
+    send_email_batch([m for m in messages if m.email_status == NotificationStatusChoices.PENDING])
+    OutgoingMessage.objects.bulk_update(messages, ["email_status", "error"])
+
+    for m in messages:
+        m.finish_attempt(m.error)
+    OutgoingMessage.objects.bulk_update(messages, [
+        "sms_status", "email_status", "attempts", "next_attempt_at", "error", "message"
+    ])
+    if len(messages) == BATCH_SIZE:
+        send_pending_notifications.delay()
+    return len(messages)
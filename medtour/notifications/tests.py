@@ -0,0 +1,157 @@
+import pytest
+from django.core import mail
+from django.core.mail.backends import locmem
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from medtour.notifications.models import Notification, OutgoingMessage
+from medtour.notifications.tasks import send_pending_notifications
+from medtour.users.models import User
+from medtour.users.views import NotificationViewSet
+from medtour.utils import SmsApi
+from medtour.utils.http import CircuitOpenError
+from medtour.utils.constants import NotificationStatusChoices
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def sms_calls(monkeypatch):
+    calls = []
+
+    def send_sms_list(messages, **kwargs):
+        calls.append(list(messages))
+        return {"id": 1, "cnt": len(messages), "phones": [{"phone": phone.lstrip("+")} for phone, _ in messages]}
+
+    monkeypatch.setattr(SmsApi, "send_sms_list", send_sms_list)
+    return calls
+
+
+@pytest.fixture
+def user():
+    return User.objects.create(username="client")
+
+
+def test_send_message_user_defers_delivery(user, sms_calls, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks() as callbacks:
+        notification = user.send_message_user("Заявка", "Ваша заявка принята", phone="+77000000000")
+
+    assert notification.sms_status == NotificationStatusChoices.PENDING
+    assert sms_calls == []
+    assert len(callbacks) == 1
+    assert not Notification.objects.exists()
+
+
+def test_notification_is_visible_only_to_its_user(user):
+    notification = Notification.objects.create(user=user, title="Заявка", message="Ваша заявка принята")
+    view = NotificationViewSet.as_view({"get": "retrieve"})
+
+    def retrieve(as_user):
+        request = APIRequestFactory().get("/")
+        force_authenticate(request, as_user)
+        with transaction.atomic():  # как ATOMIC_REQUESTS: ответ 404 откатывает только запрос
+            return view(request, pk=str(notification.pk))
+
+    assert retrieve(User.objects.create(username="other")).status_code == 404
+    notification.refresh_from_db()
+    assert not notification.read
+
+    assert retrieve(user).data["message"] == "Ваша заявка принята"
+    notification.refresh_from_db()
+    assert notification.read
+
+
+def test_sms_are_sent_in_one_batch(user, sms_calls):
+    for number in range(3):
+        OutgoingMessage.objects.create(user=user, subject="Код", message="Код: {}".format(number),
+                                       phone="+7700000000{}".format(number), emails=[], sensitive=True)
+
+    assert send_pending_notifications() == 3
+
+    assert sms_calls == [[("+7700000000{}".format(n), "Код: {}".format(n)) for n in range(3)]]
+    assert set(OutgoingMessage.objects.values_list("sms_status", "email_status", "message")) == {
+        (NotificationStatusChoices.SENT, NotificationStatusChoices.SKIPPED, "")
+    }
+
+
+def test_emails_share_one_connection(user, sms_calls):
+    OutgoingMessage.objects.create(user=user, subject="Первое", message="1", emails=["a@mtour.kz"], phone="")
+    OutgoingMessage.objects.create(user=user, subject="Второе", message="2", emails=["b@mtour.kz"], phone="")
+
+    send_pending_notifications()
+
+    assert [message.to for message in mail.outbox] == [["a@mtour.kz"], ["b@mtour.kz"]]
+    assert mail.outbox[0].connection is mail.outbox[1].connection
+    assert not OutgoingMessage.objects.pending().exists()
+
+
+def test_failed_sms_is_retried_with_backoff(user, monkeypatch):
+    monkeypatch.setattr(SmsApi, "send_sms_list", lambda messages, **kwargs: {"error": "auth", "error_code": 2})
+    notification = OutgoingMessage.objects.create(user=user, subject="Код", message="Код", phone="+77000000000",
+                                                  emails=[])
+
+    send_pending_notifications()
+
+    notification.refresh_from_db()
+    assert notification.sms_status == NotificationStatusChoices.PENDING
+    assert notification.attempts == 1
+    assert notification.next_attempt_at > timezone.now()
+    assert "auth" in notification.error
+
+    OutgoingMessage.objects.filter(pk=notification.pk).update(attempts=OutgoingMessage.MAX_ATTEMPTS - 1,
+                                                              next_attempt_at=timezone.now())
+    send_pending_notifications()
+
+    notification.refresh_from_db()
+    assert notification.sms_status == NotificationStatusChoices.FAILED
+
+
+def test_sms_results_are_recorded_per_message(user, monkeypatch):
+    def send_sms_list(messages, **kwargs):
+        return {"id": 1, "cnt": 1, "phones": [{"phone": "77000000001"}, {"phone": "77000000002", "error": "1"}]}
+
+    monkeypatch.setattr(SmsApi, "send_sms_list", send_sms_list)
+    sent = OutgoingMessage.objects.create(user=user, subject="Код", message="1", phone="87000000001", emails=[])
+    rejected = OutgoingMessage.objects.create(user=user, subject="Код", message="2", phone="+77000000002",
+                                              emails=[])
+
+    send_pending_notifications()
+
+    sent.refresh_from_db()
+    rejected.refresh_from_db()
+    assert sent.sms_status == NotificationStatusChoices.SENT
+    assert rejected.sms_status == NotificationStatusChoices.PENDING
+    assert rejected.attempts == 1
+
+
+def test_smtp_failure_keeps_sent_sms(user, sms_calls, monkeypatch):
+    def open_connection(self):
+        raise ConnectionRefusedError("smtp down")
+
+    monkeypatch.setattr(locmem.EmailBackend, "open", open_connection, raising=False)
+    notification = OutgoingMessage.objects.create(user=user, subject="Код", message="Код", phone="+77000000000",
+                                                  emails=["a@mtour.kz"])
+
+    send_pending_notifications()
+
+    notification.refresh_from_db()
+    assert notification.sms_status == NotificationStatusChoices.SENT
+    assert notification.email_status == NotificationStatusChoices.PENDING
+    assert "smtp down" in notification.error
+
+
+def test_smsc_outage_does_not_stop_emails(user, monkeypatch):
+    def send_sms_list(messages, **kwargs):
+        raise CircuitOpenError("smsc")
+
+    monkeypatch.setattr(SmsApi, "send_sms_list", send_sms_list)
+    notification = OutgoingMessage.objects.create(user=user, subject="Код", message="Код", phone="+77000000000",
+                                                  emails=["a@mtour.kz"])
+
+    send_pending_notifications()
+
+    notification.refresh_from_db()
+    assert notification.sms_status == NotificationStatusChoices.PENDING
+    assert notification.email_status == NotificationStatusChoices.SENT
+    assert len(mail.outbox) == 1
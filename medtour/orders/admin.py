@@ -33,6 +33,7 @@ class ServiceCartPackagesAdmin(admin.ModelAdmin):
 class PaymentAdmin(admin.ModelAdmin):
     raw_id_fields = ["user", "cart"]
     list_display = ["user", "status", "amount", "cart", "tour_display", "is_partial", "created_at"]
+    list_filter = ["status", "gateway_status"]
     list_display_links = ["user", "cart"]
 
     def tour_display(self, obj):
@@ -0,0 +1,88 @@
+import json
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+
+from medtour.contrib.funnel_benchmark import (
+    FunnelRun, HttpTransport, InProcessTransport, StubServer, compare, format_result, prepare_funnel
+)
+
+DEFAULT_BASELINE = settings.ROOT_DIR / "benchmarks" / "funnel_baseline.json"
+
+
+class Command(BaseCommand):
+    help = (
+        "Нагрузочный тест воронки бронирования: записи, тур, номера, проверка кабинетов, корзина и колбэк "
+        "Kassa24. Без --base-url запросы идут в этом процессе, с ним в запущенный стек. Kassa24 и SMSC "
+        "заменяются локальной заглушкой. Завершается ошибкой, если шаг стал медленнее базовых значений"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--base-url", help="Адрес запущенного стека, например http://localhost:8000")
+        parser.add_argument("--concurrency", type=int, default=4, help="Параллельных пользователей")
+        parser.add_argument("--iterations", type=int, default=25, help="Прохождений воронки на пользователя")
+        parser.add_argument("--stub-port", type=int, default=8091,
+                            help="Порт заглушки Kassa24 и SMSC, 0 для свободного порта")
+        parser.add_argument("--stub-latency", type=int, default=0, help="Задержка ответа заглушки, мс")
+        parser.add_argument("--serve-stubs", action="store_true",
+                            help="Только запустить заглушку и ждать, для стека в отдельном процессе")
+        parser.add_argument("--baseline", default=str(DEFAULT_BASELINE), help="JSON с базовыми значениями")
+        parser.add_argument("--tolerance", type=float, default=0.25, help="Допустимый рост p95, доля")
+        parser.add_argument("--write-baseline", action="store_true", help="Сохранить результат как базовый")
+        parser.add_argument("--output", help="Сохранить результат прогона в JSON")
+
+    def handle(self, *args, **options):
+        with StubServer(port=options["stub_port"], latency_ms=options["stub_latency"]) as stub:
+            env = " ".join("{}={}".format(key, value) for key, value in stub.settings.items())
+            if options["serve_stubs"]:
+                self.stdout.write("Заглушка запущена, стартуйте стек с {}".format(env))
+                stub.thread.join()
+                return
+            if options["base_url"]:
+                self.stdout.write("Стек должен быть запущен с {}".format(env))
+                result = self.run_funnel(options, lambda: HttpTransport(options["base_url"]))
+            else:
+                # Как на проде: без debug toolbar и записи всех SQL запросов в connection.queries
+                with override_settings(DEBUG=False, **stub.settings):
+                    result = self.run_funnel(options, InProcessTransport)
+
+        result["config"] = {key: options[key] for key in ("concurrency", "iterations", "stub_latency")}
+        result["config"]["mode"] = "http" if options["base_url"] else "in-process"
+        baseline = self.read_baseline(options["baseline"])
+        self.stdout.write(format_result(result, baseline))
+        if options["output"]:
+            self.write_json(options["output"], result)
+        if options["write_baseline"]:
+            self.write_json(options["baseline"], result)
+            self.stdout.write(self.style.SUCCESS("Базовые значения сохранены в {}".format(options["baseline"])))
+            return
+        if baseline is None:
+            return
+        if baseline.get("config") != result["config"]:
+            self.stdout.write(self.style.WARNING("Параметры прогона отличаются от базовых: {}".format(
+                baseline.get("config"))))
+        regressions = compare(result, baseline, options["tolerance"])
+        if regressions:
+            raise CommandError("Регрессия воронки:\n" + "\n".join(regressions))
+        self.stdout.write(self.style.SUCCESS("Регрессий нет"))
+
+    def run_funnel(self, options, transport_factory):
+        try:
+            data = prepare_funnel(options["concurrency"])
+        except LookupError as e:
+            raise CommandError(str(e))
+        return FunnelRun(transport_factory, data["tour"], data["number"], data["tokens"],
+                         options["iterations"]).run()
+
+    def read_baseline(self, path):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def write_json(self, path, data):
+        with open(path, "w") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
+            f.write("\n")
@@ -0,0 +1,25 @@
+# Generated by Django 3.2.15 on 2026-10-18 12:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('orders', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='payment',
+            name='gateway_error',
+            field=models.TextField(blank=True, null=True, verbose_name='Ответ платежной системы при ошибке'),
+        ),
+        migrations.AddField(
+            model_name='payment',
+            name='gateway_status',
+            field=models.SmallIntegerField(choices=[(0, 'Ожидает ссылку на оплату'), (1, 'Ссылка на оплату создана'), (2, 'Ошибка платежной системы'), (3, 'Требует сверки с платежной системой')], default=0, verbose_name='Статус создания оплаты'),
+        ),
+        # До очереди оплаты создавались только после успешного ответа платежной системы
+        migrations.RunSQL("UPDATE orders_payment SET gateway_status = 1", migrations.RunSQL.noop),
+    ]
@@ -1,13 +1,14 @@
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, MaxValueValidator
 from django.db import models
+from django.utils import timezone
 from django.utils.translation import gettext_lazy as _
 
 from medtour.orders.instances import get_pdf_path
 from medtour.tournumbers.models import TourNumbers
 from medtour.tourpackages.models import TourPackages
 from medtour.tours.models import Tour, TourPaidServices
-from medtour.utils.constants import CitizenDocType, PersonGender, PaymentStatusChoices
+from medtour.utils.constants import CitizenDocType, PersonGender, PaymentStatusChoices, PaymentGatewayStatusChoices
 
 User = get_user_model()
 
@@ -109,6 +110,10 @@ class Payment(models.Model):
     amount_paid_part = models.IntegerField(_("Процент частичной оплаты"), default=100,
                                            validators=[MinValueValidator(0), MaxValueValidator(100)])
     redirect_url = models.CharField(_("Страница с оплатой платежной системы"), max_length=150, null=True, blank=True)
+    gateway_status = models.SmallIntegerField(_("Статус создания оплаты"),
+                                              choices=PaymentGatewayStatusChoices.choices,
+                                              default=PaymentGatewayStatusChoices.PENDING)
+    gateway_error = models.TextField(_("Ответ платежной системы при ошибке"), null=True, blank=True)
     pdf_file = models.FileField(upload_to=get_pdf_path, blank=True, null=True)
 
     def __str__(self):
@@ -117,3 +122,20 @@ class Payment(models.Model):
     class Meta:
         verbose_name = _("Оплата")
         verbose_name_plural = _("Оплаты")
+
+    def fail(self, error: str):
+        """Платежная система отказала — снимаем удержание кабинетов корзины"""
+        self.gateway_status = PaymentGatewayStatusChoices.FAILED
+        self.gateway_error = error
+        self.save(update_fields=["gateway_status", "gateway_error"])
+        self.san_reservations.filter(is_deleted=False).update(is_deleted=True, deleted_at=timezone.now())
+
+    def mark_for_reconciliation(self, error: str):
+        """
+        Касса могла создать платёж, но ответ не получен. Повторный запрос может
+        задвоить платёж, поэтому оплату сверяют с кассой вручную. Удержание
+        кабинетов снимет reservations_cleaner, если оплата не придёт.
+        """
+        self.gateway_status = PaymentGatewayStatusChoices.UNKNOWN
+        self.gateway_error = error
+        self.save(update_fields=["gateway_status", "gateway_error"])
@@ -1,12 +1,10 @@
-from django.conf import settings
-from django.utils.translation import gettext_lazy as _, gettext_lazy
-from psycopg2._range import DateRange  # noqa
+from django.db import transaction
+from django.utils.translation import gettext_lazy as _
 from rest_framework import serializers, exceptions
 from rest_framework.exceptions import ValidationError
 
-from medtour.contrib.exceptions import PaymentError
 from medtour.orders.models import ServiceCartServices, Payment, ServiceCart, ServiceCartPackages, ServiceCartVisitors
-from medtour.paycredentials.models import Kassa24Credentials
+from medtour.orders.tasks import create_kassa24_payment
 from medtour.sanatorium.models import Reservations
 from medtour.tournumbers.models import TourNumbers
 from medtour.tourpackages.serializers import ListPackageSerializer
@@ -14,7 +12,6 @@ from medtour.tourpackages.models import TourPackages
 from medtour.tours.serializers import TourPaidServicesSerializer
 from medtour.tours.models import Tour
 from medtour.utils.constants import OrgTypeChoice
-from medtour.utils.payment import PaymentApi
 
 
 class ServiceCartVisitorsSerializer(serializers.ModelSerializer):
@@ -47,6 +44,12 @@ class PaymentSerializer(serializers.ModelSerializer):
         model = Payment
 
 
+class PaymentStatusSerializer(serializers.ModelSerializer):
+    class Meta:
+        fields = ("id", "status", "gateway_status", "redirect_url", "gateway_error")
+        model = Payment
+
+
 class ServiceCartSerializer(serializers.ModelSerializer):
     user = serializers.HiddenField(default=serializers.CurrentUserDefault())
     services = ServiceCartCountSerializer(many=True, required=False, read_only=True)
@@ -84,17 +87,14 @@ class WriteServiceCartSerializer(serializers.ModelSerializer):
         super().__init__(*args, **kwargs)
         self.start_date = None
         self.end_date = None
-        self.number_cabinets = None
         self.pay_amount = None
         self.tour = None
         self.tour_type = None
         self.package_data = None
         self.services_data = None
         self.visitors = None
-        self.kassa24 = None
 
     def validate(self, data):
-        print("validating")
         self.services_data = data.pop('services', tuple())
         self.package_data = data.pop('package', TourPackages.objects.none())
         self.visitors = data.pop('visitors', ServiceCartVisitors.objects.none())
@@ -112,49 +112,35 @@ class WriteServiceCartSerializer(serializers.ModelSerializer):
         if self.package_data:
             data['number'] = self.package_data.get('package').number
 
-        if self.visitors == ServiceCartVisitors.objects.none():
+        if not self.visitors:
             errors['visitors'] = [_('Вы не указали ни одного посетителя')]
 
         if errors:
             raise ValidationError(errors)
 
-        kassa24_obj: Kassa24Credentials = self.tour.kassa24 if hasattr(self.tour, 'kassa24') else None
-        if kassa24_obj:
-            print("validating2")
-            kassa24_login = kassa24_obj.login
-            kassa24_password = kassa24_obj.password
-        else:
-            kassa24_login = settings.KASSA24_LOGIN
-            kassa24_password = settings.KASSA24_PASSWORD
-        self.kassa24 = PaymentApi(kassa24_login, kassa24_password)
-
         # Check reserved
         self.start_date = data.pop("start")
         self.end_date = data.pop("end")
         self.number = data.get("number")
         self.pay_amount = data.get("price", 0)
 
-        if self.tour_type in [OrgTypeChoice.ZONAOTDYXA]:
-            empty_cabinets = Reservations.get_empty_cabinets(self.start_date, self.end_date, self.number)
-            if empty_cabinets.exists():
-                self.number_cabinets = empty_cabinets.first()
-            else:
-                raise exceptions.NotAcceptable(
-                    detail=_("Все кабинеты заняты в период {} — {} и в номер {}").format(
-                        self.start_date, self.end_date, self.number
-                    ))
-        else:
-            print("validating4")
-            empty_cabinets = Reservations.get_empty_cabinets(self.start_date, self.end_date, self.number)
-            if empty_cabinets.count() > len(self.visitors):
-                self.number_cabinets = empty_cabinets
-            else:
-                raise exceptions.NotAcceptable(
-                    detail=_("Все кабинеты заняты в период {} — {} и в номер {}").format(
-                        self.start_date, self.end_date, self.number
-                    ))
+        # Предварительная проверка без блокировок, сами кабинеты занимаются в create
+        if Reservations.get_empty_cabinets(self.start_date, self.end_date, self.number).count() < \
+                self.get_cabinets_count():
+            raise self.cabinets_unavailable()
         return data
 
+    def get_cabinets_count(self):
+        if self.tour_type in [OrgTypeChoice.ZONAOTDYXA]:
+            return 1
+        return len(self.visitors)
+
+    def cabinets_unavailable(self):
+        return exceptions.NotAcceptable(
+            detail=_("Все кабинеты заняты в период {} — {} и в номер {}").format(
+                self.start_date, self.end_date, self.number
+            ))
+
     def create(self, validated_data):
         # STEP 1: Create service cart from the server
         service_cart = ServiceCart.objects.create(start=self.start_date, end=self.end_date, user=self.user,
@@ -181,60 +167,22 @@ class WriteServiceCartSerializer(serializers.ModelSerializer):
                 for visitors_data in self.visitors
             ]
         )
-        # STEP 5: Create payment requisites for user
-        resp_text, error = self.kassa24.create_payment(amount=self.pay_amount,  # TODO: calculate amount to self.pay_amount,
-                                                       service_cart_id=service_cart.pk,
-                                                       email=self.user.get_email(),
-                                                       phone=self.user.get_phone()
-                                                       )
-        # STEP 4: Create reservation from the server
-        if error is False:
-            payment_obj = Payment.objects.create(user=self.user, cart=service_cart,
-                                                 amount=self.pay_amount,  # TODO: calculate amount to self.pay_amount,
-                                                 redirect_url=resp_text)
-            # TODO: Convert this code to celery task delay
-            self.user.send_message_user('Ваша заявка принята',
-                                        'Ваша заявка принята, просим оплатить в течении 10 минут')
-        else:
-            service_cart.error_msg = gettext_lazy("Ошибка платежной системы с содержанием: {}").format(resp_text)
-            service_cart.error = True
-            raise PaymentError(
-                detail=gettext_lazy('Ошибка платежной системы, повторите еще раз. Error Text: {}').format(
-                    resp_text
-                ))
-        if self.tour.org.type in [OrgTypeChoice.ZONAOTDYXA]:
-            # One reservation creating
-            Reservations.objects.create(
-                reservation_date=DateRange(self.start_date, self.end_date, '[)'),
-                number=self.number,
-                number_cabinets=self.number_cabinets,
-                reservator=self.user,
-                amountOfAdults=validated_data.get("count", 1),
-                tour=self.tour,
-                amount=self.pay_amount,
-                fullName=self.user.get_related_user_name(),
-                phoneNumber=self.user.get_phone(),
-                email=self.user.get_email(),
-                payment_fk=payment_obj
-            )
-        else:
-            # More reservation creating
-            reservation_obj_list = []
-            cabinets = self.number_cabinets[:len(self.visitors)]  # QuerySet
-            for num, _ in enumerate(self.visitors):
-                reservation = Reservations(
-                    reservation_date=DateRange(self.start_date, self.end_date, '[)'),
-                    number=self.number,
-                    number_cabinets=cabinets[num],
-                    reservator=self.user,
-                    amountOfAdults=validated_data.get("count", 1),
-                    tour=self.tour,
-                    amount=self.pay_amount,
-                    fullName=self.user.get_related_user_name(),
-                    phoneNumber=self.user.get_phone(),
-                    email=self.user.get_email(),
-                    payment_fk=payment_obj
-                )
-                reservation_obj_list.append(reservation)
-            Reservations.objects.bulk_create(reservation_obj_list)
-            return service_cart
+        # STEP 4: Reserve cabinets before payment. Concurrent carts get different cabinets or NotAcceptable
+        reservations = Reservations.allocate_cabinets(
+            self.number, self.start_date, self.end_date, count=self.get_cabinets_count(),
+            reservator=self.user,
+            amountOfAdults=validated_data.get("count", 1),
+            amount=self.pay_amount,
+            fullName=self.user.get_related_user_name(),
+            phoneNumber=self.user.get_phone(),
+            email=self.user.get_email()
+        )
+        if not reservations:
+            raise self.cabinets_unavailable()
+        # STEP 5: Create pending payment, the payment link is requested by celery after commit
+        payment_obj = Payment.objects.create(user=self.user, cart=service_cart,
+                                             amount=self.pay_amount)  # TODO: calculate amount to self.pay_amount
+        Reservations.objects.filter(pk__in=[reservation.pk for reservation in reservations]).update(
+            payment=payment_obj)
+        transaction.on_commit(lambda: create_kassa24_payment.delay(payment_obj.pk))
+        return service_cart
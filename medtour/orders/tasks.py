@@ -1,11 +1,18 @@
 from io import BytesIO
 
+import requests
+from celery import shared_task
 from django.contrib.staticfiles.storage import staticfiles_storage
 from django.template.loader import get_template
-# from weasyprint import HTML, CSS
+
+from medtour.utils.constants import PaymentGatewayStatusChoices
+from medtour.utils.http import is_connect_error
+from medtour.utils.payment import PaymentApi, capture_message
 
 from .models import ServiceCart, Payment
 
+# from weasyprint import HTML, CSS
+
 
 def generate_pdf(payment_obj: Payment):
     pass
@@ -23,3 +30,44 @@ def generate_pdf(payment_obj: Payment):
     # html.write_pdf(result, stylesheets=[css, check_css])
     # # Save the PDF file to the model
     # payment_obj.pdf_file.save('report.pdf', result, save=True)
+
+
+@shared_task(bind=True, max_retries=4)
+def create_kassa24_payment(self, payment_id: int):
+    """
+    Запрашивает ссылку на оплату вне HTTP запроса и транзакции корзины.
+    Повторяются только ошибки подключения, когда запрос до кассы не дошёл.
+    После таймаута чтения или 5xx касса могла уже создать платёж, повторный
+    POST задвоил бы его, поэтому оплата уходит на сверку. Отказ 4xx или
+    исчерпанные повторы снимают удержание кабинетов.
+    """
+    payment = Payment.objects.select_related("cart__tour__kassa24", "user").filter(
+        pk=payment_id, gateway_status=PaymentGatewayStatusChoices.PENDING
+    ).first()
+    if payment is None:
+        return
+    user = payment.user
+    try:
+        resp_text, error = PaymentApi.for_tour(payment.cart.tour).create_payment(
+            amount=payment.amount,
+            service_cart_id=payment.cart_id,
+            email=user.get_email(),
+            phone=user.get_phone()
+        )
+    except requests.RequestException as e:
+        if not is_connect_error(e):
+            capture_message("kassa24 payment {} needs reconciliation: {}".format(payment.pk, e))
+            payment.mark_for_reconciliation(str(e))
+            return
+        if self.request.retries < self.max_retries:
+            raise self.retry(exc=e, countdown=2 ** self.request.retries * 5)
+        resp_text, error = str(e), True
+
+    if error:
+        payment.fail(resp_text)
+        return
+    payment.redirect_url = resp_text
+    payment.gateway_status = PaymentGatewayStatusChoices.CREATED
+    payment.save(update_fields=["redirect_url", "gateway_status"])
+    user.send_message_user('Ваша заявка принята',
+                           'Ваша заявка принята, просим оплатить в течении 10 минут')
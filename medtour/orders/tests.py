@@ -0,0 +1,182 @@
+import json
+import socket
+import threading
+import time
+from datetime import date
+from http.server import BaseHTTPRequestHandler, HTTPServer
+
+import pytest
+from psycopg2.extras import DateRange
+from rest_framework.test import APIClient
+
+from medtour.contrib.funnel_benchmark import (
+    STEPS, FunnelRun, InProcessTransport, StubServer, compare, funnel_requests, prepare_funnel
+)
+from medtour.orders.models import Payment, ServiceCart
+from medtour.orders.tasks import create_kassa24_payment
+from medtour.sanatorium.models import Reservations
+from medtour.tournumbers.models import TourNumbers, NumberCabinets
+from medtour.tours.management.commands.create_tours import seed_catalogue
+from medtour.tours.models import Tour
+from medtour.users.models import OrganizationCategory, User
+from medtour.utils.constants import PaymentGatewayStatusChoices, PaymentStatusChoices
+from medtour.utils.http import get_client
+from medtour.utils.payment import PaymentApi
+
+pytestmark = pytest.mark.django_db
+
+
+class Kassa24StubHandler(BaseHTTPRequestHandler):
+    responses = []
+    requests = []
+
+    def do_POST(self):  # noqa
+        body = self.rfile.read(int(self.headers["Content-Length"]))
+        self.requests.append(json.loads(body))
+        status, payload = self.responses.pop(0)
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.end_headers()
+        self.wfile.write(json.dumps(payload).encode())
+
+    def log_message(self, *args):
+        pass
+
+
+def read_timeout(handler):
+    """Касса приняла запрос, но не ответила до таймаута чтения клиента"""
+    handler.requests.append(json.loads(handler.rfile.read(int(handler.headers["Content-Length"]))))
+    time.sleep(0.3)
+
+
+@pytest.fixture
+def kassa24_stub(settings):
+    """Локальная заглушка https://ecommerce.pult24.kz/payment/create"""
+    server = HTTPServer(("127.0.0.1", 0), Kassa24StubHandler)
+    Kassa24StubHandler.responses = []
+    Kassa24StubHandler.requests = []
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    settings.KASSA24_URL = "http://127.0.0.1:{}/payment/create".format(server.server_port)
+    yield Kassa24StubHandler
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def payment():
+    user = User.objects.create(username="client")
+    category = OrganizationCategory.objects.create(title="Санатории")
+    tour = Tour.objects.create(title="Тур", category=category)
+    number = TourNumbers.objects.create(tour=tour, place_count=1, price=10000)
+    cart = ServiceCart.objects.create(tour=tour, user=user, number=number, start=date(2024, 6, 1),
+                                      end=date(2024, 6, 5), price=10000)
+    payment = Payment.objects.create(user=user, cart=cart, amount=10000)
+    Reservations.objects.create(number=number, number_cabinets=NumberCabinets.objects.get(tour_number=number),
+                                tour=tour, amount=10000, payment=payment,
+                                reservation_date=DateRange("2024-06-01", "2024-06-05", "[)"))
+    return payment
+
+
+def test_create_kassa24_payment_stores_redirect_url(kassa24_stub, payment):
+    kassa24_stub.responses = [(201, {"url": "https://pay.example/1"})]
+
+    create_kassa24_payment.delay(payment.pk)
+
+    payment.refresh_from_db()
+    assert payment.gateway_status == PaymentGatewayStatusChoices.CREATED
+    assert payment.redirect_url == "https://pay.example/1"
+    assert kassa24_stub.requests[0]["orderId"] == str(payment.cart_id)
+    assert kassa24_stub.requests[0]["amount"] == 1000000
+
+
+def test_create_kassa24_payment_retries_connect_errors(kassa24_stub, payment, settings, monkeypatch):
+    kassa24_stub.responses = [(201, {"url": "https://pay.example/1"})]
+    live_url = settings.KASSA24_URL
+    with socket.socket() as closed:
+        closed.bind(("127.0.0.1", 0))
+        settings.KASSA24_URL = "http://127.0.0.1:{}/payment/create".format(closed.getsockname()[1])
+    create_payment = PaymentApi.create_payment
+
+    def create_then_recover(api, *args, **kwargs):
+        try:
+            return create_payment(api, *args, **kwargs)
+        finally:
+            settings.KASSA24_URL = live_url
+
+    monkeypatch.setattr(PaymentApi, "create_payment", create_then_recover)
+
+    # Eager apply re-runs retried tasks in place only when it does not re-raise Retry
+    create_kassa24_payment.apply(args=(payment.pk,), throw=False)
+
+    payment.refresh_from_db()
+    assert len(kassa24_stub.requests) == 1
+    assert payment.gateway_status == PaymentGatewayStatusChoices.CREATED
+
+
+@pytest.mark.parametrize("failure", [
+    lambda stub: setattr(stub, "responses", [(503, {}), (201, {"url": "https://pay.example/1"})]),
+    lambda stub: setattr(stub, "do_POST", read_timeout),
+])
+def test_create_kassa24_payment_is_not_reposted_after_request_was_sent(kassa24_stub, payment, monkeypatch, failure):
+    monkeypatch.setattr(kassa24_stub, "do_POST", kassa24_stub.do_POST)
+    monkeypatch.setattr(get_client("kassa24"), "timeout", (1, 0.1))
+    failure(kassa24_stub)
+
+    create_kassa24_payment.apply(args=(payment.pk,), throw=False)
+
+    payment.refresh_from_db()
+    assert len(kassa24_stub.requests) == 1
+    assert payment.gateway_status == PaymentGatewayStatusChoices.UNKNOWN
+    assert payment.san_reservations.filter(is_deleted=False).exists()
+
+
+def test_create_kassa24_payment_rejected_releases_hold(kassa24_stub, payment):
+    kassa24_stub.responses = [(400, {"message": "bad merchant"})]
+
+    create_kassa24_payment.delay(payment.pk)
+
+    payment.refresh_from_db()
+    assert payment.gateway_status == PaymentGatewayStatusChoices.FAILED
+    assert "bad merchant" in payment.gateway_error
+    assert not payment.san_reservations.filter(is_deleted=False).exists()
+
+
+def test_payment_status_endpoint(payment):
+    client = APIClient()
+    client.force_authenticate(payment.user)
+
+    response = client.get("/v1/service-cart/{}/payment/".format(payment.cart_id))
+
+    assert response.status_code == 200
+    assert response.data["gateway_status"] == PaymentGatewayStatusChoices.PENDING
+    assert response.data["redirect_url"] is None
+
+
+def test_booking_funnel_benchmark_runs_end_to_end(settings, django_capture_on_commit_callbacks):
+    seed_catalogue(tours=1, regions=1, comments=1)
+    data = prepare_funnel(users=1)
+
+    with StubServer() as stub, django_capture_on_commit_callbacks(execute=True):
+        settings.KASSA24_URL, settings.SMSC_URL = stub.settings["KASSA24_URL"], stub.settings["SMSC_URL"]
+        result = FunnelRun(InProcessTransport, data["tour"], data["number"], data["tokens"], iterations=2).run()
+
+    assert set(result["steps"]) == set(STEPS)
+    assert all(row["count"] == 2 and row["errors"] == 0 for row in result["steps"].values())
+    assert Payment.objects.filter(cart__number=data["number"], status=PaymentStatusChoices.PAID,
+                                  gateway_status=PaymentGatewayStatusChoices.CREATED).count() == 2
+    assert not compare(result, {"steps": {"cart": dict(result["steps"]["cart"], p95=10 ** 6)}}, tolerance=0)
+
+
+def test_service_cart_requires_visitors():
+    seed_catalogue(tours=1, regions=1, comments=1)
+    data = prepare_funnel(users=1)
+    body = dict(funnel_requests(data["tour"], data["number"], date(2030, 1, 1))[-1][3], visitors=[])
+    client = APIClient()
+    client.credentials(HTTP_AUTHORIZATION="Token {}".format(data["tokens"][0]))
+
+    response = client.post("/v1/service-cart/", body, format="json")
+
+    assert response.status_code == 400
+    assert response.data["visitors"] == ["Вы не указали ни одного посетителя"]
+    assert not Reservations.objects.exists()
@@ -1,11 +1,15 @@
 from django.db.transaction import atomic
 from django.utils.translation import gettext_lazy as _
+from drf_spectacular.utils import extend_schema
 from rest_framework import viewsets, status
+from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
 from medtour.contrib.serializers import ReadWriteSerializerMixin
-from medtour.orders.serializers import WriteServiceCartSerializer, ServiceCartSerializer, PaymentSerializer
+from medtour.orders.serializers import (
+    WriteServiceCartSerializer, ServiceCartSerializer, PaymentSerializer, PaymentStatusSerializer
+)
 from medtour.orders.models import Payment, ServiceCart
 
 
@@ -26,6 +30,19 @@ class ServiceCartView(ReadWriteSerializerMixin, viewsets.ModelViewSet):
     def perform_create(self, serializer):
         serializer.save()
 
+    @extend_schema(summary="Статус создания оплаты корзины",
+                   description="Ссылка на оплату запрашивается в фоне после создания корзины. "
+                               "Опрашивайте, пока gateway_status равен 0 (ожидает). "
+                               "3 — ответ кассы не получен, оплата сверяется вручную.",
+                   responses={"200": PaymentStatusSerializer})
+    @action(detail=True)
+    def payment(self, request, *args, **kwargs):
+        cart = self.get_object()
+        if not hasattr(cart, "payments"):
+            return Response({"message": _("Оплата для корзины не создана.")},
+                            status=status.HTTP_404_NOT_FOUND)
+        return Response(PaymentStatusSerializer(cart.payments).data)
+
     def get_queryset(self):
         return ServiceCart.objects.filter(user=self.request.user).select_related(
             "tour", "user", "number"
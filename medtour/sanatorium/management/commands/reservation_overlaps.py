@@ -0,0 +1,48 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from medtour.sanatorium.models import Reservations
+
+
+def releasable(pairs):
+    """
+    Неоплаченные брони, которые можно снять: из пары снимается неоплаченная,
+    из двух неоплаченных более поздняя. Две оплаченные брони остаются для ручного разбора.
+    """
+    released = set()
+    for first, first_paid, second, second_paid in pairs:
+        if first in released or second in released or (first_paid and second_paid):
+            continue
+        released.add(first if second_paid else second)
+    return released
+
+
+class Command(BaseCommand):
+    help = "Lists overlapping reservations of one cabinet; --release soft-deletes the unpaid ones"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--release", action="store_true",
+                            help="Soft-delete unpaid reservations that overlap another one. Paid ones are kept")
+
+    def handle(self, *args, **options):
+        pairs = Reservations.find_overlaps()
+        for first, first_paid, second, second_paid in pairs:
+            self.stdout.write("{} (paid: {}) overlaps {} (paid: {})".format(first, first_paid, second, second_paid))
+        if not options["release"]:
+            self.stdout.write("{} overlapping pairs".format(len(pairs)))
+            return
+
+        released = 0
+        with transaction.atomic():
+            while True:
+                ids = releasable(Reservations.find_overlaps())
+                if not ids:
+                    break
+                released += Reservations.objects.filter(pk__in=ids, paid=False).update(
+                    is_deleted=True, deleted_at=timezone.now())
+        remaining = Reservations.find_overlaps()
+        self.stdout.write(self.style.SUCCESS("Released {} unpaid reservations".format(released)))
+        if remaining:
+            self.stdout.write(self.style.WARNING("{} pairs of paid reservations need manual resolution: {}".format(
+                len(remaining), ", ".join("{}/{}".format(row[0], row[2]) for row in remaining))))
@@ -0,0 +1,18 @@
+# Generated by Django 3.2.15 on 2026-10-18 12:02
+
+import django.contrib.postgres.indexes
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sanatorium', '0003_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='reservations',
+            index=django.contrib.postgres.indexes.GistIndex(fields=['reservation_date'], name='reservations_date_gist'),
+        ),
+    ]
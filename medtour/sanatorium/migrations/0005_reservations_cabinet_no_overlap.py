@@ -0,0 +1,37 @@
+# Generated by Django 3.2.15 on 2026-10-18 12:06
+
+import django.contrib.postgres.constraints
+from django.db import migrations, models
+import django.db.models.expressions
+
+from medtour.sanatorium.models import FIND_OVERLAPS
+
+
+# Уже существующие двойные брони одного кабинета не дадут создать ограничение.
+# Миграция их не трогает: останавливается со списком пар, разобрать их можно
+# командой reservation_overlaps.
+def check_overlaps(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(FIND_OVERLAPS)
+        pairs = cursor.fetchall()
+    if pairs:
+        raise RuntimeError(
+            "Пересекающиеся брони одного кабинета (id): {}. Разберите их командой "
+            "`manage.py reservation_overlaps` и повторите миграцию.".format(
+                ", ".join("{} и {}".format(first, second) for first, _, second, _ in pairs))
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sanatorium', '0004_reservations_date_gist'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_overlaps, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='reservations',
+            constraint=django.contrib.postgres.constraints.ExclusionConstraint(condition=models.Q(('is_deleted', False)), expressions=[(django.db.models.expressions.Func(django.db.models.expressions.F('number_cabinets'), django.db.models.expressions.F('number_cabinets'), django.db.models.expressions.Value('[]'), function='int8range'), '&&'), ('reservation_date', '&&')], name='reservations_cabinet_no_overlap'),
+        ),
+    ]
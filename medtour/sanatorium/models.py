@@ -1,13 +1,17 @@
 import calendar
-import pprint
-from datetime import date
+from datetime import date, timedelta
 
 from django.contrib.auth import get_user_model
-from django.contrib.postgres.fields import DateRangeField
+from django.contrib.postgres.constraints import ExclusionConstraint
+from django.contrib.postgres.fields import DateRangeField, RangeOperators
+from django.contrib.postgres.indexes import GistIndex
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
-from django.db.models import Q
+from django.db import models, connection, transaction, IntegrityError
+from django.db.models import Q, Exists, OuterRef, Subquery, Count, IntegerField, Func, F, Value
+from django.db.models.functions import Coalesce
 from django.utils.translation import gettext_lazy as _
+from psycopg2.errorcodes import EXCLUSION_VIOLATION
+from psycopg2.extras import DateRange
 
 from medtour.contrib.soft_delete_model import SoftDeleteModel
 from medtour.tournumbers.models import TourNumbers, NumberCabinets
@@ -16,6 +20,20 @@ from medtour.utils.constants import ReservationApproveStatusChoices
 
 User = get_user_model()
 
+# Пары пересекающихся неудалённых броней одного кабинета: (id, paid, id, paid).
+# Их не пускает ограничение reservations_cabinet_no_overlap, миграция sanatorium.0005
+# проверяет по этому запросу, что ограничение можно создать.
+FIND_OVERLAPS = """
+    SELECT o.id, o.paid, r.id, r.paid
+    FROM sanatorium_reservations r
+    JOIN sanatorium_reservations o
+      ON o.number_cabinets_id = r.number_cabinets_id
+     AND o.reservation_date && r.reservation_date
+     AND o.id < r.id
+    WHERE r.is_deleted = false AND o.is_deleted = false
+    ORDER BY o.id, r.id
+"""
+
 
 class Reservations(SoftDeleteModel):
     number_cabinets = models.ForeignKey(NumberCabinets, blank=True,
@@ -58,33 +76,77 @@ class Reservations(SoftDeleteModel):
         verbose_name = _("Бронирование отдельного кабинета тура")
         verbose_name_plural = _("1. Бронь кабинета туров")
         default_related_name = "reservations"
+        indexes = [
+            GistIndex(fields=["reservation_date"], name="reservations_date_gist"),
+        ]
+        constraints = [
+            ExclusionConstraint(
+                name="reservations_cabinet_no_overlap",
+                # Равенство кабинета как пересечение int8range[id, id]: GiST умеет это
+                # без расширения btree_gist
+                expressions=[
+                    (Func(F("number_cabinets"), F("number_cabinets"), Value("[]"), function="int8range"),
+                     RangeOperators.OVERLAPS),
+                    ("reservation_date", RangeOperators.OVERLAPS),
+                ],
+                condition=Q(is_deleted=False),
+            ),
+        ]
 
     def __str__(self):
         return "{} | {} | Цена: {}".format(self.tour.title, self.reservation_date, self.amount)
 
     @classmethod
-    def get_free_cabinets(cls):
-        # Get the current date and the start and end dates of the current day
-        today = date.today()
-        year = today.year
-        month = today.month
-        last_day = calendar.monthrange(year, month)[1]
-        last_day_of_month = date(year, month, last_day)
-        x = Reservations.objects.filter(reservation_date__overlap=(
-            today, last_day_of_month)
-        ).values('id', 'reservation_date', 'number_cabinets', 'number').distinct()
-        new_data = []
-        for booking in x:
-            for obj in new_data:
-                if obj['number'] == booking['number'] and obj['cabinet'] == booking['number_cabinets']:
-                    obj['daterange'].append(booking['reservation_date'])
-            new_data.append({
-                'number': booking['number'],
-                'cabinet': booking['number_cabinets'],
-                'daterange': [booking['reservation_date']]
+    def get_month_occupancy(cls, tour_id, year, month):
+        """
+        Матрица занятости кабинет × день тура за месяц.
+        Дни броней разворачиваются в SQL через generate_series по пересечению
+        диапазона брони с месяцем, в Python ответ только раскладывается по ячейкам.
+        """
+        first_day = date(year, month, 1)
+        days = [first_day + timedelta(days=i) for i in range(calendar.monthrange(year, month)[1])]
+        next_month_day = days[-1] + timedelta(days=1)
+
+        cabinets = NumberCabinets.objects.filter(
+            tour_number__tour_id=tour_id, tour_number__is_deleted=False, is_deleted=False
+        ).select_related("tour_number").order_by("tour_number__order", "number")
+        grid = {cabinet.id: [None] * len(days) for cabinet in cabinets}
+
+        sql = """
+            SELECT r.number_cabinets_id, r.id, r.paid, r.closed_for_repair, d::date - %s::date
+            FROM {reservations} r
+            CROSS JOIN LATERAL generate_series(
+                GREATEST(lower(r.reservation_date), %s::date),
+                LEAST(upper(r.reservation_date), %s::date) - 1,
+                interval '1 day'
+            ) AS d
+            WHERE r.tour_id = %s AND r.is_deleted = false AND r.reservation_date && daterange(%s, %s)
+        """.format(reservations=cls._meta.db_table)
+        params = [first_day, first_day, next_month_day, tour_id, first_day, next_month_day]
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            for cabinet_id, reservation_id, paid, closed_for_repair, day_index in cursor.fetchall():
+                if cabinet_id in grid:
+                    grid[cabinet_id][day_index] = {
+                        "id": reservation_id,
+                        "paid": paid,
+                        "closedForRepair": closed_for_repair,
+                    }
+
+        numbers = {}
+        for cabinet in cabinets:
+            number = numbers.setdefault(cabinet.tour_number_id, {
+                "id": cabinet.tour_number_id,
+                "type": cabinet.tour_number.title,
+                "cabinets": [],
             })
-        pprint.pprint(new_data)
-        return x
+            number["cabinets"].append({
+                "id": cabinet.id,
+                "number": cabinet.number,
+                "name": cabinet.humanize_name,
+                "days": grid[cabinet.id],
+            })
+        return {"days": days, "numbers": list(numbers.values())}
 
     @classmethod
     def get_all_number_cabinets_with_overlap(cls, start, end):
@@ -99,11 +161,71 @@ class Reservations(SoftDeleteModel):
             reservations__number_id=number_id
         )
 
+    @classmethod
+    def get_overlapping(cls, start, end):
+        """Активные брони, пересекающиеся с промежутком [start, end)"""
+        return cls.objects.filter(is_deleted=False, reservation_date__overlap=(start, end))
+
+    @classmethod
+    def get_free_cabinets_qs(cls, start, end):
+        """
+        Кабинеты без пересекающихся броней. Анти-джойн NOT EXISTS по GiST индексу
+        reservation_date вместо IN (...) с DISTINCT по всем занятым кабинетам.
+        """
+        return NumberCabinets.objects.filter(is_deleted=False).filter(
+            ~Exists(cls.get_overlapping(start, end).filter(number_cabinets=OuterRef("pk")))
+        )
+
     @classmethod
     def get_empty_cabinets(cls, start_date, end, number_id):
-        # TODO: Optimize query with prefetch related
-        reservations_qs = cls.get_all_tour_numbers_id_with_start(start_date, end, number_id)
-        return NumberCabinets.objects.filter(tour_number_id=number_id).exclude(Q(id__in=reservations_qs))
+        return cls.get_free_cabinets_qs(start_date, end).filter(tour_number_id=number_id)
+
+    @classmethod
+    def allocate_cabinets(cls, number, start, end, count=1, attempts=3, **reservation_data):
+        """
+        Атомарно бронирует count свободных кабинетов номера на промежуток [start, end).
+        Кабинеты берутся через SELECT ... FOR UPDATE SKIP LOCKED, поэтому параллельные
+        корзины разбирают разные кабинеты, а не ждут друг друга. Бронь, закоммиченную
+        между снимком и блокировкой, ловит exclusion constraint — тогда подбор повторяется.
+        Возвращает список броней или пустой список, если свободных кабинетов не хватило.
+        """
+        reservation_date = DateRange(start, end, '[)')
+        for _attempt in range(attempts):
+            try:
+                with transaction.atomic():
+                    cabinets = list(cls.get_empty_cabinets(start, end, number.pk).order_by(
+                        "number").select_for_update(skip_locked=True)[:count])
+                    if len(cabinets) < count:
+                        return []
+                    return cls.objects.bulk_create([
+                        cls(number=number, number_cabinets=cabinet, tour_id=number.tour_id,
+                            reservation_date=reservation_date, **reservation_data)
+                        for cabinet in cabinets
+                    ])
+            except IntegrityError as e:
+                if getattr(e.__cause__, "pgcode", None) != EXCLUSION_VIOLATION:
+                    raise
+        return []
+
+    @classmethod
+    def get_tour_availability(cls, start, end, tour_id):
+        """
+        Количество свободных кабинетов для каждого номера тура за промежуток
+        одним запросом: номера тура с подзапросом-счётчиком свободных кабинетов.
+        """
+        free_count = cls.get_free_cabinets_qs(start, end).filter(
+            tour_number=OuterRef("pk")
+        ).order_by().values("tour_number").annotate(count=Count("pk")).values("count")
+        return TourNumbers.objects.filter(tour_id=tour_id, is_deleted=False).annotate(
+            free_cabinets=Coalesce(Subquery(free_count, output_field=IntegerField()), 0)
+        ).order_by("order")
+
+    @classmethod
+    def find_overlaps(cls):
+        """Пересекающиеся брони одного кабинета, см. FIND_OVERLAPS"""
+        with connection.cursor() as cursor:
+            cursor.execute(FIND_OVERLAPS)
+            return cursor.fetchall()
 
     @classmethod
     def check_number_cabinets_is_available(cls, start_date, end_date, number_cabinets_id):
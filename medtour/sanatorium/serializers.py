@@ -102,3 +102,34 @@ class ReservationsCheckSerializer(serializers.Serializer):
     start = serializers.DateField(write_only=True)
     end = serializers.DateField(write_only=True)
     number = serializers.PrimaryKeyRelatedField(queryset=TourNumbers.objects.all(), write_only=True)
+
+
+class NumberAvailabilitySerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    title = serializers.CharField()
+    place_count = serializers.IntegerField()
+    free_cabinets = serializers.IntegerField()
+
+
+class OccupancyCellSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    paid = serializers.BooleanField()
+    closedForRepair = serializers.BooleanField()
+
+
+class OccupancyCabinetSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    number = serializers.IntegerField()
+    name = serializers.CharField(allow_null=True)
+    days = serializers.ListField(child=OccupancyCellSerializer(allow_null=True))
+
+
+class OccupancyNumberSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    type = serializers.CharField()
+    cabinets = OccupancyCabinetSerializer(many=True)
+
+
+class OccupancyCalendarSerializer(serializers.Serializer):
+    days = serializers.ListField(child=serializers.DateField())
+    numbers = OccupancyNumberSerializer(many=True)
@@ -0,0 +1,154 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from importlib import import_module
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.db import connection, connections, transaction, IntegrityError
+from django.test.utils import CaptureQueriesContext
+from psycopg2.extras import DateRange
+from rest_framework.test import APIClient
+
+from medtour.sanatorium.models import Reservations
+from medtour.tournumbers.models import TourNumbers, NumberCabinets
+from medtour.tours.models import Tour
+from medtour.users.models import OrganizationCategory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def tour():
+    category = OrganizationCategory.objects.create(title="Санатории")
+    return Tour.objects.create(title="Тур", category=category)
+
+
+@pytest.fixture
+def number(tour):
+    return TourNumbers.objects.create(tour=tour, place_count=3, price=10000)
+
+
+def reserve(number, cabinet, start, end, **kwargs):
+    return Reservations.objects.create(number=number, number_cabinets=cabinet, tour=number.tour, amount=0,
+                                       reservation_date=DateRange(start, end, '[)'), **kwargs)
+
+
+def test_get_empty_cabinets_skips_overlapping(number):
+    first, second, third = NumberCabinets.objects.filter(tour_number=number)
+    reserve(number, first, "2024-06-01", "2024-06-05")
+    reserve(number, second, "2024-06-05", "2024-06-08")
+    reserve(number, third, "2024-06-02", "2024-06-04", is_deleted=True)
+
+    empty = Reservations.get_empty_cabinets("2024-06-03", "2024-06-05", number.id)
+
+    assert set(empty) == {second, third}
+
+
+def test_get_tour_availability_single_query(tour, number):
+    other = TourNumbers.objects.create(tour=tour, place_count=2, price=20000)
+    reserve(number, NumberCabinets.objects.filter(tour_number=number).first(), "2024-06-01", "2024-06-10")
+
+    with CaptureQueriesContext(connection) as ctx:
+        availability = {row.id: row.free_cabinets
+                        for row in Reservations.get_tour_availability("2024-06-02", "2024-06-03", tour.id)}
+
+    assert len(ctx.captured_queries) == 1
+    assert availability == {number.id: 2, other.id: 2}
+
+
+DATERANGE_ERROR = "Неверный формат daterange, укажите YYYY-MM-DD,YYYY-MM-DD"
+
+
+@pytest.mark.parametrize("params, error", [
+    ({"daterange": "2024-06-02"}, DATERANGE_ERROR),
+    ({"daterange": "2024-06-02,2024-06-03,2024-06-04"}, DATERANGE_ERROR),
+    ({"daterange": "02/06/2024,03/06/2024"}, DATERANGE_ERROR),
+    ({"daterange": "2024-06-02,2024-13-01"}, DATERANGE_ERROR),
+    ({"daterange": "2024-06-02,2024-06-03", "tour_id": "x"}, "Неверный ID тура"),
+])
+def test_availability_rejects_malformed_input(tour, params, error):
+    response = APIClient().get("/v1/crm/availability/", {"tour_id": tour.id, **params})
+
+    assert response.status_code == 400
+    assert response.data == [error]
+
+
+def test_availability_counts_free_cabinets(tour, number):
+    response = APIClient().get("/v1/crm/availability/", {"daterange": "2024-06-02,2024-06-03", "tour_id": tour.id})
+
+    assert response.status_code == 200
+    assert [(row["id"], row["free_cabinets"]) for row in response.data] == [(number.id, 3)]
+
+
+def test_get_month_occupancy_clips_reservations_to_month(tour, number):
+    first, second, _ = NumberCabinets.objects.filter(tour_number=number).order_by("number")
+    spanning = reserve(number, first, "2024-05-30", "2024-06-03", paid=True)
+    inner = reserve(number, second, "2024-06-29", "2024-07-02")
+
+    with CaptureQueriesContext(connection) as ctx:
+        occupancy = Reservations.get_month_occupancy(tour.id, 2024, 6)
+
+    assert len(ctx.captured_queries) == 2
+    assert len(occupancy["days"]) == 30
+    cabinets = {row["id"]: row["days"] for row in occupancy["numbers"][0]["cabinets"]}
+    assert [cell and cell["id"] for cell in cabinets[first.id][:3]] == [spanning.id, spanning.id, None]
+    assert cabinets[first.id][0]["paid"] is True
+    assert [cell and cell["id"] for cell in cabinets[second.id][-3:]] == [None, inner.id, inner.id]
+
+
+def test_exclusion_constraint_rejects_double_booking(number):
+    cabinet = NumberCabinets.objects.filter(tour_number=number).first()
+    reserve(number, cabinet, "2024-06-01", "2024-06-05")
+    reserve(number, cabinet, "2024-06-05", "2024-06-07")
+    reserve(number, cabinet, "2024-06-02", "2024-06-03", is_deleted=True)
+
+    with pytest.raises(IntegrityError), transaction.atomic():
+        reserve(number, cabinet, "2024-06-04", "2024-06-06")
+
+
+def test_reservation_overlaps_keeps_paid_reservations(number):
+    first, second, _ = NumberCabinets.objects.filter(tour_number=number).order_by("number")
+    with connection.cursor() as cursor:  # брони, созданные до ограничения
+        cursor.execute("ALTER TABLE sanatorium_reservations DROP CONSTRAINT reservations_cabinet_no_overlap")
+    unpaid = reserve(number, first, "2024-06-01", "2024-06-05")
+    reserve(number, first, "2024-06-03", "2024-06-08", paid=True)
+    later_unpaid = reserve(number, first, "2024-06-07", "2024-06-09")
+    both_paid = [reserve(number, second, "2024-06-01", "2024-06-05", paid=True) for _ in range(2)]
+
+    with pytest.raises(RuntimeError, match=str(both_paid[0].pk)):
+        import_module("medtour.sanatorium.migrations.0005_reservations_cabinet_no_overlap").check_overlaps(
+            None, connection.schema_editor())
+
+    call_command("reservation_overlaps", "--release", stdout=StringIO())
+
+    assert set(Reservations.objects.filter(is_deleted=True).values_list("pk", flat=True)) == {
+        unpaid.pk, later_unpaid.pk}
+    assert not Reservations.objects.filter(paid=True, is_deleted=True).exists()
+    assert Reservations.find_overlaps() == [(both_paid[0].pk, True, both_paid[1].pk, True)]
+
+
+@pytest.mark.django_db(transaction=True)
+def test_allocate_cabinets_parallel_carts():
+    """Параллельные корзины на один номер не должны получить один кабинет дважды"""
+    category = OrganizationCategory.objects.create(title="Санатории")
+    number = TourNumbers.objects.create(tour=Tour.objects.create(title="Тур", category=category),
+                                        place_count=5, price=10000)
+    carts = 20
+    barrier = threading.Barrier(carts)
+
+    def checkout(_):
+        try:
+            barrier.wait()
+            with transaction.atomic():
+                return len(Reservations.allocate_cabinets(number, "2024-07-01", "2024-07-10", amount=0))
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=carts) as executor:
+        allocated = list(executor.map(checkout, range(carts)))
+
+    assert sum(allocated) == 5
+    reservations = Reservations.objects.filter(number=number, is_deleted=False)
+    assert reservations.count() == 5
+    assert reservations.values("number_cabinets").distinct().count() == 5
@@ -1,18 +1,23 @@
+import datetime
+
 from django.contrib.auth import get_user_model
 from django.db.models import Q
 from django.utils.translation import gettext_lazy as _
 from drf_spectacular.utils import extend_schema, OpenApiParameter
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import PermissionDenied, ValidationError
 from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from rest_framework.views import APIView
 
 from medtour.contrib.exceptions import ImATeapot
 from medtour.contrib.soft_delete_model import SoftDeleteModelViewSet
-from medtour.sanatorium.serializers import ReservationsSerializer, ReservationsCheckSerializer
+from medtour.sanatorium.serializers import (
+    ReservationsSerializer, ReservationsCheckSerializer, NumberAvailabilitySerializer, OccupancyCalendarSerializer
+)
 from medtour.sanatorium.models import Reservations
+from medtour.tours.models import Tour
 from medtour.users.serializers import ActivateCodeSerializer
 from medtour.users.models import ActivateCode
 from medtour.utils.constants import ReservationApproveStatusChoices
@@ -44,7 +49,7 @@ class ReservationsView(SoftDeleteModelViewSet):
         return qs.filter(query).select_related("tour__org")
 
     def get_permissions(self):
-        if self.action == "check":
+        if self.action in ["check", "availability"]:
             return AllowAny(),
         return [permission() for permission in self.permission_classes]
 
@@ -83,6 +88,72 @@ class ReservationsView(SoftDeleteModelViewSet):
         serializer = ReservationsCheckSerializer({"count": count}, many=False)
         return Response(serializer.data)
 
+    @extend_schema(summary="Количество свободных кабинетов по всем номерам тура",
+                   parameters=[
+                       OpenApiParameter(name="daterange",
+                                        description="Чтобы вывести укажите промежуток дат в виде"
+                                                    "?daterange=YYYY-MM-DD,YYYY-MM-DD",
+                                        required=True),
+                       OpenApiParameter(name="tour_id",
+                                        description="Введите ID тура",
+                                        required=True)
+                   ],
+                   responses={"200": NumberAvailabilitySerializer(many=True)}
+                   )
+    @action(detail=False)
+    def availability(self, request, *args, **kwargs):
+        daterange = request.query_params.get('daterange')
+        tour_id = request.query_params.get('tour_id')
+        if not daterange or not tour_id:
+            return Response({"message": _("Обязательный параметр daterange или tour_id не указан.")},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            start, end = [datetime.date.fromisoformat(value) for value in daterange.split(',')]
+        except ValueError:
+            raise ValidationError(detail=_("Неверный формат daterange, укажите YYYY-MM-DD,YYYY-MM-DD"))
+        if not tour_id.isdigit():
+            raise ValidationError(detail=_("Неверный ID тура"))
+        if start > end:
+            raise ImATeapot(detail=_("Вы ввели дату поиска наоборот, перепроверьте пожалуйста"))
+
+        queryset = Reservations.get_tour_availability(start, end, tour_id)
+        serializer = NumberAvailabilitySerializer(queryset, many=True)
+        return Response(serializer.data)
+
+    @extend_schema(summary="Календарь занятости кабинетов тура за месяц",
+                   parameters=[
+                       OpenApiParameter(name="month",
+                                        description="Месяц в виде ?month=YYYY-MM",
+                                        required=True),
+                       OpenApiParameter(name="tour_id",
+                                        description="Введите ID тура",
+                                        required=True)
+                   ],
+                   responses={"200": OccupancyCalendarSerializer}
+                   )
+    @action(detail=False)
+    def calendar(self, request, *args, **kwargs):
+        month = request.query_params.get('month')
+        tour_id = request.query_params.get('tour_id')
+        if not month or not tour_id:
+            return Response({"message": _("Обязательный параметр month или tour_id не указан.")},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            year, month = [int(value) for value in month.split('-')]
+            tour_id = int(tour_id)
+        except ValueError:
+            raise ValidationError(detail=_("Неверный формат месяца, укажите YYYY-MM"))
+        if not hasattr(request.user, 'organization') or not Tour.objects.filter(
+                pk=tour_id, org=request.user.organization).exists():
+            raise PermissionDenied
+        try:
+            occupancy = Reservations.get_month_occupancy(tour_id, year, month)
+        except ValueError:
+            raise ValidationError(detail=_("Неверный формат месяца, укажите YYYY-MM"))
+
+        serializer = OccupancyCalendarSerializer(occupancy)
+        return Response(serializer.data)
+
     @extend_schema(summary="Вывод броней",
                    parameters=[
                        OpenApiParameter(name="daterange",
@@ -124,7 +195,8 @@ class SendConfirmationCodeView(APIView):
             user = User.objects.get(id=reservation.reservator_id)
             code = ActivateCode.objects.regenerate_otp(user_id=reservation.reservator_id)
             user.send_message_user(_("MTour.kz код подтверждения"),
-                                   _("Код подтверждения: {code}").format(code=code.number))
+                                   _("Код подтверждения: {code}").format(code=code.number),
+                                   sensitive=True)
             reservation.approved_status = ReservationApproveStatusChoices.SENT
             reservation.save()
             return Response({'message': _('Код подтверждения успешно отправлено')}, status=status.HTTP_200_OK)
@@ -0,0 +1,62 @@
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from medtour.contrib.metrics import get_store, render
+from medtour.tours.models import Tour
+from medtour.tours.tasks import create_days
+from medtour.users.models import OrganizationCategory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def metrics(settings):
+    settings.METRICS_ENABLED = True
+    cache.clear()
+    get_store().clear()
+    yield get_store()
+    get_store().clear()
+
+
+def test_metrics_endpoint_exposes_routes_caches_and_tasks(metrics, django_capture_on_commit_callbacks):
+    category = OrganizationCategory.objects.create(title="Санатории")
+    with django_capture_on_commit_callbacks(execute=True):
+        tour = Tour.objects.create(title="Тур", category=category, is_moderated=True)
+    client = APIClient()
+
+    client.get("/v1/tours/slug/{}/".format(tour.slug))
+    client.get("/v1/tours/slug/{}/".format(tour.slug))
+    response = client.get("/metrics", REMOTE_ADDR="127.0.0.1")
+
+    assert response.status_code == 200
+    body = response.content.decode()
+    assert 'http_requests_total{method="GET",route="v1:tours-detail-slug",status="200"} 2' in body
+    assert 'http_request_duration_seconds_bucket{le="+Inf",method="GET",route="v1:tours-detail-slug"} 2' in body
+    assert 'http_db_queries_total{route="v1:tours-detail-slug"}' in body
+    assert 'cache_requests_total{cache="response",result="hit"} 1' in body
+    assert 'cache_hit_ratio{cache="response"} 0.5' in body
+    assert 'celery_tasks_finished_total{state="SUCCESS",task="%s"} 1' % create_days.name in body
+    assert "# TYPE celery_task_duration_seconds histogram" in body
+
+
+def test_metrics_endpoint_requires_allowed_ip_or_token(metrics, settings):
+    settings.METRICS_TOKEN = "secret"
+    client = APIClient()
+
+    assert client.get("/metrics", REMOTE_ADDR="10.0.0.1").status_code == 403
+    assert client.get("/metrics", REMOTE_ADDR="10.0.0.1", HTTP_AUTHORIZATION="Bearer secret").status_code == 200
+
+
+def test_histogram_buckets_are_cumulative():
+    values = {
+        'outbound_request_duration_seconds_bucket\t{"le": "0.05", "provider": "smsc"}': 2,
+        'outbound_request_duration_seconds_bucket\t{"le": "1", "provider": "smsc"}': 1,
+        'outbound_request_duration_seconds_count\t{"provider": "smsc"}': 3,
+    }
+
+    body = render(values)
+
+    assert 'outbound_request_duration_seconds_bucket{le="0.025",provider="smsc"} 0' in body
+    assert 'outbound_request_duration_seconds_bucket{le="0.5",provider="smsc"} 2' in body
+    assert 'outbound_request_duration_seconds_bucket{le="+Inf",provider="smsc"} 3' in body
@@ -0,0 +1,62 @@
+import json
+import logging
+
+import pytest
+from django.core.cache import cache
+from rest_framework.test import APIClient
+
+from medtour.contrib.profiling import record_http
+from medtour.tours.models import Tour
+from medtour.users.models import OrganizationCategory
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def tour():
+    cache.clear()
+    category = OrganizationCategory.objects.create(title="Санатории")
+    return Tour.objects.create(title="Тур", category=category, is_moderated=True)
+
+
+def profile_logs(caplog):
+    return [json.loads(record.getMessage()) for record in caplog.records if record.name == "medtour.profiling"]
+
+
+def test_profile_header_emits_server_timing(tour, settings, caplog):
+    settings.PROFILING_TOKEN = "secret"
+    client = APIClient()
+    caplog.set_level(logging.INFO, logger="medtour.profiling")
+
+    miss = client.get("/v1/tours/slug/{}/".format(tour.slug), HTTP_X_PROFILE="secret")
+    hit = client.get("/v1/tours/slug/{}/".format(tour.slug), HTTP_X_PROFILE="secret")
+
+    assert 'cache-response;desc="hit=0 miss=1"' in miss["Server-Timing"]
+    assert 'cache-response;desc="hit=1 miss=0"' in hit["Server-Timing"]
+    first, second = profile_logs(caplog)
+    assert first["trigger"] == "header" and first["status"] == 200
+    assert first["sql_count"] > 0 and first["serializer_ms"] > 0
+    assert first["cache"]["tour_fragment"] == {"hit": 0, "miss": 1}
+    assert second["sql_count"] < first["sql_count"]
+
+
+def test_profile_is_off_without_token_or_sampling(tour, settings, caplog):
+    settings.PROFILING_TOKEN = ""
+    settings.PROFILING_SAMPLE_RATE = 0
+    caplog.set_level(logging.INFO, logger="medtour.profiling")
+
+    response = APIClient().get("/v1/tours/slug/{}/".format(tour.slug), HTTP_X_PROFILE="")
+    record_http(1)
+
+    assert "Server-Timing" not in response
+    assert not profile_logs(caplog)
+
+
+def test_sampled_request_is_logged_without_header(tour, settings, caplog):
+    settings.PROFILING_SAMPLE_RATE = 1
+    caplog.set_level(logging.INFO, logger="medtour.profiling")
+
+    response = APIClient().get("/v1/tours/slug/{}/".format(tour.slug))
+
+    assert "Server-Timing" not in response
+    assert profile_logs(caplog)[0]["trigger"] == "sample"
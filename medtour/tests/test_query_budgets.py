@@ -0,0 +1,56 @@
+"""
+Количество SQL запросов каждого GET эндпоинта роутера API.
+
+Маршрут падает, если превышает свой бюджет или если количество запросов растёт
+вместе с количеством строк (N+1). Отчёт по маршрутам пишется в файл из
+QUERY_BUDGET_REPORT или во временную папку теста.
+"""
+import os
+
+import pytest
+from django.core.cache import cache
+
+from config.api_router import router
+from medtour.contrib.query_budget import DEFAULT_BUDGET, iter_routes, measure, write_report
+from medtour.tours.management.commands.create_tours import seed_catalogue
+from medtour.users.models import User
+
+pytestmark = pytest.mark.django_db
+
+# Бюджеты сверх DEFAULT_BUDGET. Запросы сессии и пользователя входят в бюджет
+QUERY_BUDGETS = {
+    "tours-detail": 12,  # без кэша карточки, см. TourReadSerializer
+    "tourpackages-detail": 12,
+    "tourpackages-list": 14,
+}
+
+# Маршруты с известным N+1, пока не исправлены. Новые сюда не добавлять
+KNOWN_GROWTH = set()
+
+
+def run_routes(client):
+    results = {}
+    for name, url, params in iter_routes(router):
+        cache.clear()
+        results[name] = measure(client, url, params)
+    return results
+
+
+def test_routes_fit_query_budget(client, tmp_path):
+    client.raise_request_exception = False
+    client.force_login(User.objects.create(username="admin", is_staff=True, is_superuser=True))
+    seed_catalogue(tours=1, regions=2, comments=1)
+    small = run_routes(client)
+    seed_catalogue(tours=2, regions=2, comments=2, seed=1)
+    large = run_routes(client)
+
+    report = {}
+    for name, row in small.items():
+        grown = large.get(name, row)
+        report[name] = dict(row, queries_grown=grown["queries"], budget=QUERY_BUDGETS.get(name, DEFAULT_BUDGET))
+    table = write_report(report, os.environ.get("QUERY_BUDGET_REPORT") or tmp_path / "query-budget.json")
+
+    assert not [name for name, row in report.items() if row["status"] >= 500], table
+    assert not [name for name, row in report.items() if row["queries_grown"] > row["budget"]], table
+    assert not [name for name, row in report.items()
+                if row["queries_grown"] > row["queries"] and name not in KNOWN_GROWTH], table
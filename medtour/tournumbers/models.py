@@ -5,6 +5,7 @@ from ordered_model.models import OrderedModel
 from sorl.thumbnail import ImageField
 
 from medtour.contrib.soft_delete_model import SoftDeleteModel
+from medtour.contrib.sorl_thumbnail_serializer.thumbnails import ThumbnailManifestModel
 from medtour.tournumbers.instances import get_shots_path
 
 
@@ -33,7 +34,7 @@ class TourNumbers(OrderedModel, SoftDeleteModel):
         return self.title
 
 
-class NumberShots(OrderedModel):
+class NumberShots(OrderedModel, ThumbnailManifestModel):
     tour_number = models.ForeignKey("tournumbers.TourNumbers", verbose_name=_("Номер"), on_delete=models.CASCADE)
     photo = ImageField(_("Изображение"), upload_to=get_shots_path)
     name = models.CharField(_("Имя изображения"), null=True, max_length=50, blank=True)
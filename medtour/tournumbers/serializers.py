@@ -64,7 +64,7 @@ class NumberShotsSerializer(OrderedModelSerializer):
 
     class Meta:
         model = NumberShots
-        fields = "__all__"
+        exclude = ("thumbnails", "thumbnails_source")
 
 
 class ListNumbersSerializer(serializers.ModelSerializer):
@@ -113,7 +113,7 @@ class NumberShotsCreateSerializer(OrderedModelSerializer):
 
     class Meta:
         model = NumberShots
-        exclude = ("order",)
+        exclude = ("order", "thumbnails", "thumbnails_source")
 
 
 class FreeNumbersSerializer(serializers.Serializer):
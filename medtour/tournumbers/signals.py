@@ -1,8 +1,10 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_save, post_delete
 from django.dispatch import receiver
 
-from medtour.tournumbers.models import TourNumbers, NumberCabinets
+from medtour.contrib.sorl_thumbnail_serializer.thumbnails import schedule_thumbnails
+from medtour.tournumbers.models import TourNumbers, NumberCabinets, NumberShots
 from medtour.tournumbers.tasks import create_cabinets
+from medtour.tours.signals import schedule_tour_summary_refresh
 
 
 @receiver(post_save, sender=TourNumbers)
@@ -10,3 +12,14 @@ def creating_package_cabinets(sender, instance, created, **kwargs):
     if created:
         cabinets_count = instance.place_count
         create_cabinets.delay(instance.id, cabinets_count)
+
+
+@receiver(post_save, sender=TourNumbers)
+@receiver(post_delete, sender=TourNumbers)
+def refresh_summary_on_number(sender, instance, **kwargs):
+    schedule_tour_summary_refresh(instance.tour_id)
+
+
+@receiver(post_save, sender=NumberShots)
+def schedule_shot_thumbnails(sender, instance, **kwargs):
+    schedule_thumbnails(instance)
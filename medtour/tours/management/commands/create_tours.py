@@ -1,30 +1,138 @@
+import uuid
+
 from django.core.management.base import BaseCommand
+from django.db import transaction
 from faker import Faker
 
-from medtour.tours.models import Tour
-from medtour.users.models import Country, Region, OrganizationCategory
+from medtour.contrib.sorl_thumbnail_serializer.thumbnails import THUMBNAIL_GEOMETRIES
+from medtour.guides.models import Guide, GuideCategory, GuideProgram, GuideReview, GuideShots
+from medtour.tournumbers.models import TourNumbers
+from medtour.tourpackages.models import TourPackages
+from medtour.tours.models import (
+    Tour, TourShots, CommentTour, TourPaidServices, AdditionalTitles, TourAdditionalTitle, AdditionalInfoServices,
+    TourMedicalProfile
+)
+from medtour.users.models import City, Country, Organization, OrganizationCategory, Region, User
+from medtour.utils.constants import OrgTypeChoice
 
-x = Faker.seed(0)
 fake = Faker('ru-RU')
-print(fake.bs(), type(fake.bs()), len(fake.bs()))
+
+
+def get_or_create_geography(regions):
+    country = Country.objects.first() or Country.objects.create(name="Казахстан")
+    for _ in range(Region.objects.filter(country=country).count(), regions):
+        region = Region.objects.create(country=country, name=fake.administrative_unit())
+        City.objects.create(region=region, name=fake.city_name(), slug="city-{}".format(region.pk),
+                            is_first_page=True)
+    return list(Region.objects.filter(country=country).prefetch_related("cities")[:regions])
+
+
+def get_or_create_categories():
+    return list(OrganizationCategory.objects.all()) or [
+        OrganizationCategory.objects.create(title="Санатории", slug="sanatorii"),
+        OrganizationCategory.objects.create(title="Зоны отдыха", slug="zony-otdyxa"),
+    ]
+
+
+def get_or_create_medical_profiles():
+    if not TourMedicalProfile.objects.exists():
+        TourMedicalProfile.objects.bulk_create([
+            TourMedicalProfile(name=name) for name in ("Кардиология", "Неврология")
+        ])
+    return list(TourMedicalProfile.objects.all())
+
+
+def shot_data(photo):
+    """Фото с готовым манифестом миниатюр, как после generate_thumbnails"""
+    manifest = {geometry: "cache/seed/{}.webp".format(geometry) for geometry in THUMBNAIL_GEOMETRIES}
+    return {"photo": photo, "thumbnails": manifest, "thumbnails_source": photo}
+
+
+def create_user(prefix):
+    return User.objects.create(username="{}-{}".format(prefix, uuid.uuid4().hex))
+
+
+def create_tour(organization, region, category, comments):
+    tour = Tour.objects.create(
+        title="Тур: {}".format(fake.bs()), description=fake.text(), org=organization, region=region,
+        country=region.country, city=next(iter(region.cities.all()), None), category=category, is_moderated=True
+    )
+    for order in range(3):
+        TourShots.objects.create(tour=tour, **shot_data("tours/seed/{}-{}.jpg".format(tour.pk, order)))
+    numbers = [
+        TourNumbers.objects.create(tour=tour, title="{} местн. номер".format(places), place_count=places,
+                                   price=fake.random_int(10, 60) * 1000)
+        for places in (1, 2)
+    ]
+    for number in numbers:
+        TourPackages.objects.create(tour=tour, number=number, title="Стандарт", price=number.price * 7)
+    TourPaidServices.objects.create(tour=tour, name="Трансфер", price=5000)
+    title = TourAdditionalTitle.objects.create(tour=tour, title=AdditionalTitles.objects.get_or_create(
+        name="Инфраструктура")[0])
+    AdditionalInfoServices.objects.create(title=title, service="Бассейн")
+    tour.medical_profiles.add(*TourMedicalProfile.objects.all()[:2])
+    for author in comments:
+        CommentTour.objects.create(tour=tour, user=author, service=fake.random_int(3, 5),
+                                   location=fake.random_int(3, 5), purity=fake.random_int(3, 5),
+                                   staff=fake.random_int(3, 5), proportion=fake.random_int(3, 5),
+                                   text=fake.paragraph(nb_sentences=3))
+    return tour
+
+
+def create_guide(region, category, reviews):
+    organization = Organization.objects.create(user=create_user("guide"), org_name=fake.company(),
+                                               type=OrgTypeChoice.GUIDE, is_moderated=True)
+    guide = Guide.objects.create(
+        title=fake.name(), description=fake.text(), org=organization, category=category, region=region,
+        country=region.country, city=next(iter(region.cities.all()), None), is_moderated=True
+    )
+    for order in range(2):
+        GuideShots.objects.create(guide=guide, **shot_data("guides/seed/{}-{}.jpg".format(guide.pk, order)))
+    for order in range(2):
+        GuideProgram.objects.create(guide=guide, name=fake.catch_phrase(), description=fake.text(),
+                                    program=fake.text(), price=fake.random_int(5, 40) * 1000,
+                                    venue_lon=float(fake.longitude()), venue_lat=float(fake.latitude()),
+                                    venue_address=fake.street_address())
+    for author in reviews:
+        GuideReview.objects.create(guide=guide, user=author, service=5, location=4, staff=5, proportion=4,
+                                   text=fake.paragraph(nb_sentences=3))
+    return guide
+
+
+@transaction.atomic
+def seed_catalogue(tours=3, regions=2, comments=2, seed=0):
+    """
+    Каталог для разработки и проверки количества запросов: на каждый регион и
+    категорию создаётся tours туров с фото, номерами, пакетами, услугами и отзывами
+    и один гид с программами. Повторный вызов добавляет строки к уже созданным.
+    """
+    Faker.seed(seed)
+    regions = get_or_create_geography(regions)
+    categories = get_or_create_categories()
+    guide_category = GuideCategory.objects.first() or GuideCategory.objects.create(title="Туры", slug="tury")
+    get_or_create_medical_profiles()
+    authors = [create_user("client") for _ in range(comments)]
+    organization = Organization.objects.create(user=create_user("partner"), org_name=fake.company(),
+                                               is_moderated=True)
+
+    created = []
+    for region in regions:
+        for category in categories:
+            created += [create_tour(organization, region, category, authors) for _ in range(tours)]
+        create_guide(region, guide_category, authors)
+    return created
 
 
 class Command(BaseCommand):
-    help = 'Closes the specified poll for voting'
+    help = 'Создаёт тестовые туры, гиды и связанные с ними данные'
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tours", type=int, default=3, help="Туров на каждый регион и категорию")
+        parser.add_argument("--regions", type=int, default=2, help="Количество регионов")
+        parser.add_argument("--comments", type=int, default=2, help="Отзывов на каждый тур и гида")
+        parser.add_argument("--seed", type=int, default=0, help="Сид Faker для повторяемых данных")
 
     def handle(self, *args, **options):
-        for i in range(300):
-            for country in Country.objects.all():
-                regions = Region.objects.filter(country=country)
-                for region in regions:
-                    categories = OrganizationCategory.objects.all()
-                    for category in categories:
-                        t = Tour.objects.create(
-                            title="Тур: {} |".format(
-                                fake.bs(),
-                            ),
-                            region=region,
-                            country=country,
-                            category=category
-                        )
-                        self.stdout.write(self.style.SUCCESS('Successfully closed poll "%s"' % t))
+        tours = seed_catalogue(tours=options["tours"], regions=options["regions"], comments=options["comments"],
+                               seed=options["seed"])
+        self.stdout.write(self.style.SUCCESS("Создано туров: {}".format(len(tours))))
@@ -0,0 +1,286 @@
+import csv
+import io
+import json
+import random
+import time
+import uuid
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+from psycopg2.extras import DateRange
+
+from medtour.guides.models import Guide, GuideCategory, GuideProgram, GuideReview, GuideShots
+from medtour.main.tasks import refresh_listing
+from medtour.orders.models import Payment, ServiceCart
+from medtour.sanatorium.models import Reservations
+from medtour.tournumbers.models import NumberCabinets, TourNumbers
+from medtour.tourpackages.models import TourPackages
+from medtour.tours.management.commands.create_tours import (
+    get_or_create_categories, get_or_create_geography, get_or_create_medical_profiles, shot_data
+)
+from medtour.tours.models import (
+    Tour, TourShots, CommentTour, TourSummary, TourBookingWeekDays, TourBookingHoliday
+)
+from medtour.users.models import Organization, User
+from medtour.utils.constants import (
+    OrgTypeChoice, PaymentGatewayStatusChoices, PaymentStatusChoices, ReservationApproveStatusChoices
+)
+
+WORDS = ("Алтын", "Бурабай", "Жемчужина", "Иссык", "Каскад", "Көктерек", "Медеу", "Нур", "Самал", "Сарыагаш",
+         "Тау", "Шипажай", "Эдельвейс", "Достык", "Арман")
+TEXT = "Отдыхали всей семьёй, номер чистый, персонал внимательный, процедуры подобраны врачом."
+
+
+def copy_value(value):
+    if value is None:
+        return None
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, DateRange):
+        return "{}{},{}{}".format(value._bounds[0], value.lower, value.upper, value._bounds[1])
+    if isinstance(value, (dict, list)):
+        return json.dumps(value, ensure_ascii=False)
+    return value
+
+
+def copy_rows(model, rows):
+    """
+    Пишет строки (словари attname -> значение) через COPY FROM STDIN. Это в разы быстрее
+    bulk_create на сотнях тысяч строк, потому что Django не собирает INSERT.
+    Первичные ключи заранее берутся из последовательности таблицы и
+    проставляются в row["id"], незаполненные поля получают значения по умолчанию модели.
+    """
+    if not rows:
+        return rows
+    now = timezone.now()
+    fields = [field for field in model._meta.concrete_fields if not field.primary_key]
+    defaults = {
+        field.attname: now if getattr(field, "auto_now", False) or getattr(field, "auto_now_add", False)
+        else field.get_default()
+        for field in fields
+    }
+    table = model._meta.db_table
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+                       [table, len(rows)])
+        for row, (pk,) in zip(rows, cursor.fetchall()):
+            row["id"] = pk
+        columns = ["id"] + [field.attname for field in fields]
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        for row in rows:
+            writer.writerow([copy_value(row.get(column, defaults.get(column))) for column in columns])
+        buffer.seek(0)
+        cursor.copy_expert("COPY {} ({}) FROM STDIN WITH (FORMAT csv)".format(
+            connection.ops.quote_name(table),
+            ", ".join(connection.ops.quote_name(field.column) for field in [model._meta.pk] + fields)
+        ), buffer)
+    return rows
+
+
+class Command(BaseCommand):
+    help = (
+        "Массово заполняет базу связанными данными для нагрузочного тестирования: туры, номера, кабинеты, "
+        "пакеты, фото, отзывы, гиды, программы, пользователи, брони и оплаты. Строки пишутся bulk_create "
+        "пачками, а самые объёмные таблицы через COPY. Сигналы не вызываются, сводки туров считаются сразу"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--tours", type=int, default=1000, help="Количество туров")
+        parser.add_argument("--guides", type=int, default=None, help="Количество гидов, по умолчанию туры / 10")
+        parser.add_argument("--users", type=int, default=None, help="Количество клиентов, по умолчанию туры * 2")
+        parser.add_argument("--regions", type=int, default=10, help="Количество регионов")
+        parser.add_argument("--numbers", type=int, default=3, help="Номеров на тур")
+        parser.add_argument("--cabinets", type=int, default=5, help="Кабинетов на номер")
+        parser.add_argument("--shots", type=int, default=5, help="Фото на тур и гида")
+        parser.add_argument("--comments", type=int, default=10, help="Отзывов на тур и гида")
+        parser.add_argument("--reservations", type=int, default=6, help="Броней на кабинет")
+        parser.add_argument("--paid", type=float, default=0.6, help="Доля оплаченных броней")
+        parser.add_argument("--chunk", type=int, default=500, help="Туров в одной транзакции")
+        parser.add_argument("--batch-size", type=int, default=5000, help="Строк в одном INSERT")
+        parser.add_argument("--seed", type=int, default=0)
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.random = random.Random(options["seed"])
+        self.batch_size = options["batch_size"]
+        self.counts = {}
+        started = time.monotonic()
+
+        self.regions = get_or_create_geography(options["regions"])
+        self.categories = get_or_create_categories()
+        self.medical_profiles = get_or_create_medical_profiles()
+        self.guide_category = GuideCategory.objects.first() or GuideCategory.objects.create(title="Туры",
+                                                                                            slug="tury")
+        self.user_ids = self.create_users(options["users"] or options["tours"] * 2)
+        self.partners = self.create_organizations(max(1, options["tours"] // 20), OrgTypeChoice.SANATORIUM)
+
+        for start in range(0, options["tours"], options["chunk"]):
+            with transaction.atomic():
+                self.create_tours(min(options["chunk"], options["tours"] - start))
+            self.stdout.write("Туров: {} из {}".format(min(start + options["chunk"], options["tours"]),
+                                                       options["tours"]))
+
+        guides = options["guides"] if options["guides"] is not None else options["tours"] // 10
+        for start in range(0, guides, options["chunk"]):
+            with transaction.atomic():
+                self.create_guides(min(options["chunk"], guides - start))
+
+        # bulk_create не шлёт сигналов, витрину главной страницы обновляем сами
+        refresh_listing()
+
+        for model, count in self.counts.items():
+            self.stdout.write("{}: {}".format(model, count))
+        self.stdout.write(self.style.SUCCESS("Готово за {:.1f} с".format(time.monotonic() - started)))
+
+    def bulk_create(self, model, objs):
+        objs = model.objects.bulk_create(objs, batch_size=self.batch_size)
+        self.counts[model.__name__] = self.counts.get(model.__name__, 0) + len(objs)
+        return objs
+
+    def copy(self, model, rows):
+        rows = copy_rows(model, rows)
+        self.counts[model.__name__] = self.counts.get(model.__name__, 0) + len(rows)
+        return rows
+
+    def title(self):
+        return "{} {}".format(self.random.choice(WORDS), self.random.choice(WORDS))
+
+    def slug(self, prefix):
+        return "{}-{}".format(prefix, uuid.uuid4().hex[:12])
+
+    def rating(self):
+        return {name: self.random.randint(2, 5) for name in ("service", "location", "staff", "proportion")}
+
+    def create_users(self, count):
+        ids = []
+        for start in range(0, count, self.batch_size):
+            users = [User(username=self.slug("client"), password="!", first_name=self.random.choice(WORDS))
+                     for _ in range(min(self.batch_size, count - start))]
+            ids += [user.pk for user in self.bulk_create(User, users)]
+        return ids
+
+    def create_organizations(self, count, org_type):
+        users = self.bulk_create(User, [User(username=self.slug(org_type), password="!", is_organization=True)
+                                        for _ in range(count)])
+        return self.bulk_create(Organization, [
+            Organization(user=user, org_name=self.title(), type=org_type, is_moderated=True) for user in users
+        ])
+
+    def place(self):
+        region = self.random.choice(self.regions)
+        return {"region": region, "country_id": region.country_id, "city": next(iter(region.cities.all()), None)}
+
+    def create_tours(self, count):
+        tours = self.bulk_create(Tour, [
+            Tour(title=self.title(), slug=self.slug("tour"), description=TEXT, org=self.random.choice(self.partners),
+                 category=self.random.choice(self.categories), is_moderated=self.random.random() < 0.9,
+                 is_top=self.random.random() < 0.05, **self.place())
+            for _ in range(count)
+        ])
+        self.bulk_create(TourBookingWeekDays, [TourBookingWeekDays(tour=tour) for tour in tours])
+        self.bulk_create(TourBookingHoliday, [TourBookingHoliday(tour=tour) for tour in tours])
+        Tour.medical_profiles.through.objects.bulk_create([
+            Tour.medical_profiles.through(tour_id=tour.pk, tourmedicalprofile_id=profile.pk)
+            for tour in tours for profile in self.random.sample(self.medical_profiles, 1)
+        ], batch_size=self.batch_size)
+        self.bulk_create(TourShots, [
+            TourShots(tour=tour, order=order, **shot_data("tours/seed/{}-{}.jpg".format(tour.pk, order)))
+            for tour in tours for order in range(self.options["shots"])
+        ])
+        numbers = self.bulk_create(TourNumbers, [
+            TourNumbers(tour=tour, order=order, title="{} местн. номер".format(order + 1), place_count=order + 1,
+                        capacity=order + 1, max_capacity=order + 2, price=self.random.randint(10, 60) * 1000)
+            for tour in tours for order in range(self.options["numbers"])
+        ])
+        self.bulk_create(TourPackages, [
+            TourPackages(tour_id=number.tour_id, number=number, order=number.order, title="Стандарт",
+                         price=number.price * 7)
+            for number in numbers
+        ])
+        cabinets = self.copy(NumberCabinets, [
+            {"tour_number_id": number.pk, "number": position + 1,
+             "humanize_name": str(100 * (number.order + 1) + position)}
+            for number in numbers for position in range(self.options["cabinets"])
+        ])
+        comments = self.copy(CommentTour, [
+            dict(tour_id=tour.pk, user_id=self.random.choice(self.user_ids), purity=self.random.randint(2, 5),
+                 text=TEXT, **self.rating())
+            for tour in tours for _ in range(self.options["comments"])
+        ])
+        self.create_summaries(tours, numbers, comments)
+        self.create_reservations({number.pk: number for number in numbers}, cabinets)
+
+    def create_summaries(self, tours, numbers, comments):
+        prices, ratings = {}, {}
+        for number in numbers:
+            prices[number.tour_id] = min(prices.get(number.tour_id, number.price), number.price)
+        for comment in comments:
+            ratings.setdefault(comment["tour_id"], []).append(comment)
+
+        def avg(rows, name):
+            return round(sum(row[name] for row in rows) / len(rows), 2) if rows else None
+
+        self.bulk_create(TourSummary, [
+            TourSummary(tour=tour, minimum_price=prices.get(tour.pk), comments_count=len(ratings.get(tour.pk, [])),
+                        **{"{}_avg".format(name): avg(ratings.get(tour.pk, []), name)
+                           for name in ("service", "location", "purity", "staff", "proportion")})
+            for tour in tours
+        ])
+
+    def create_reservations(self, numbers, cabinets):
+        """Брони каждого кабинета идут подряд без пересечений, от полугода назад до полугода вперёд"""
+        reservations = []
+        for cabinet in cabinets:
+            number = numbers[cabinet["tour_number_id"]]
+            day = date.today() - timedelta(days=180 + self.random.randint(0, 30))
+            for _ in range(self.options["reservations"]):
+                day += timedelta(days=self.random.randint(0, 30))
+                nights = self.random.randint(3, 14)
+                reservations.append({
+                    "number_cabinets_id": cabinet["id"], "number_id": number.pk, "tour_id": number.tour_id,
+                    "reservation_date": DateRange(day, day + timedelta(days=nights), "[)"),
+                    "amount": number.price * nights, "reservator_id": self.random.choice(self.user_ids),
+                    "amountOfAdults": 1,
+                })
+                day += timedelta(days=nights)
+
+        paid = [row for row in reservations if self.random.random() < self.options["paid"]]
+        carts = self.copy(ServiceCart, [
+            {"tour_id": row["tour_id"], "number_id": row["number_id"], "user_id": row["reservator_id"],
+             "start": row["reservation_date"].lower, "end": row["reservation_date"].upper, "price": row["amount"]}
+            for row in paid
+        ])
+        payments = self.copy(Payment, [
+            {"user_id": cart["user_id"], "amount": cart["price"], "cart_id": cart["id"],
+             "status": PaymentStatusChoices.PAID, "gateway_status": PaymentGatewayStatusChoices.CREATED}
+            for cart in carts
+        ])
+        for row, payment in zip(paid, payments):
+            row.update(paid=True, payment_id=payment["id"],
+                       approved_status=ReservationApproveStatusChoices.APPROVED)
+        self.copy(Reservations, reservations)
+
+    def create_guides(self, count):
+        organizations = self.create_organizations(count, OrgTypeChoice.GUIDE)
+        guides = self.bulk_create(Guide, [
+            Guide(title=self.title(), slug=self.slug("guide"), description=TEXT, org=organization,
+                  category=self.guide_category, is_moderated=True, **self.place())
+            for organization in organizations
+        ])
+        self.bulk_create(GuideShots, [
+            GuideShots(guide=guide, order=order, **shot_data("guides/seed/{}-{}.jpg".format(guide.pk, order)))
+            for guide in guides for order in range(self.options["shots"])
+        ])
+        self.bulk_create(GuideProgram, [
+            GuideProgram(guide=guide, order=order, name=self.title(), description=TEXT, program=TEXT,
+                         price=self.random.randint(5, 40) * 1000, venue_lon=76.9, venue_lat=43.2,
+                         venue_address="Алматы")
+            for guide in guides for order in range(3)
+        ])
+        self.copy(GuideReview, [
+            dict(guide_id=guide.pk, user_id=self.random.choice(self.user_ids), text=TEXT, **self.rating())
+            for guide in guides for _ in range(self.options["comments"])
+        ])
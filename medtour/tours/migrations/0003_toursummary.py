@@ -0,0 +1,71 @@
+# Generated by Django 3.2.15 on 2026-10-18 11:58
+
+from django.db import migrations, models
+import django.db.models.deletion
+from django.db.models import Avg, Count, Func, Min, Q
+
+
+class Round(Func):
+    function = 'ROUND'
+    arity = 2
+
+
+def fill_tour_summaries(apps, schema_editor):
+    Tour = apps.get_model('tours', 'Tour')
+    CommentTour = apps.get_model('tours', 'CommentTour')
+    TourNumbers = apps.get_model('tournumbers', 'TourNumbers')
+    TourSummary = apps.get_model('tours', 'TourSummary')
+
+    prices = dict(
+        TourNumbers.objects.filter(is_deleted=False).values('tour_id').annotate(
+            minimum_price=Min('price')
+        ).values_list('tour_id', 'minimum_price')
+    )
+    ratings = {
+        row.pop('tour_id'): row for row in CommentTour.objects.values('tour_id').annotate(
+            service_avg=Round(Avg('service'), 2, output_field=models.FloatField()),
+            location_avg=Round(Avg('location'), 2, output_field=models.FloatField()),
+            purity_avg=Round(Avg('purity'), 2, output_field=models.FloatField()),
+            staff_avg=Round(Avg('staff'), 2, output_field=models.FloatField()),
+            proportion_avg=Round(Avg('proportion'), 2, output_field=models.FloatField()),
+            comments_count=Count('id'),
+        ).values('tour_id', 'service_avg', 'location_avg', 'purity_avg', 'staff_avg', 'proportion_avg',
+                 'comments_count')
+    }
+    TourSummary.objects.bulk_create(
+        [
+            TourSummary(tour_id=tour_id, minimum_price=prices.get(tour_id), **ratings.get(tour_id, {}))
+            for tour_id in Tour.objects.values_list('id', flat=True).iterator()
+        ],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0002_initial'),
+        ('tournumbers', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TourSummary',
+            fields=[
+                ('tour', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='summary', serialize=False, to='tours.tour')),
+                ('minimum_price', models.IntegerField(blank=True, null=True, verbose_name='Минимальная цена')),
+                ('service_avg', models.FloatField(blank=True, null=True, verbose_name='Сервис')),
+                ('location_avg', models.FloatField(blank=True, null=True, verbose_name='Местоположение')),
+                ('purity_avg', models.FloatField(blank=True, null=True, verbose_name='Чистота')),
+                ('staff_avg', models.FloatField(blank=True, null=True, verbose_name='Персонал')),
+                ('proportion_avg', models.FloatField(blank=True, null=True, verbose_name='Соотношение цена/качество')),
+                ('comments_count', models.IntegerField(default=0, verbose_name='Количество отзывов')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Сводка тура',
+                'verbose_name_plural': 'Сводки туров',
+            },
+        ),
+        migrations.RunPython(fill_tour_summaries, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 3.2.15 on 2026-10-18 12:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0004_thumbnails_manifest'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tour',
+            name='revision',
+            field=models.PositiveIntegerField(default=0, editable=False, help_text='Растёт при изменении фото, отзывов и доп. информации тура', verbose_name='Ревизия'),
+        ),
+        migrations.AddField(
+            model_name='tour',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, verbose_name='Изменён'),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 3.2.15 on 2026-10-18 12:52
+
+import logging
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import DatabaseError, migrations, transaction
+
+logger = logging.getLogger(__name__)
+
+
+# search_vector заполняет триггер: название с весом A, описание B, адрес C, каждое в
+# конфигурациях russian (стемминг) и simple (без стемминга, для казахских слов и имён).
+TOUR_SEARCH_VECTOR = """
+    CREATE FUNCTION tours_tour_search_vector() RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(to_tsvector('russian', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('simple', coalesce(NEW.title, '')), 'A') ||
+            setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'B') ||
+            setweight(to_tsvector('simple', coalesce(NEW.description, '')), 'B') ||
+            setweight(to_tsvector('russian', coalesce(NEW.address, '')), 'C') ||
+            setweight(to_tsvector('simple', coalesce(NEW.address, '')), 'C');
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql;
+
+    CREATE TRIGGER tours_tour_search_vector BEFORE INSERT OR UPDATE OF title, description, address
+        ON tours_tour FOR EACH ROW EXECUTE PROCEDURE tours_tour_search_vector();
+
+    UPDATE tours_tour SET title = title;
+"""
+
+DROP_TOUR_SEARCH_VECTOR = """
+    DROP TRIGGER tours_tour_search_vector ON tours_tour;
+    DROP FUNCTION tours_tour_search_vector();
+"""
+
+TRIGRAM_INDEXES = [
+    ('tour_title_trgm', 'tours_tour', 'title'),
+    ('tour_address_trgm', 'tours_tour', 'address'),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    # pg_trgm есть не на каждом сервере, без него поиск остаётся только полнотекстовым
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT installed_version FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        row = cursor.fetchone()
+        if row is None:
+            logger.warning("pg_trgm is not available on the server, trigram indexes %s are skipped",
+                           ", ".join(name for name, _, _ in TRIGRAM_INDEXES))
+            return
+        if row[0] is None:
+            try:
+                with transaction.atomic(using=schema_editor.connection.alias):
+                    cursor.execute("CREATE EXTENSION pg_trgm")
+            except DatabaseError as e:  # нет прав на создание расширения
+                logger.warning("pg_trgm could not be installed (%s), trigram indexes %s are skipped",
+                               e, ", ".join(name for name, _, _ in TRIGRAM_INDEXES))
+                return
+        for name, table, expression in TRIGRAM_INDEXES:
+            cursor.execute("CREATE INDEX IF NOT EXISTS {} ON {} USING gin ({} gin_trgm_ops)".format(
+                name, table, expression))
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        for name, table, expression in TRIGRAM_INDEXES:
+            cursor.execute("DROP INDEX IF EXISTS {}".format(name))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0005_tour_revision'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tour',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='tour_search_vector_gin'),
+        ),
+        migrations.RunSQL(TOUR_SEARCH_VECTOR, DROP_TOUR_SEARCH_VECTOR),
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 3.2.15 on 2026-10-18 14:06
+
+import django.contrib.postgres.fields
+import django.contrib.postgres.fields.array
+from django.db import migrations, models
+import django.db.models.expressions
+import medtour.contrib.ordering
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tours', '0006_search_vector'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tour',
+            name='shuffle_keys',
+            field=django.contrib.postgres.fields.ArrayField(base_field=models.IntegerField(), default=medtour.contrib.ordering.new_shuffle_keys, editable=False, size=8),
+        ),
+        # AddField проставил всем строкам одно значение default, раздаём каждой свои ключи
+        migrations.RunSQL(
+            sql="""
+                UPDATE tours_tour SET shuffle_keys = ARRAY(
+                    SELECT floor(random() * 2147483647)::int
+                    FROM generate_series(1, 8)
+                    WHERE tours_tour.id IS NOT NULL
+                )
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(django.contrib.postgres.fields.array.IndexTransform(1, models.IntegerField(), django.db.models.expressions.F('shuffle_keys')), django.db.models.expressions.F('id'), condition=models.Q(('is_deleted', False), ('is_moderated', True)), name='tour_shuffle_0'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(django.contrib.postgres.fields.array.IndexTransform(2, models.IntegerField(), django.db.models.expressions.F('shuffle_keys')), django.db.models.expressions.F('id'), condition=models.Q(('is_deleted', False), ('is_moderated', True)), name='tour_shuffle_1'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(django.contrib.postgres.fields.array.IndexTransform(3, models.IntegerField(), django.db.models.expressions.F('shuffle_keys')), django.db.models.expressions.F('id'), condition=models.Q(('is_deleted', False), ('is_moderated', True)), name='tour_shuffle_2'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(django.contrib.postgres.fields.array.IndexTransform(4, models.IntegerField(), django.db.models.expressions.F('shuffle_keys')), django.db.models.expressions.F('id'), condition=models.Q(('is_deleted', False), ('is_moderated', True)), name='tour_shuffle_3'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(django.contrib.postgres.fields.array.IndexTransform(5, models.IntegerField(), django.db.models.expressions.F('shuffle_keys')), django.db.models.expressions.F('id'), condition=models.Q(('is_deleted', False), ('is_moderated', True)), name='tour_shuffle_4'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(django.contrib.postgres.fields.array.IndexTransform(6, models.IntegerField(), django.db.models.expressions.F('shuffle_keys')), django.db.models.expressions.F('id'), condition=models.Q(('is_deleted', False), ('is_moderated', True)), name='tour_shuffle_5'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(django.contrib.postgres.fields.array.IndexTransform(7, models.IntegerField(), django.db.models.expressions.F('shuffle_keys')), django.db.models.expressions.F('id'), condition=models.Q(('is_deleted', False), ('is_moderated', True)), name='tour_shuffle_6'),
+        ),
+        migrations.AddIndex(
+            model_name='tour',
+            index=models.Index(django.contrib.postgres.fields.array.IndexTransform(8, models.IntegerField(), django.db.models.expressions.F('shuffle_keys')), django.db.models.expressions.F('id'), condition=models.Q(('is_deleted', False), ('is_moderated', True)), name='tour_shuffle_7'),
+        ),
+    ]
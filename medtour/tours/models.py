@@ -1,7 +1,11 @@
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.validators import MinValueValidator, MaxValueValidator, MinLengthValidator
 from django.db import models
-from django.db.models import Avg, Count, Func
+from django.db.models import Avg, Count, Exists, Func, Min, OuterRef, Q, F, Subquery
+from django.db.models.functions import Coalesce
 from django.utils.functional import cached_property
 from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
@@ -9,7 +13,10 @@ from multiselectfield import MultiSelectField
 from ordered_model.models import OrderedModel
 from sorl.thumbnail import get_thumbnail, ImageField
 
+from medtour.contrib.ordering import SHUFFLE_BUCKETS, new_shuffle_keys, shuffle_indexes
+from medtour.contrib.search_vector import SearchVectorManager
 from medtour.contrib.soft_delete_model import SoftDeleteModel
+from medtour.contrib.sorl_thumbnail_serializer.thumbnails import ThumbnailManifestModel
 from medtour.tours.instances import get_price_path, get_shots_path
 from medtour.users.models import Organization
 from medtour.utils import unique_slug_generator
@@ -63,12 +70,24 @@ class Tour(SoftDeleteModel):
     is_subscribed = models.BooleanField(_("Подписан?"), default=False, db_index=True,
                                         help_text=_("Отметьте, если он подписан"))
     created_at = models.DateTimeField(auto_now_add=True, editable=False)
+    updated_at = models.DateTimeField(_("Изменён"), auto_now=True)
+    revision = models.PositiveIntegerField(_("Ревизия"), default=0, editable=False,
+                                           help_text=_("Растёт при изменении фото, отзывов и доп. информации тура"))
+    search_vector = SearchVectorField(null=True, editable=False)  # заполняет триггер, см. medtour.main.search
+    shuffle_keys = ArrayField(models.IntegerField(), size=SHUFFLE_BUCKETS, default=new_shuffle_keys,
+                              editable=False)  # см. medtour.contrib.ordering.seeded_shuffle
+
+    objects = SearchVectorManager()
     __original_title = None
 
     class Meta:
         verbose_name = _("* Тур")
         verbose_name_plural = _("* Туры")
         ordering = ['-created_at']
+        indexes = [
+            GinIndex(fields=["search_vector"], name="tour_search_vector_gin"),
+            *shuffle_indexes("tour_shuffle", condition=Q(is_deleted=False, is_moderated=True)),
+        ]
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -96,6 +115,106 @@ class Tour(SoftDeleteModel):
             comments__count=Count('purity', output_field=models.FloatField())
         )
 
+    @classmethod
+    def bump_revision(cls, **filters):
+        """Сбрасывает закэшированную карточку туров, см. TourReadSerializer"""
+        cls.objects.filter(**filters).update(revision=F("revision") + 1)
+
+    @staticmethod
+    def detail_annotations():
+        """Флаги наличия номеров, гидов, пакетов и услуг для TourReadSerializer одним запросом"""
+        from medtour.guides.models import Guide
+        from medtour.tournumbers.models import TourNumbers
+        from medtour.tourpackages.models import TourPackages
+
+        return {
+            "numbers__exists": Exists(TourNumbers.objects.filter(tour=OuterRef("pk"))),
+            "guides__exists": Exists(Guide.objects.filter(region_id=OuterRef("region_id"))),
+            "packages__exists": Exists(TourPackages.objects.filter(tour=OuterRef("pk"))),
+            "services__exists": Exists(TourPaidServices.objects.filter(tour=OuterRef("pk"))),
+        }
+
+    @staticmethod
+    def dashboard_annotations():
+        """Количество номеров и пакетов для кабинета владельца, подзапросами без размножения строк"""
+        from medtour.tournumbers.models import TourNumbers
+        from medtour.tourpackages.models import TourPackages
+
+        def count(queryset):
+            return Coalesce(Subquery(
+                queryset.filter(tour=OuterRef("pk"), is_deleted=False).order_by().values("tour")
+                .annotate(count=Count("pk")).values("count")
+            ), 0)
+
+        return {
+            "numbers_count": count(TourNumbers.objects.all()),
+            "packages_count": count(TourPackages.objects.all()),
+        }
+
+    @property
+    def cover(self):
+        """Первое фото тура, берётся из prefetch tour_shots"""
+        return next(iter(self.tour_shots.all()), None)
+
+
+class TourSummary(models.Model):
+    """
+    Денормализованная сводка тура: минимальная цена номеров и средние оценки отзывов.
+    Обновляется сигналами CommentTour и TourNumbers, списки туров читают её
+    вместо агрегации по numbers и comments на каждый запрос.
+    """
+    tour = models.OneToOneField(Tour, primary_key=True, related_name="summary", on_delete=models.CASCADE)
+    minimum_price = models.IntegerField(_("Минимальная цена"), null=True, blank=True)
+    service_avg = models.FloatField(_("Сервис"), null=True, blank=True)
+    location_avg = models.FloatField(_("Местоположение"), null=True, blank=True)
+    purity_avg = models.FloatField(_("Чистота"), null=True, blank=True)
+    staff_avg = models.FloatField(_("Персонал"), null=True, blank=True)
+    proportion_avg = models.FloatField(_("Соотношение цена/качество"), null=True, blank=True)
+    comments_count = models.IntegerField(_("Количество отзывов"), default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        verbose_name = _("Сводка тура")
+        verbose_name_plural = _("Сводки туров")
+
+    def __str__(self):
+        return str(self.tour_id)
+
+    @classmethod
+    def refresh(cls, tour_id):
+        """Пересчитывает сводку одного тура, агрегируя только его строки"""
+        price = Tour.objects.filter(pk=tour_id).aggregate(
+            minimum_price=Min("numbers__price", filter=Q(numbers__is_deleted=False)),
+            tours__count=Count("id", distinct=True),
+        )
+        if not price["tours__count"]:
+            return None
+        rating = CommentTour.objects.filter(tour_id=tour_id).aggregate(
+            service_avg=Round(Avg('service'), 2, output_field=models.FloatField()),
+            location_avg=Round(Avg('location'), 2, output_field=models.FloatField()),
+            purity_avg=Round(Avg('purity'), 2, output_field=models.FloatField()),
+            staff_avg=Round(Avg('staff'), 2, output_field=models.FloatField()),
+            proportion_avg=Round(Avg('proportion'), 2, output_field=models.FloatField()),
+            comments_count=Count('id'),
+        )
+        summary, _created = cls.objects.update_or_create(
+            tour_id=tour_id, defaults=dict(minimum_price=price["minimum_price"], **rating)
+        )
+        return summary
+
+    @staticmethod
+    def annotations():
+        """Аннотации со старыми именами агрегатов для TourListSerializer"""
+        return {
+            "minimum_price": F("summary__minimum_price"),
+            "service__avg": F("summary__service_avg"),
+            "location__avg": F("summary__location_avg"),
+            "purity__avg": F("summary__purity_avg"),
+            "staff__avg": F("summary__staff_avg"),
+            "proportion__avg": F("summary__proportion_avg"),
+            "comments__count": Coalesce(F("summary__comments_count"), 0),
+        }
+
 
 class TourPhones(models.Model):
     tour = models.ForeignKey(Tour, related_name="tour_phones", on_delete=models.CASCADE,
@@ -107,7 +226,7 @@ class TourPhones(models.Model):
         verbose_name_plural = _("Телефонные номера тура")
 
 
-class TourShots(OrderedModel):
+class TourShots(OrderedModel, ThumbnailManifestModel):
     name = models.CharField(_("Имя изображения"), null=True, max_length=1000, blank=True)
     tour = models.ForeignKey(Tour, related_name="tour_shots", on_delete=models.CASCADE,
                              verbose_name=_("Изображения тура"),
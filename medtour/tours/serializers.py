@@ -1,14 +1,18 @@
 import uuid
 from datetime import datetime
 
-from django.utils.translation import gettext_lazy as _
+from django.core.cache import cache
+from django.db.models import prefetch_related_objects
+from django.utils.translation import get_language, gettext_lazy as _
 from drf_spectacular import types
 from drf_spectacular.types import OpenApiTypes
 from drf_spectacular.utils import extend_schema_field
 from ordered_model.serializers import OrderedModelSerializer
 from rest_framework import serializers
 
-from medtour.contrib.sorl_thumbnail_serializer.fields import HyperlinkedSorlImageField
+from medtour.contrib.profiling import record_cache
+from medtour.contrib.response_cache import get_tag_versions
+from medtour.contrib.sorl_thumbnail_serializer.fields import HyperlinkedSorlImageField, ThumbnailListSerializer
 from medtour.guides.models import Guide
 from medtour.orders.models import Payment
 from medtour.tours.models import (
@@ -26,7 +30,7 @@ class TourShotsSerializer(OrderedModelSerializer):
 
     class Meta:
         model = TourShots
-        fields = "__all__"
+        exclude = ("thumbnails", "thumbnails_source")
 
 
 class CreateTourShotsSerializer(OrderedModelSerializer):
@@ -34,7 +38,7 @@ class CreateTourShotsSerializer(OrderedModelSerializer):
 
     class Meta:
         model = TourShots
-        exclude = ("order",)
+        exclude = ("order", "thumbnails", "thumbnails_source")
 
 
 class DetailViewTourShotsSerializer(serializers.ModelSerializer):
@@ -47,7 +51,7 @@ class DetailViewTourShotsSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = TourShots
-        fields = "__all__"
+        exclude = ("thumbnails", "thumbnails_source")
 
 
 class MainPageTourShotsSerializer(serializers.ModelSerializer):
@@ -60,7 +64,7 @@ class MainPageTourShotsSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = TourShots
-        fields = "__all__"
+        exclude = ("thumbnails", "thumbnails_source")
 
 
 class TourMedicalProfileSerializer(serializers.Serializer):
@@ -112,7 +116,8 @@ class TourSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Tour
-        exclude = ("created_at", "is_deleted", "is_subscribed", "is_top")
+        exclude = ("created_at", "is_deleted", "is_subscribed", "is_top", "search_vector", "updated_at", "revision",
+                   "shuffle_keys")
 
 
 class CommentTourSerializer(serializers.ModelSerializer):
@@ -206,6 +211,7 @@ class TourListSerializer(serializers.ModelSerializer):
         fields = ("id", "title", "description", "region_name",
                   "category_name", "category", "minimum_price", "tour_shots",
                   "category_slug", "slug", "averageRating")
+        list_serializer_class = ThumbnailListSerializer
 
     @extend_schema_field(AverageRating)
     def get_averageRating(self, instance):
@@ -220,7 +226,57 @@ class TourListSerializer(serializers.ModelSerializer):
         }
 
 
+class TourDashboardSerializer(serializers.ModelSerializer):
+    """Тур в кабинете владельца: статус модерации, обложка, цена, рейтинг и счётчики"""
+    category_name = serializers.CharField(source="category.title", read_only=True)
+    region_name = serializers.CharField(source="region.name", read_only=True, default=None)
+    city_name = serializers.CharField(source="city.name", read_only=True, default=None)
+    cover = HyperlinkedSorlImageField(
+        '570x360',
+        options={"crop": "center"},
+        source='cover.photo',
+        read_only=True,
+        default=None
+    )
+    minimum_price = serializers.IntegerField(read_only=True, allow_null=True)
+    numbers_count = serializers.IntegerField(read_only=True)
+    packages_count = serializers.IntegerField(read_only=True)
+    averageRating = serializers.SerializerMethodField()
+
+    class Meta:
+        model = Tour
+        fields = ("id", "title", "slug", "is_moderated", "is_top", "is_deleted", "category", "category_name",
+                  "region_name", "city_name", "cover", "minimum_price", "numbers_count", "packages_count",
+                  "averageRating", "updated_at")
+        list_serializer_class = ThumbnailListSerializer
+
+    @extend_schema_field(AverageRating)
+    def get_averageRating(self, instance):
+        return {
+            "service__avg": instance.service__avg,
+            "location__avg": instance.location__avg,
+            "purity__avg": instance.purity__avg,
+            "staff__avg": instance.staff__avg,
+            "proportion__avg": instance.proportion__avg,
+            "comments__count": instance.comments__count,
+        }
+
+
 class TourReadSerializer(serializers.ModelSerializer):
+    """
+    Карточка тура.
+
+    Связанные данные (фото, отзывы, доп. информация) кэшируются фрагментом по
+    ревизии тура, см. Tour.bump_revision. Рейтинг и флаги наличия берутся из
+    аннотаций TourSummary.annotations() и Tour.detail_annotations() и в кэш не попадают.
+    При попадании в кэш карточка собирается без запросов сверх выборки самого тура.
+    """
+    detail_prefetch = ("tour_shots", "additional_titles__title", "additional_titles__additional_services",
+                       "comments__user__people", "comments__user__organization", "medical_profiles")
+    uncached_fields = ("averageRating", "numbers_exists", "guides_exists", "paid_services_exists",
+                       "packages_exists")
+    fragment_timeout = 60 * 60 * 24
+
     category_slug = serializers.StringRelatedField(source="category.slug")
     tour_shots = DetailViewTourShotsSerializer(read_only=True, many=True, required=False, allow_null=True)
     comments = CommentTourSerializer(read_only=True, many=True, required=False, allow_null=True)
@@ -236,26 +292,69 @@ class TourReadSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = Tour
-        exclude = ('created_at', "is_subscribed")
+        exclude = ('created_at', "is_subscribed", "search_vector", "updated_at", "revision", "shuffle_keys")
+
+    def fragment_key(self, instance):
+        request = self.context.get("request")
+        return "tour-detail:{}:{}:{}:{}:{}:{}".format(
+            instance.pk, instance.revision, instance.updated_at.timestamp() if instance.updated_at else "",
+            get_language() or "", request.get_host() if request else "",
+            ".".join(map(str, get_tag_versions(("cities", "categories"))))
+        )
+
+    def to_representation(self, instance):
+        key = self.fragment_key(instance)
+        fragment = cache.get(key)
+        record_cache("tour_fragment", fragment is not None)
+        if fragment is None:
+            prefetch_related_objects([instance], *self.detail_prefetch)
+            data = super().to_representation(instance)
+            cache.set(key, {name: value for name, value in data.items() if name not in self.uncached_fields},
+                      timeout=self.fragment_timeout)
+            return data
+        data = {}
+        for field in self._readable_fields:
+            if field.field_name in fragment:
+                data[field.field_name] = fragment[field.field_name]
+            else:
+                data[field.field_name] = field.to_representation(field.get_attribute(instance))
+        return data
 
     @extend_schema_field(AverageRating)
     def get_averageRating(self, instance):
-        return instance.average_rating
+        if not hasattr(instance, "service__avg"):
+            return instance.average_rating
+        return {
+            "service__avg": instance.service__avg,
+            "location__avg": instance.location__avg,
+            "purity__avg": instance.purity__avg,
+            "staff__avg": instance.staff__avg,
+            "proportion__avg": instance.proportion__avg,
+            "comments__count": instance.comments__count,
+        }
 
     @extend_schema_field(serializers.BooleanField)
     def get_numbers_exists(self, instance):
+        if hasattr(instance, "numbers__exists"):
+            return instance.numbers__exists
         return instance.numbers.exists()
 
     @extend_schema_field(serializers.BooleanField)
     def get_guides_exists(self, instance):
+        if hasattr(instance, "guides__exists"):
+            return instance.guides__exists
         return Guide.objects.filter(region_id=instance.region_id).exists()
 
     @extend_schema_field(serializers.BooleanField)
     def get_packages_exists(self, instance):
+        if hasattr(instance, "packages__exists"):
+            return instance.packages__exists
         return instance.packages.exists()
 
     @extend_schema_field(serializers.BooleanField)
     def get_paid_services_exists(self, instance):
+        if hasattr(instance, "services__exists"):
+            return instance.services__exists
         return instance.services.exists()
 
 
@@ -1,10 +1,68 @@
-from django.db.models.signals import post_save
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_save, post_delete
 from django.dispatch import receiver
 
-from medtour.tours.models import Tour, TourBookingWeekDays
-from medtour.tours.tasks import create_days
+from medtour.contrib.sorl_thumbnail_serializer.thumbnails import schedule_thumbnails
+from medtour.tours.models import (
+    Tour, CommentTour, TourShots, TourAdditionalTitle, AdditionalInfoServices, AdditionalTitles, TourMedicalProfile
+)
+from medtour.tours.tasks import create_days, refresh_tour_summary
+
+
+def schedule_tour_summary_refresh(tour_id):
+    """Пересчёт сводки тура после коммита, чтобы воркер увидел новые строки"""
+    transaction.on_commit(lambda: refresh_tour_summary.delay(tour_id))
+
 
 @receiver(post_save, sender=Tour)
 def create_weekday(sender, instance, created, **kwargs):
     if created:
         create_days.delay(instance.id)
+        schedule_tour_summary_refresh(instance.id)
+
+
+@receiver(post_save, sender=CommentTour)
+@receiver(post_delete, sender=CommentTour)
+def refresh_summary_on_comment(sender, instance, **kwargs):
+    schedule_tour_summary_refresh(instance.tour_id)
+
+
+@receiver(post_save, sender=TourShots)
+@receiver(post_delete, sender=TourShots)
+@receiver(post_save, sender=CommentTour)
+@receiver(post_delete, sender=CommentTour)
+@receiver(post_save, sender=TourAdditionalTitle)
+@receiver(post_delete, sender=TourAdditionalTitle)
+def bump_revision(sender, instance, **kwargs):
+    Tour.bump_revision(pk=instance.tour_id)
+
+
+@receiver(post_save, sender=AdditionalInfoServices)
+@receiver(post_delete, sender=AdditionalInfoServices)
+def bump_revision_on_service(sender, instance, **kwargs):
+    Tour.bump_revision(additional_titles__pk=instance.title_id)
+
+
+@receiver(post_save, sender=AdditionalTitles)
+def bump_revision_on_title(sender, instance, **kwargs):
+    Tour.bump_revision(additional_titles__title=instance)
+
+
+@receiver(post_save, sender=TourMedicalProfile)
+def bump_revision_on_profile(sender, instance, **kwargs):
+    Tour.bump_revision(medical_profiles=instance)
+
+
+@receiver(m2m_changed, sender=Tour.medical_profiles.through)
+def bump_revision_on_profiles(sender, instance, action, **kwargs):
+    if not action.startswith("post_"):
+        return
+    if isinstance(instance, Tour):
+        Tour.bump_revision(pk=instance.pk)
+    else:
+        Tour.bump_revision(medical_profiles=instance)
+
+
+@receiver(post_save, sender=TourShots)
+def schedule_shot_thumbnails(sender, instance, **kwargs):
+    schedule_thumbnails(instance)
@@ -1,7 +1,7 @@
 from celery import shared_task
 from django.db import IntegrityError
 
-from medtour.tours.models import TourBookingHoliday, TourBookingWeekDays
+from medtour.tours.models import TourBookingHoliday, TourBookingWeekDays, TourSummary
 
 
 @shared_task
@@ -11,3 +11,8 @@ def create_days(tour_id):
         TourBookingHoliday.objects.create(tour_id=tour_id)
     except IntegrityError:
         pass
+
+
+@shared_task
+def refresh_tour_summary(tour_id):
+    TourSummary.refresh(tour_id)
@@ -1,3 +1,280 @@
-# from django.test import TestCase
+from io import BytesIO, StringIO
 
-# Create your tests here.
+import pytest
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from PIL import Image
+from rest_framework.test import APIClient
+
+from medtour.contrib.ordering import seeded_shuffle, shuffle_bucket
+from medtour.contrib.sorl_thumbnail_serializer import thumbnails
+from medtour.contrib.sorl_thumbnail_serializer import tasks as thumbnail_tasks
+from medtour.contrib.sorl_thumbnail_serializer.thumbnails import THUMBNAIL_GEOMETRIES
+from medtour.main import signals as listing_signals
+from medtour.orders.models import Payment
+from medtour.sanatorium.models import Reservations
+from medtour.tournumbers.models import TourNumbers
+from medtour.tours.models import Tour, CommentTour, TourSummary, TourShots
+from medtour.tours.serializers import MainPageTourShotsSerializer, TourListSerializer
+from medtour.users.models import Organization, OrganizationCategory, User
+
+pytestmark = pytest.mark.django_db
+
+
+@pytest.fixture
+def tour():
+    category = OrganizationCategory.objects.create(title="Санатории")
+    return Tour.objects.create(title="Тур", category=category, is_moderated=True)
+
+
+@pytest.fixture
+def client_user():
+    return User.objects.create(username="client")
+
+
+def test_tour_summary_refresh(tour, client_user):
+    TourNumbers.objects.create(tour=tour, place_count=1, price=15000)
+    TourNumbers.objects.create(tour=tour, place_count=1, price=9000, is_deleted=True)
+    CommentTour.objects.create(tour=tour, user=client_user, service=4, location=5, purity=3, staff=5,
+                               proportion=4, text="Отличный санаторий, всем рекомендую")
+
+    summary = TourSummary.refresh(tour.id)
+
+    assert summary.minimum_price == 15000
+    assert summary.service_avg == 4
+    assert summary.comments_count == 1
+
+
+def test_tour_summary_updated_by_signals(tour, client_user, django_capture_on_commit_callbacks):
+    with django_capture_on_commit_callbacks(execute=True):
+        TourNumbers.objects.create(tour=tour, place_count=1, price=20000)
+        CommentTour.objects.create(tour=tour, user=client_user, service=2, location=2, purity=2, staff=2,
+                                   proportion=2, text="Неплохо, но можно было и лучше")
+
+    row = Tour.objects.annotate(**TourSummary.annotations()).get(pk=tour.pk)
+    assert row.minimum_price == 20000
+    assert row.purity__avg == 2
+    assert row.comments__count == 1
+
+
+def test_tour_summary_refresh_missing_tour():
+    assert TourSummary.refresh(0) is None
+
+
+def test_seeded_shuffle_is_stable_per_seed(tour, client):
+    # 30 строк: вероятность совпадения порядка для разных сидов пренебрежимо мала
+    for i in range(29):
+        Tour.objects.create(title="Тур {}".format(i), category=tour.category, is_moderated=True)
+
+    def shuffled(seed):
+        return list(seeded_shuffle(Tour.objects.all(), seed).values_list("id", flat=True))
+
+    first = shuffled("2024-01-01")
+    other = shuffled("another-seed")
+
+    assert first == shuffled("2024-01-01")
+    assert sorted(first) == sorted(other)
+    assert first != other
+    assert first != sorted(first)
+
+    def listed(seed):
+        return [row["id"] for row in client.get("/v1/tours/", {"seed": seed, "page_size": 30}).json()["results"]]
+
+    assert listed("2024-01-01") == first
+    assert listed("another-seed") == other
+    assert "seed=another-seed" in client.get("/v1/tours/", {"seed": "another-seed", "page_size": 2}).json()["next"]
+
+
+def test_seeded_shuffle_reads_bucket_index(tour):
+    queryset = seeded_shuffle(Tour.objects.filter(is_deleted=False, is_moderated=True), "2024-01-01")
+    with connection.cursor() as cursor:
+        # на паре строк планировщику дешевле прочитать таблицу целиком и отсортировать
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        cursor.execute("SET LOCAL enable_bitmapscan = off")
+        plan = queryset[:20].explain()
+
+    assert "tour_shuffle_{}".format(shuffle_bucket("2024-01-01")) in plan
+    assert "Sort" not in plan
+
+
+def test_tour_list_keyset_pages_do_not_overlap(tour, client):
+    for i in range(4):
+        Tour.objects.create(title="Тур {}".format(i), category=tour.category, is_moderated=True)
+
+    first = client.get("/v1/tours/", {"page_size": 3}).json()
+    assert len(first["results"]) == 3
+    assert "seed=" in first["next"]
+
+    second = client.get(first["next"]).json()
+    ids = [row["id"] for row in first["results"] + second["results"]]
+    assert sorted(ids) == sorted(Tour.objects.values_list("id", flat=True))
+
+
+def test_many_tours_returns_a_plain_list(tour, client):
+    other = Tour.objects.create(title="Тур 2", category=tour.category, is_moderated=True)
+
+    response = client.get("/v1/manyTours/", {"id__in": "{},{}".format(tour.pk, other.pk)})
+
+    assert response.status_code == 200
+    assert sorted(row["id"] for row in response.data) == [tour.pk, other.pk]
+
+
+def test_tour_shot_thumbnails_are_precomputed(tour, settings, tmp_path, monkeypatch,
+                                              django_capture_on_commit_callbacks):
+    settings.MEDIA_ROOT = str(tmp_path)
+    buffer = BytesIO()
+    Image.new("RGB", (800, 600), "white").save(buffer, format="JPEG")
+
+    with django_capture_on_commit_callbacks(execute=True):
+        shot = TourShots.objects.create(tour=tour, photo=SimpleUploadedFile("shot.jpg", buffer.getvalue()))
+
+    shot.refresh_from_db()
+    assert set(shot.thumbnails) == set(THUMBNAIL_GEOMETRIES)
+    assert shot.thumbnails_source == shot.photo.name
+
+    def fail(*args, **kwargs):
+        raise AssertionError("thumbnail rendered during serialization")
+
+    monkeypatch.setattr(thumbnails, "get_thumbnail", fail)
+    assert MainPageTourShotsSerializer(shot).data["thumbnail"] == shot.thumbnails["570x360"]
+
+
+def test_rendered_thumbnails_request_listing_refresh(tour, settings, tmp_path, monkeypatch,
+                                                     django_capture_on_commit_callbacks):
+    settings.MEDIA_ROOT = str(tmp_path)
+    buffer = BytesIO()
+    Image.new("RGB", (800, 600), "white").save(buffer, format="JPEG")
+    shot = TourShots.objects.create(tour=tour, photo=SimpleUploadedFile("shot.jpg", buffer.getvalue()))
+    requested = []
+    monkeypatch.setattr(listing_signals, "request_listing_refresh", lambda: requested.append(True))
+
+    with django_capture_on_commit_callbacks(execute=True):
+        shot.render_thumbnails()
+
+    assert requested == [True]
+
+
+@pytest.mark.parametrize("preserve_format", [False, True])
+@pytest.mark.parametrize("geometry", THUMBNAIL_GEOMETRIES)
+def test_thumbnail_filename_matches_sorl(settings, tmp_path, geometry, preserve_format):
+    # thumbnail_filename повторяет приватные _get_format и _get_thumbnail_filename бэкенда
+    # sorl, тест ловит их изменение при обновлении sorl-thumbnail
+    settings.MEDIA_ROOT = str(tmp_path)
+    settings.THUMBNAIL_PRESERVE_FORMAT = preserve_format
+    buffer = BytesIO()
+    Image.new("RGB", (800, 600), "white").save(buffer, format="PNG")
+    name = default_storage.save("tours/shot.png", ContentFile(buffer.getvalue()))
+    options = THUMBNAIL_GEOMETRIES[geometry]
+
+    assert thumbnails.thumbnail_filename(name, geometry, options) == \
+        thumbnails.get_thumbnail(name, geometry, **options).name
+
+
+def test_tour_list_resolves_thumbnails_with_one_mget(tour, monkeypatch, django_capture_on_commit_callbacks):
+    for i in range(3):
+        TourShots.objects.create(tour=tour, photo="tours/shot{}.jpg".format(i))
+    cached = thumbnails.thumbnail_filename(TourShots.objects.get(photo="tours/shot0.jpg").photo, "570x360",
+                                           {"crop": "center"})
+
+    class Connection:
+        calls = []
+
+        def mget(self, keys):
+            self.calls.append(keys)
+            return [b"{}" if key.endswith(thumbnails.ImageFile(cached, thumbnails.default.storage).key) else None
+                    for key in keys]
+
+    monkeypatch.setattr(thumbnails.default.kvstore, "connection", Connection(), raising=False)
+    monkeypatch.setattr(thumbnails, "get_thumbnail", lambda *args, **kwargs: pytest.fail("get_thumbnail called"))
+    queued = []
+    monkeypatch.setattr(thumbnail_tasks.generate_thumbnails, "delay", lambda *args: queued.append(args))
+
+    tours = Tour.objects.annotate(**TourSummary.annotations()).prefetch_related("tour_shots")
+    with django_capture_on_commit_callbacks(execute=True):
+        data = TourListSerializer(tours, many=True).data
+
+    assert len(Connection.calls) == 1 and len(Connection.calls[0]) == 3
+    assert [shot["thumbnail"] for shot in data[0]["tour_shots"]] == [cached, "tours/shot1.jpg", "tours/shot2.jpg"]
+    assert sorted(queued) == sorted(("tours.TourShots", shot.pk) for shot in TourShots.objects.exclude(
+        photo="tours/shot0.jpg"))
+
+
+def test_tour_detail_fragment_is_cached_by_revision(tour, client, django_capture_on_commit_callbacks):
+    cache.clear()
+    client.get("/v1/tours/{}/".format(tour.pk))
+
+    with CaptureQueriesContext(connection) as queries:
+        response = client.get("/v1/tours/{}/".format(tour.pk))
+    selects = [query for query in queries.captured_queries if query["sql"].startswith("SELECT")]
+    assert len(selects) == 1
+    assert response.data["tour_shots"] == []
+    assert response.data["numbers_exists"] is False
+    assert not {"search_vector", "updated_at", "revision"} & set(response.data)
+
+    TourNumbers.objects.create(tour=tour, place_count=1, price=15000)
+    TourShots.objects.create(tour=tour, photo="tours/new.jpg")
+
+    response = client.get("/v1/tours/{}/".format(tour.pk))
+    assert [shot["photo"] for shot in response.data["tour_shots"]] == ["tours/new.jpg"]
+    assert not {"thumbnails", "thumbnails_source"} & set(response.data["tour_shots"][0])
+    assert response.data["numbers_exists"] is True
+
+
+def create_owner_tours(organization, category, count):
+    for i in range(count):
+        tour = Tour.objects.create(title="Тур владельца", category=category, org=organization)
+        photo = "tours/{}.jpg".format(tour.pk)
+        manifest = {geometry: "cache/{}.webp".format(geometry) for geometry in THUMBNAIL_GEOMETRIES}
+        TourShots.objects.create(tour=tour, photo=photo, thumbnails=manifest, thumbnails_source=photo)
+        TourNumbers.objects.create(tour=tour, place_count=1, price=10000)
+        CommentTour.objects.create(tour=tour, user=User.objects.create(username="guest{}".format(tour.pk)),
+                                   service=5, location=5, purity=5, staff=5, proportion=5,
+                                   text="Отличный санаторий, всем рекомендую")
+
+
+@pytest.mark.parametrize("url", ["/v1/tours/me/", "/v1/tours/dashboard/"])
+def test_owner_tours_query_count_does_not_grow(tour, url):
+    organization = Organization.objects.create(user=User.objects.create(username="owner"), org_name="Сана")
+    client = APIClient()
+    client.force_authenticate(organization.user)
+
+    create_owner_tours(organization, tour.category, 2)
+    cache.clear()
+    with CaptureQueriesContext(connection) as few:
+        assert len(client.get(url).data) == 2
+
+    create_owner_tours(organization, tour.category, 5)
+    cache.clear()
+    with CaptureQueriesContext(connection) as many:
+        response = client.get(url)
+
+    assert len(response.data) == 7
+    assert len(many.captured_queries) == len(few.captured_queries)
+
+
+def test_owner_dashboard_row(tour):
+    organization = Organization.objects.create(user=User.objects.create(username="owner"), org_name="Сана")
+    create_owner_tours(organization, tour.category, 1)
+    client = APIClient()
+    client.force_authenticate(organization.user)
+
+    row = client.get("/v1/tours/dashboard/").data[0]
+
+    assert row["cover"] == "cache/570x360.webp"
+    assert row["numbers_count"] == 1
+    assert row["packages_count"] == 0
+
+
+def test_seed_database_builds_consistent_graph():
+    call_command("seed_database", tours=4, guides=2, users=5, regions=2, numbers=2, cabinets=2, comments=3,
+                 reservations=4, chunk=3, stdout=StringIO())
+    assert Tour.objects.count() == 4
+    assert TourNumbers.objects.count() == 8
+    assert Reservations.objects.count() == 4 * 2 * 2 * 4
+    assert Payment.objects.count() == Reservations.objects.filter(paid=True, payment__isnull=False).count()
+    assert not TourSummary.objects.exclude(comments_count=3).exists()
@@ -1,5 +1,4 @@
-from django.db import models
-from django.db.models import Q, Min, Avg, Count
+from django.db.models import Q
 from django.http import Http404
 from django.utils.translation import gettext_lazy as _, activate  # noqa F405
 from drf_spectacular.utils import extend_schema, OpenApiParameter
@@ -11,6 +10,9 @@ from rest_framework.response import Response
 from rest_framework.viewsets import GenericViewSet
 
 from medtour.contrib.exceptions import ImATeapot
+from medtour.contrib.ordering import get_shuffle_seed, seeded_shuffle
+from medtour.contrib.pagination import SeededShuffleCursorPagination
+from medtour.contrib.response_cache import cache_response
 from medtour.contrib.required_field_list_view.viewsets import TourIdRequiredFieldsModelViewSet
 from medtour.contrib.serializers import ReadWriteSerializerMixin
 from medtour.contrib.soft_delete_model import SoftDeleteModelViewSet
@@ -21,13 +23,13 @@ from medtour.tours.serializers import (
     AdditionalInfoServicesSerializer, TourPhonesSerializer,
     AdditionalTitlesSerializer, TourListSerializer, OrgCategorySerializer, TourPriceFileSerializer,
     CreateTourShotsSerializer, TourBookingWeekDaysSerializer, TourMedicalProfileSerializer,
-    TourBookingExtraHolidaysSerializer, TourBookingHolidaySerializer,
+    TourBookingExtraHolidaysSerializer, TourBookingHolidaySerializer, TourDashboardSerializer,
 )
 from medtour.tours.models import (
     Tour, TourPaidServices, TourLocation, TourShots, CommentTour,
     TourAdditionalTitle, AdditionalInfoServices,
-    TourPhones, AdditionalTitles, TourPriceFile, TourBookingWeekDays, TourMedicalProfile, Round, TourBookingExtraHolidays,
-    TourBookingHoliday,
+    TourPhones, AdditionalTitles, TourPriceFile, TourBookingWeekDays, TourMedicalProfile, TourBookingExtraHolidays,
+    TourBookingHoliday, TourSummary,
 )
 from medtour.tours.permissions import IsTourOwner
 from medtour.users.models import OrganizationCategory
@@ -46,6 +48,9 @@ class TourViewSet(ReadWriteSerializerMixin, SoftDeleteModelViewSet):
     me:
     Возвращает список всех туров пользователя
 
+    dashboard:
+    Облегчённый список туров пользователя для кабинета
+
 
     CurrencyEnum:  0: "USD",
                     1: "KZT",
@@ -60,11 +65,7 @@ class TourViewSet(ReadWriteSerializerMixin, SoftDeleteModelViewSet):
     filterset_fields = ['region_id', "category_id", "country_id",
                         "org_id", "org__user_id", "category__slug"]
     parser_classes = (MultiPartParser, JSONParser)
-    # pagination_class = TourStandardResultsSetPagination
-    detail_pr_related_tuple = ("tour_shots", "additional_titles__title",
-                               "additional_titles__additional_services", "comments__user",
-                               "medical_profiles"
-                               )
+    pagination_class = SeededShuffleCursorPagination
     detail_sl_related_tuple = ("region", "country", "category", "org__user")
     list_pr_related_tuple = (
         "tour_shots",
@@ -80,9 +81,17 @@ class TourViewSet(ReadWriteSerializerMixin, SoftDeleteModelViewSet):
     def me(self, request):
         if isinstance(self.request.user.id, int) is False:
             return Response(status=status.HTTP_401_UNAUTHORIZED, data={"message": "Unauthorized"})
-        queryset = self.get_queryset().filter(org__user=request.user)
+        serializer = self.read_serializer_class(self.get_queryset(), many=True, context=self.get_serializer_context())
+        return Response(serializer.data)
 
-        serializer = self.read_serializer_class(queryset, many=True)
+    @extend_schema(summary="Кабинет владельца",
+                   description="Туры пользователя с обложкой, ценой, рейтингом и количеством номеров и пакетов",
+                   responses={'200': TourDashboardSerializer(many=True)})
+    @action(detail=False)
+    def dashboard(self, request):
+        if isinstance(self.request.user.id, int) is False:
+            return Response(status=status.HTTP_401_UNAUTHORIZED, data={"message": "Unauthorized"})
+        serializer = TourDashboardSerializer(self.get_queryset(), many=True, context=self.get_serializer_context())
         return Response(serializer.data)
 
     # TODO: needs to uncommitted if data is biggest
@@ -106,6 +115,15 @@ class TourViewSet(ReadWriteSerializerMixin, SoftDeleteModelViewSet):
     #     resp.data['result_id'] = result_id
     #     return resp
 
+    @extend_schema(parameters=[
+        OpenApiParameter(name="seed",
+                         description="Сид перемешивания туров. Передавайте один и тот же сид, "
+                                     "чтобы порядок не менялся между страницами. "
+                                     "По умолчанию порядок меняется раз в сутки")
+    ])
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     @action(detail=False)
     def medicalProfiles(self, request, *args, **kwargs):  # noqa
         obj = TourMedicalProfile.objects.all()
@@ -115,23 +133,38 @@ class TourViewSet(ReadWriteSerializerMixin, SoftDeleteModelViewSet):
     def get_queryset(self):
         qs = super().get_queryset()
         if self.action == "list":
+            self.shuffle_seed = get_shuffle_seed(self.request)
+            qs = seeded_shuffle(qs, self.shuffle_seed)
             return qs.filter(
                 is_deleted=False, is_moderated=True
             ).annotate(
-                minimum_price=Min("numbers__price", filter=Q(numbers__is_deleted=False)),
-                service__avg=Round(Avg('comments__service'), 2, output_field=models.FloatField()),
-                location__avg=Round(Avg('comments__location'), 2, output_field=models.FloatField()),
-                purity__avg=Round(Avg('comments__purity'), 2, output_field=models.FloatField()),
-                staff__avg=Round(Avg('comments__staff'), 2, output_field=models.FloatField()),
-                proportion__avg=Round(Avg('comments__proportion'), 2, output_field=models.FloatField()),
-                comments__count=Count('comments__purity', output_field=models.FloatField())
+                **TourSummary.annotations()
             ).prefetch_related(
                 *self.list_pr_related_tuple
             ).select_related(
                 *self.list_sl_related_tuple
-            ).order_by("?")
+            )
+        elif self.action == "me":
+            return qs.filter(org__user=self.request.user).select_related(
+                *self.detail_sl_related_tuple
+            ).prefetch_related(
+                *TourReadSerializer.detail_prefetch
+            ).annotate(
+                **TourSummary.annotations(), **Tour.detail_annotations()
+            )
+        elif self.action == "dashboard":
+            return qs.filter(org__user=self.request.user).select_related(
+                "category", "region", "city"
+            ).prefetch_related(
+                "tour_shots"
+            ).annotate(
+                **TourSummary.annotations(), **Tour.dashboard_annotations()
+            )
         elif self.action == "retrieve":
-            return qs.select_related(*self.detail_sl_related_tuple).prefetch_related(*self.detail_pr_related_tuple)
+            # Связанные данные TourReadSerializer подгружает сам, только если карточки нет в кэше
+            return qs.select_related(*self.detail_sl_related_tuple).annotate(
+                **TourSummary.annotations(), **Tour.detail_annotations()
+            )
         return qs
 
     def get_serializer_class(self):
@@ -224,7 +257,7 @@ class TourLocationView(TourIdRequiredFieldsModelViewSet):
 
 class TourCommentView(TourIdRequiredFieldsModelViewSet):
     serializer_class = CommentTourSerializer
-    queryset = CommentTour.objects.all()
+    queryset = CommentTour.objects.select_related("user__people", "user__organization")
     http_method_names = ["get", "post"]
     filterset_fields = ["tour_id"]
 
@@ -274,7 +307,7 @@ class AdditionalInfoServicesViewSet(viewsets.ModelViewSet):
     @extend_schema(
         parameters=[OpenApiParameter(name="title_id", required=True, type=int, location=OpenApiParameter.PATH)])
     def list(self, request, *args, **kwargs):
-        super(self).list(request, *args, **kwargs)
+        return super().list(request, *args, **kwargs)
 
 
 class TourPriceFileView(TourIdRequiredFieldsModelViewSet):
@@ -296,14 +329,15 @@ class TourBookingWeekDaysViewSet(mixins.RetrieveModelMixin,
 class TourSlugView(generics.RetrieveAPIView):
     queryset = Tour.objects.select_related(
         "region", "country", "category", "org__user"
-    ).prefetch_related(
-        "services", "tour_shots", "additional_titles__title",
-        "additional_titles__additional_services", "comments__user"
-    )
+    ).annotate(**TourSummary.annotations(), **Tour.detail_annotations())
     serializer_class = TourReadSerializer
     lookup_field = 'slug'
     lookup_url_kwarg = 'slug'
 
+    @cache_response("tours", "guides")
+    def get(self, request, *args, **kwargs):
+        return super().get(request, *args, **kwargs)
+
     def get_object(self):
         try:
             obj = self.queryset.get(slug=self.kwargs.get(self.lookup_url_kwarg))
@@ -314,13 +348,7 @@ class TourSlugView(generics.RetrieveAPIView):
 
 class TourManyViewWithoutPagination(generics.ListAPIView):
     queryset = Tour.objects.annotate(
-        minimum_price=Min("numbers__price", filter=Q(numbers__is_deleted=False)),
-        service__avg=Round(Avg('comments__service'), 2, output_field=models.FloatField()),
-        location__avg=Round(Avg('comments__location'), 2, output_field=models.FloatField()),
-        purity__avg=Round(Avg('comments__purity'), 2, output_field=models.FloatField()),
-        staff__avg=Round(Avg('comments__staff'), 2, output_field=models.FloatField()),
-        proportion__avg=Round(Avg('comments__proportion'), 2, output_field=models.FloatField()),
-        comments__count=Count('comments__purity', output_field=models.FloatField())
+        **TourSummary.annotations()
     ).prefetch_related('tour_shots').select_related("org__user", "category", "region")
     serializer_class = TourListSerializer
 
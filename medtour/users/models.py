@@ -1,19 +1,18 @@
-import logging
 import random
 
-from django.conf import settings
 from django.contrib.auth.models import AbstractUser
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.core.mail import send_mail
 from django.db import models
 from django.utils.functional import cached_property
 from django.utils.translation import gettext_lazy as _
-from rest_framework.exceptions import ValidationError
 from sorl.thumbnail import ImageField
 
 from medtour.users.managers import CustomUserManager, OTPManager
-from medtour.utils import SmsApi, unique_slug_generator
+from medtour.contrib.search_vector import SearchVectorManager
+from medtour.utils import unique_slug_generator
 from medtour.utils.constants import OrgTypeChoice, UserTypeChoices
-from medtour.utils.send_mail import send_email_html
 
 
 class User(AbstractUser):
@@ -58,39 +57,15 @@ class User(AbstractUser):
             return _("Не найдено")
 
     def send_message_user(self, subject, message,
-                          from_email=None, emails: list = None, phone=None, **kwargs):
-        """Отправка смс или сообщение в почту"""
-        if from_email is None:
-            from_email = settings.DEFAULT_FROM_EMAIL
-
-        # SEND TO PHONE
-        if phone is None:
-            phone_obj = self.phonenumber_set.all()
-            if phone_obj.exists():
-                phone = str(phone_obj.first())
-            else:
-                phone = None
-        if phone:
-            SmsApi.send_sms(
-                phones=phone,
-                message=message,
-            )
-        # SEND TO EMAIL
-        if emails is None:
-            email_qs = self.emailaddress_set.all()
-            if email_qs.exists():
-                emails = [str(obj) for obj in email_qs]
-            else:
-                emails = None
-        if emails:
-            try:
-                send_email_html(emails, subject, 'email/index.html',
-                                {'title': subject,
-                                 'body': message}, from_email=from_email,
-                                **kwargs)
-            except Exception as e:
-                logging.error("Exception sending message to %s: %s", self.email, e)
-                return ValidationError({"detail": "Почта не существует {}: {}".format(self.email, e)})
+                          from_email=None, emails: list = None, phone=None, sensitive=False):
+        """
+        Отправка смс или сообщение в почту. Сообщение сохраняется как OutgoingMessage
+        и отправляется celery после коммита, см. medtour.notifications.tasks
+        """
+        from medtour.notifications.models import OutgoingMessage
+
+        return OutgoingMessage.send(self, subject, message, from_email=from_email, emails=emails, phone=phone,
+                                    sensitive=sensitive)
 
     @cached_property
     def phone_obj(self):
@@ -242,11 +217,15 @@ class City(models.Model):
     name = models.CharField(max_length=100, db_index=True)
     slug = models.SlugField(_("Слаг"), blank=True, max_length=255)
     is_first_page = models.BooleanField(_("Будет ли на первой странице?"), default=False)
+    search_vector = SearchVectorField(null=True, editable=False)  # заполняет триггер, см. medtour.main.search
+
+    objects = SearchVectorManager()
 
     class Meta:
         ordering = ['name']
         verbose_name = _("Город")
         verbose_name_plural = _("Города")
+        indexes = [GinIndex(fields=["search_vector"], name="city_search_vector_gin")]
 
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
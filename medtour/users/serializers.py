@@ -85,7 +85,7 @@ class RegionSerializer(serializers.ModelSerializer):
 class CitySerializer(serializers.ModelSerializer):
     class Meta:
         model = City
-        exclude = ("is_first_page", "slug")
+        exclude = ("is_first_page", "slug", "search_vector")
 
 
 class FirstPageCitiesSerializer(serializers.ModelSerializer):
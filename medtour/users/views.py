@@ -24,6 +24,7 @@ from rest_framework_simplejwt.tokens import RefreshToken
 from rest_framework_simplejwt.views import TokenViewBase, TokenBlacklistView
 
 from medtour.contrib.pagination import StandardResultsSetPagination
+from medtour.contrib.response_cache import cache_response
 from medtour.notifications.models import Notification
 from medtour.notifications.serializers import NotificationSerializer
 from medtour.orders.models import Payment
@@ -156,6 +157,10 @@ class MainPageCountryView(mixins.ListModelMixin,
     def get_queryset(self):
         return super().get_queryset().prefetch_related('regions__cities')
 
+    @cache_response("cities")
+    def list(self, request, *args, **kwargs):
+        return super().list(request, *args, **kwargs)
+
     # def get_serializer_context(self):
     #     context = super().get_serializer_context()
     #     context['is_first_page_cities'] = self.queryset.prefetch_related(
@@ -324,11 +329,13 @@ class RegisterUserAPIView(generics.GenericAPIView):
                 user.send_message_user(subject=settings.DEFAULT_FROM_EMAIL,
                                        from_email=settings.DEFAULT_FROM_EMAIL,
                                        message=message,
-                                       emails=[email])
+                                       emails=[email],
+                                       sensitive=True)
             else:
                 user.send_message_user(subject=settings.DEFAULT_FROM_EMAIL,
                                        message=message,
-                                       phone=str(phone))
+                                       phone=str(phone),
+                                       sensitive=True)
             return Response(response_serializer(user).data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -447,11 +454,13 @@ class ResetPassword(APIView):
                 user.send_message_user(subject=settings.DEFAULT_FROM_EMAIL,
                                        from_email=settings.DEFAULT_FROM_EMAIL,
                                        message=message,
-                                       emails=[email])
+                                       emails=[email],
+                                       sensitive=True)
             else:
                 user.send_message_user(subject=settings.DEFAULT_FROM_EMAIL,
                                        message=message,
-                                       phone=str(phone))
+                                       phone=str(phone),
+                                       sensitive=True)
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
@@ -569,16 +578,10 @@ class CreateUserView(APIView):
 
             # Send the login credentials to the user's email
             message = (_('Ваш пароль: {password}').format(password=password))  # noqa
-            try:
-                response_text = user.send_message_user(subject=settings.DEFAULT_FROM_EMAIL,
-                                                       message=message,
-                                                       phone=str(phone))
-                if response_text[1] <= "0":
-                    transaction.set_rollback(True)
-                    raise ValidationError({"phone": [_("Сообщение не отправлено")]})
-            except TypeError as e:
-                transaction.set_rollback(True)
-                raise ValidationError({"detail": [e]})
+            user.send_message_user(subject=settings.DEFAULT_FROM_EMAIL,
+                                   message=message,
+                                   phone=str(phone),
+                                   sensitive=True)
             return Response(serializer.data, status=201)
 
         return Response(serializer.errors, status=400)
@@ -636,7 +639,9 @@ class NotificationViewSet(mixins.ListModelMixin,
         return Response(serializer.data)
 
     def retrieve(self, request, *args, **kwargs):
-        self.queryset.filter(pk=kwargs['pk']).update(read=True)
-        notification = self.queryset.get(pk=kwargs['pk'])
+        notification = generics.get_object_or_404(self.queryset, pk=kwargs['pk'], user=request.user)
+        if not notification.read:
+            notification.read = True
+            notification.save(update_fields=['read'])
         serializer = NotificationSerializer(notification)
         return Response(serializer.data)
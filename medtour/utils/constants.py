@@ -65,3 +65,17 @@ class ReservationApproveStatusChoices(models.IntegerChoices):
 class PaymentStatusChoices(models.IntegerChoices):
     NOT_PAID = 0, _("Не оплачено")
     PAID = 1, _("Оплачено")
+
+
+class PaymentGatewayStatusChoices(models.IntegerChoices):
+    PENDING = 0, _("Ожидает ссылку на оплату")
+    CREATED = 1, _("Ссылка на оплату создана")
+    FAILED = 2, _("Ошибка платежной системы")
+    UNKNOWN = 3, _("Требует сверки с платежной системой")
+
+
+class NotificationStatusChoices(models.IntegerChoices):
+    SKIPPED = -1, _("Не требуется")
+    PENDING = 0, _("Ожидает отправки")
+    SENT = 1, _("Отправлено")
+    FAILED = 2, _("Не отправлено")
@@ -0,0 +1,151 @@
+"""
+Общий клиент исходящих HTTP запросов к внешним провайдерам (SMSC, Kassa24, Telegram).
+
+У каждого провайдера свой keep-alive пул соединений, таймауты, повторы подключения
+и автомат отключения (circuit breaker): после серии ошибок запросы к провайдеру
+сразу отклоняются до истечения паузы, а не занимают воркеры на таймаутах.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from django.conf import settings
+from requests.adapters import HTTPAdapter
+from urllib3.exceptions import ConnectTimeoutError
+from urllib3.util.retry import Retry
+
+from medtour.contrib.metrics import observe
+from medtour.contrib.profiling import record_http
+
+DEFAULT_PROVIDER_CONFIG = {
+    "timeout": (3.05, 10),
+    "retries": 2,
+    "pool_size": 10,
+    "failure_threshold": 5,
+    "reset_timeout": 30,
+}
+
+
+class CircuitOpenError(requests.ConnectionError):
+    """Провайдер временно отключен после серии ошибок"""
+
+
+def is_connect_error(exc) -> bool:
+    """Запрос не ушёл провайдеру: соединение не установлено или провайдер отключен"""
+    if isinstance(exc, (requests.ConnectTimeout, CircuitOpenError)):
+        return True
+    if isinstance(exc, requests.ConnectionError) and exc.args:
+        reason = getattr(exc.args[0], "reason", exc.args[0])  # MaxRetryError после повторов адаптера
+        return isinstance(reason, ConnectTimeoutError)
+    return False
+
+
+class CircuitBreaker:
+
+    def __init__(self, failure_threshold: int, reset_timeout: float):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._lock = threading.Lock()
+
+    def allow(self) -> bool:
+        with self._lock:
+            if self.opened_at is None:
+                return True
+            # После паузы пропускаем пробный запрос, его результат закроет или продлит отключение
+            if time.monotonic() - self.opened_at >= self.reset_timeout:
+                self.opened_at = time.monotonic()
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class OutboundClient:
+
+    def __init__(self, name: str, timeout=(3.05, 10), retries: int = 2, pool_size: int = 10,
+                 failure_threshold: int = 5, reset_timeout: float = 30):
+        self.name = name
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.breaker = CircuitBreaker(failure_threshold, reset_timeout)
+        # Повторяем только установку соединения: повтор POST после ответа может задвоить SMS или платеж
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size,
+                              max_retries=Retry(total=retries, connect=retries, read=0, status=0,
+                                                backoff_factor=0.3))
+        self.session = requests.Session()
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def request(self, method: str, url: str, **kwargs) -> requests.Response:
+        if not self.breaker.allow():
+            raise CircuitOpenError("{} is unavailable, circuit is open".format(self.name))
+        kwargs.setdefault("timeout", self.timeout)
+        started = time.perf_counter()
+        outcome = "error"
+        try:
+            response = self.session.request(method, url, **kwargs)
+            outcome = "{}xx".format(response.status_code // 100)
+        except requests.RequestException:
+            self.breaker.record_failure()
+            raise
+        finally:
+            duration = time.perf_counter() - started
+            record_http(duration)
+            observe("outbound_request_duration_seconds", duration, provider=self.name, outcome=outcome)
+        if response.status_code >= 500:
+            self.breaker.record_failure()
+        else:
+            self.breaker.record_success()
+        return response
+
+    def get(self, url: str, **kwargs) -> requests.Response:
+        return self.request("GET", url, **kwargs)
+
+    def post(self, url: str, **kwargs) -> requests.Response:
+        return self.request("POST", url, **kwargs)
+
+    def send_many(self, calls: list) -> list:
+        """
+        Параллельно выполняет запросы вида {"method": ..., "url": ..., **kwargs} через общий пул.
+        Возвращает ответы в порядке calls, ошибка отдельного запроса возвращается вместо ответа.
+        """
+
+        def send(call):
+            call = dict(call)
+            try:
+                return self.request(call.pop("method", "POST"), call.pop("url"), **call)
+            except requests.RequestException as e:
+                return e
+
+        if len(calls) <= 1:
+            return [send(call) for call in calls]
+        with ThreadPoolExecutor(max_workers=min(len(calls), self.pool_size)) as executor:
+            return list(executor.map(send, calls))
+
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def get_client(name: str) -> OutboundClient:
+    """Клиент провайдера с настройками из settings.OUTBOUND_HTTP[name], один на процесс"""
+    client = _clients.get(name)
+    if client is None:
+        with _clients_lock:
+            client = _clients.get(name)
+            if client is None:
+                config = {**DEFAULT_PROVIDER_CONFIG, **settings.OUTBOUND_HTTP.get(name, {})}
+                client = _clients[name] = OutboundClient(name, **config)
+    return client
@@ -1,17 +1,18 @@
 import base64
 
-import requests
 from django.conf import settings
 from django.urls import reverse
 
+from medtour.utils.http import get_client
+
 try:
     from sentry_sdk import capture_message
-except:
-    pass
+except ImportError:
+    def capture_message(message, level=None):
+        pass
 
 
 class PaymentApi:
-    kassa24_url = 'https://ecommerce.pult24.kz/payment/create'
 
     def __init__(self, login: str, password: str):
         self.login = login
@@ -19,14 +20,26 @@ class PaymentApi:
         self.credentials_bytes = self.credentials.encode('ascii')
         self.base64_credentials = base64.b64encode(self.credentials_bytes).decode('ascii')
         self.headers = {'Authorization': 'Basic ' + self.base64_credentials}
+        self.kassa24_url = settings.KASSA24_URL
+
+    @classmethod
+    def for_tour(cls, tour):
+        """Касса тура, если она подключена, иначе общая касса сервиса"""
+        kassa24_obj = tour.kassa24 if hasattr(tour, 'kassa24') else None
+        if kassa24_obj:
+            return cls(kassa24_obj.login, kassa24_obj.password)
+        return cls(settings.KASSA24_LOGIN, settings.KASSA24_PASSWORD)
 
     def create_payment(self, amount: int,
                        service_cart_id: int = None,
                        email: str = None,
                        phone: str = None
                        ) -> (str, bool):
-        # Set up the login credentials
-
+        """
+        Возвращает (ссылка на оплату, False) или (текст ошибки, True) при отказе 4xx.
+        Ошибки сети, таймауты и 5xx поднимаются как requests.RequestException,
+        см. create_kassa24_payment: повторять можно только ошибки подключения.
+        """
         data = {
             "amount": amount * 100,
             "merchantId": self.login,
@@ -42,17 +55,16 @@ class PaymentApi:
             data['orderId'] = str(service_cart_id)
 
         # Make the request
-        response = requests.post(self.kassa24_url,
-                                 headers=self.headers,
-                                 json=data)
+        response = get_client("kassa24").post(self.kassa24_url,
+                                              headers=self.headers,
+                                              json=data)
         response_text = response.text
         if response.status_code == 201:
             return response.json()['url'], False
-        elif response.status_code in [400, 401, 402, 403]:
-            capture_message("kassa24 4xx error: ", response_text)
+        elif 400 <= response.status_code < 500:
+            capture_message("kassa24 4xx error: {}".format(response_text))
             return response_text, True
         else:
-            capture_message("kassa24 5xx error: ", response_text)
+            capture_message("kassa24 5xx error: {}".format(response_text))
+            response.raise_for_status()
             return response_text, True
-
-# print(PaymentApi("14141564717596838", "JAKN3fTs1yw15W8k9QBY").create_payment(1555, 142424))
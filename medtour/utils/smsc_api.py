@@ -1,14 +1,17 @@
 # -*- coding: utf-8 -*-
 # SMSC.KZ API (smsc.kz) версия 2.0 (03.07.2019)
+import json
 import smtplib
 from datetime import datetime
 
+import requests
 from django.conf import settings
 
+from medtour.utils.http import get_client, CircuitOpenError
+
 try:
-    from urllib import urlopen, quote
+    from urllib import quote
 except ImportError:
-    from urllib.request import urlopen
     from urllib.parse import quote
 
 # Константы для настройки библиотеки
@@ -77,6 +80,24 @@ class SMSC(object):
 
         return m
 
+    # Метод пакетной отправки разных SMS одним запросом
+    #
+    # messages - список пар (телефон, сообщение)
+    #
+    # возвращает ответ SMSC в формате JSON с результатом по каждому номеру (op=1):
+    # {"id": <id>, "cnt": <количество sms>, "phones": [{"phone": <телефон>, "error": <ошибка>, ...}, ...]}
+    # либо {"error": <описание>, "error_code": <код ошибки>} в случае ошибки всего запроса,
+    # либо пустой словарь, если сервер не ответил
+
+    def send_sms_list(self, messages, translit=0, sender=False):
+        sms_list = "\n".join("{}:{}".format(phone, message.replace("\n", "\\n")) for phone, message in messages)
+        m = self._smsc_send_cmd("send", "cost=3&op=1&list=" + quote(sms_list) + "&translit=" + str(translit) +
+                                ifs(sender is False, "", "&sender=" + quote(str(sender))), fmt=3)
+        try:
+            return json.loads(m)
+        except ValueError:
+            return {}
+
     # SMTP версия метода отправки SMS
 
     def send_sms_mail(self, phones, message, translit=0, time="", id=0, format=0, sender=""):
@@ -189,14 +210,17 @@ class SMSC(object):
 
     # Метод вызова запроса. Формирует URL и делает 3 попытки чтения
 
-    def _smsc_send_cmd(self, cmd, arg=""):
-        url = ifs(SMSC_HTTPS, "https", "http") + "://smsc.kz/sys/" + cmd + ".php"
+    def _smsc_send_cmd(self, cmd, arg="", fmt=1):
+        url = settings.SMSC_URL + cmd + ".php"
+        if SMSC_HTTPS:
+            url = url.replace("http://", "https://", 1)
         _url = url
         arg = "login=" + quote(SMSC_LOGIN) + "&psw=" + quote(
-            SMSC_PASSWORD) + "&fmt=1&charset=" + SMSC_CHARSET + "&" + arg
+            SMSC_PASSWORD) + "&fmt=" + str(fmt) + "&charset=" + SMSC_CHARSET + "&" + arg
 
         i = 0
         ret = ""
+        client = get_client("smsc")
 
         while ret == "" and i <= 5:
             if i > 0:
@@ -206,12 +230,15 @@ class SMSC(object):
 
             try:
                 if SMSC_POST or len(arg) > 2000:
-                    data = urlopen(url, arg.encode(SMSC_CHARSET))
+                    data = client.post(url, data=arg.encode(SMSC_CHARSET),
+                                       headers={"Content-Type": "application/x-www-form-urlencoded"})
                 else:
-                    data = urlopen(url + "?" + arg)
+                    data = client.get(url + "?" + arg)
 
-                ret = str(data.read().decode(SMSC_CHARSET))
-            except:  # noqa
+                ret = data.content.decode(SMSC_CHARSET) if data.ok else ""
+            except CircuitOpenError:
+                break
+            except requests.RequestException:
                 ret = ""
 
             i += 1
@@ -219,9 +246,11 @@ class SMSC(object):
         if ret == "":
             if SMSC_DEBUG:
                 print("Ошибка чтения адреса: " + url)
+            if fmt != 1:
+                return ret
             ret = ","  # фиктивный ответ
 
-        return ret.split(",")
+        return ret.split(",") if fmt == 1 else ret
 
 # Examples:
 # smsc = SMSC()
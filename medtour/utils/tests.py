@@ -0,0 +1,57 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from medtour.utils.http import OutboundClient, CircuitOpenError
+
+
+class StatusHandler(BaseHTTPRequestHandler):
+    """Отвечает кодом из пути запроса: /503 -> 503"""
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):  # noqa
+        self.send_response(int(self.path.strip("/")))
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def stub_url():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), StatusHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    yield "http://127.0.0.1:{}".format(server.server_port)
+    server.shutdown()
+    server.server_close()
+
+
+def test_circuit_opens_after_server_errors(stub_url):
+    client = OutboundClient("stub", failure_threshold=2, reset_timeout=60)
+
+    assert client.get(stub_url + "/503").status_code == 503
+    assert client.get(stub_url + "/503").status_code == 503
+    with pytest.raises(CircuitOpenError):
+        client.get(stub_url + "/200")
+
+
+def test_circuit_half_opens_after_reset_timeout(stub_url):
+    client = OutboundClient("stub", failure_threshold=1, reset_timeout=0)
+
+    client.get(stub_url + "/503")
+
+    assert client.get(stub_url + "/200").status_code == 200
+    assert client.breaker.failures == 0
+
+
+def test_send_many_keeps_order_and_returns_errors(stub_url):
+    client = OutboundClient("stub", retries=0)
+    calls = [{"method": "GET", "url": stub_url + "/" + str(code)} for code in (200, 404, 201)]
+    calls.append({"method": "GET", "url": "http://127.0.0.1:1/"})
+
+    responses = client.send_many(calls)
+
+    assert [response.status_code for response in responses[:3]] == [200, 404, 201]
+    assert isinstance(responses[3], Exception)